@@ -1,4 +1,37 @@
-from member_net.member_net_functions import *
+import sys
+
+
+def main():
+    """Main function to execute the whole thing. Accepts 'gui', 'cli', 'batch' or 'lookup' as argv.
+    Each mode imports only what it needs: batch arguments (and --help) are checked before
+    pandas loads, and Tk is only loaded for the GUI.
+    """
+    # If no argument is passed, default to GUI
+    mode = str(sys.argv[1]).lower() if len(sys.argv) > 1 else 'gui'
+
+    if mode == 'cli':
+        from member_net.member_net_functions import cli
+        cli()
+
+    elif mode == 'batch':
+        from member_net.options import batch_parser
+        args = batch_parser().parse_args(sys.argv[2:])
+        from member_net.member_net_functions import batch
+        batch(args)
+
+    elif mode == 'lookup':
+        from member_net.options import lookup_parser
+        args = lookup_parser().parse_args(sys.argv[2:])
+        from member_net.lookup import lookup
+        sys.exit(lookup(args))
+
+    elif mode == 'gui':
+        import member_net.gui as gooey
+        gooey.root.mainloop()
+
+    else:
+        print(f'Please input \'cli\', \'gui\', \'batch\' or \'lookup\' only')
+
 
 if __name__ == '__main__':
     main()
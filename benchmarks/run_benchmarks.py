@@ -0,0 +1,136 @@
+"""Times the export pipeline on synthetic databases and records the results as JSON.
+
+Each scale gets its own synthetic database (see synthetic_data.py). Every scenario
+runs in a temporary working directory, so the real output folder and its caches
+are never touched. Results are appended to the JSON file so runs from different
+releases can be compared.
+
+Usage:
+    python benchmarks/run_benchmarks.py --edges 10000 100000 --output benchmarks/results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib  # noqa: E402
+matplotlib.use('Agg')
+
+import networkx as nx  # noqa: E402
+
+import config.extraction_settings as extraction_settings  # noqa: E402
+import config.server_details as server_details  # noqa: E402
+import member_net.components as components  # noqa: E402
+import member_net.member_net_functions as mnf  # noqa: E402
+from benchmarks.synthetic_data import write_database  # noqa: E402
+from member_net.compact_graph import as_networkx  # noqa: E402
+from member_net.graph_export import write_gexf, write_tables  # noqa: E402
+from member_net.loader import load_member_frames  # noqa: E402
+from member_net.network_metrics import network_metrics  # noqa: E402
+from member_net.rendering import RENDERERS  # noqa: E402
+
+
+def timed(results, name, fn, *args, **kwargs):
+    """Runs fn, stores its wall time in results[name] and returns its result"""
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    results[name] = round(time.perf_counter() - start, 4)
+    print(f'  {name}: {results[name]}s')
+    return value
+
+
+def run_scale(n_edges, backends, render_networks, min_nodes, workdir):
+    """Runs every scenario against one synthetic database
+    :return: dict of scenario timings and graph counts
+    """
+    db_path = os.path.join(workdir, f'synthetic {n_edges}.db')
+    server_details.sqlite_location = db_path
+    scenarios = {}
+    counts = timed(scenarios, 'synthetic_data', write_database, db_path, n_edges)
+
+    configured = extraction_settings.parallel_extraction
+    for name, parallel in (('serial', False), ('parallel', True)):
+        extraction_settings.parallel_extraction = parallel
+        timed(scenarios, f'load_member_frames[{name}]', load_member_frames, 'sqlite', use_snapshots=False)
+    extraction_settings.parallel_extraction = configured
+
+    for backend in backends:
+        g, ind = timed(scenarios, f'generate_member_graph[{backend}]', mnf.generate_member_graph, 'sqlite',
+                       backend, use_snapshots=False)
+        if backend == 'compact':
+            timed(scenarios, 'generate_member_graph[compact, chunked]', mnf.generate_member_graph, 'sqlite',
+                  backend, chunksize=100000, use_snapshots=False)
+
+        attributes = timed(scenarios, f'get_subgraph_attributes[{backend}]', mnf.get_subgraph_attributes, g)
+        components._component_cache.pop(g, None)
+        multi = timed(scenarios, f'get_subgraphs[{backend}]', mnf.get_subgraphs, g, min_nodes)
+
+        summary = timed(scenarios, f'subgraph_output[{backend}, no render]', mnf.subgraph_output, multi, ind,
+                        render=False)
+        for workers in sorted({1, os.cpu_count() or 1}):
+            timed(scenarios, f'network_metrics[{backend}, {workers} workers]', network_metrics, multi, workers)
+        for renderer in RENDERERS:
+            # the renderer is part of the pdfs' content hashes, so each one renders every pdf
+            mnf.layout_settings.renderer = renderer
+            timed(scenarios, f'subgraph_output[{backend}, render {render_networks}, {renderer}]', mnf.subgraph_output,
+                  multi, ind, render_only=range(min(render_networks, len(multi))))
+
+        subnetwork_df, columns, igroup, mgroup = summary
+        timed(scenarios, f'output_csvs[{backend}]', mnf.output_csvs, igroup, mgroup)
+        timed(scenarios, f'output_excel[{backend}]', mnf.output_excel, subnetwork_df, columns)
+        timed(scenarios, f'nx.write_gexf[{backend}]', nx.write_gexf, as_networkx(g),
+              os.path.join(workdir, f'{backend} nx.gexf'))
+        timed(scenarios, f'write_gexf[{backend}]', write_gexf, g, os.path.join(workdir, f'{backend}.gexf'))
+        timed(scenarios, f'write_tables[{backend}]', write_tables, g, os.path.join(workdir, backend))
+
+        counts.update({'nodes': g.number_of_nodes(), 'edges': g.number_of_edges(),
+                       'components': attributes['Total Subgraphs'], 'networks exported': len(multi)})
+    return {'scenarios': scenarios, 'counts': counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the member network export pipeline')
+    parser.add_argument('--edges', type=int, nargs='+', default=[10000, 100000],
+                        help='participation rows per synthetic database, e.g. 10000 1000000 10000000')
+    parser.add_argument('--backends', nargs='+', default=['networkx', 'compact'], choices=['networkx', 'compact'])
+    parser.add_argument('--render-networks', type=int, default=20,
+                        help='networks rendered in the rendering scenarios, once per renderer')
+    parser.add_argument('--min-nodes', type=int, default=3, help='subgraph size filter')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(__file__), 'results.json'))
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    runs = []
+    if os.path.isfile(output):
+        with open(output) as f:
+            runs = json.load(f)
+
+    start_dir = os.getcwd()
+    for n_edges in args.edges:
+        print(f'{n_edges} participations')
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            mnf.check_output()
+            try:
+                result = run_scale(n_edges, args.backends, args.render_networks, args.min_nodes, workdir)
+            finally:
+                os.chdir(start_dir)
+        runs.append({'timestamp': datetime.now().isoformat(timespec='seconds'),
+                     'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'scale': n_edges,
+                     **result})
+
+    with open(output, 'w') as f:
+        json.dump(runs, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
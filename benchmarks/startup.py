@@ -0,0 +1,104 @@
+"""Measures how long app.py takes to start in each mode and checks it against a budget.
+
+Every command runs in a fresh interpreter several times and the median is compared with
+its budget, so slow imports creeping back into the start up path are caught. The exit
+code is 1 if any command is over budget. Results are appended to the JSON file like
+run_benchmarks.py.
+
+Usage:
+    python benchmarks/startup.py --repeat 5 --output benchmarks/startup_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (command, budget in seconds)
+COMMANDS = {
+    'batch --help': ([sys.executable, 'app.py', 'batch', '--help'], 0.5),
+    'lookup --help': ([sys.executable, 'app.py', 'lookup', '--help'], 0.5),
+    'import lookup': ([sys.executable, '-c', 'import member_net.lookup'], 0.5),
+    'import pipeline': ([sys.executable, '-c', 'import member_net.member_net_functions'], 2.0),
+    'import pipeline and renderer': ([sys.executable, '-c',
+                                      'import member_net.member_net_functions, member_net.rendering'], 3.0),
+}
+
+# modules that must not be loaded by the command, checked once per command
+MUST_NOT_LOAD = {
+    'batch --help': ['pandas', 'numpy', 'networkx', 'matplotlib'],
+    'lookup --help': ['pandas', 'numpy', 'networkx', 'matplotlib'],
+    'import lookup': ['pandas', 'networkx', 'matplotlib'],
+    'import pipeline': ['pandas', 'numpy', 'networkx', 'matplotlib', 'pyodbc', 'tkinter'],
+}
+
+
+def time_command(command, repeat):
+    """Median wall time of running command in a fresh interpreter"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def loaded_modules(command, modules):
+    """Which of modules a command leaves in sys.modules. A python -c command is run with the
+    check appended, a script is run with runpy inside a -c command, so its exit (--help exits)
+    is caught before the check."""
+    if not modules:
+        return []
+    if command[1:2] == ['-c']:
+        run = command[2]
+    else:
+        run = (f'import runpy, sys\nsys.argv = {command[1:]!r}\n'
+               f'try:\n    runpy.run_path({command[1]!r}, run_name="__main__")\nexcept SystemExit:\n    pass')
+    check = f'{run}\nimport sys\nprint("\\nloaded:" + ",".join(m for m in {modules!r} if m in sys.modules))'
+    output = subprocess.run([command[0], '-c', check], cwd=ROOT, capture_output=True, text=True, check=True)
+    # the command's own output comes first
+    loaded = output.stdout.rsplit('\nloaded:', 1)[1].strip()
+    return [m for m in loaded.split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the start up time of app.py against its budget')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(__file__), 'startup_results.json'))
+    args = parser.parse_args()
+
+    results = {}
+    over_budget = []
+    for name, (command, budget) in COMMANDS.items():
+        seconds = time_command(command, args.repeat)
+        unexpected = loaded_modules(command, MUST_NOT_LOAD.get(name, []))
+        results[name] = {'median_s': round(seconds, 4), 'budget_s': budget, 'unexpected_imports': unexpected}
+        ok = seconds <= budget and not unexpected
+        if not ok:
+            over_budget.append(name)
+        print(f'{name:<32}{seconds:>8.3f}s  budget {budget:.1f}s  {"ok" if ok else "OVER"}'
+              + (f'  loaded {", ".join(unexpected)}' if unexpected else ''))
+
+    output = os.path.abspath(args.output)
+    runs = []
+    if os.path.isfile(output):
+        with open(output) as f:
+            runs = json.load(f)
+    runs.append({'timestamp': datetime.now().isoformat(timespec='seconds'),
+                 'python': platform.python_version(),
+                 'platform': platform.platform(),
+                 'startup': results})
+    with open(output, 'w') as f:
+        json.dump(runs, f, indent=2)
+    print(f'Results written to {output}')
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
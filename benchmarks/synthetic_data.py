@@ -0,0 +1,137 @@
+"""Generates a synthetic credit union database for benchmarking.
+
+The sqlite file has the same tables and columns as member_net/demo_data.db, so
+the queries in config/sql_queries.py run against it unchanged. Every membership
+has a primary individual (participation type 101), a geometric number of joint
+owners (102) and occasionally beneficiaries (103). Most individuals are new
+people, the rest are drawn from nearby memberships, which produces the many
+small and few large networks seen on real cores.
+
+Usage:
+    python benchmarks/synthetic_data.py 1000000 synthetic.db
+"""
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+FIRST_NAMES = ['Olivia', 'Liam', 'Emma', 'Noah', 'Ava', 'Elijah', 'Sophia', 'James', 'Mia', 'Lucas',
+               'Amelia', 'Mason', 'Harper', 'Ethan', 'Evelyn', 'Logan', 'Abigail', 'Jacob', 'Ella', 'Aiden']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore']
+
+MEMBER_COLUMNS = ['MEMBER_NBR', 'CLS_LN_CNT', 'CLS_SV_CNT', 'OPN_LN_ALL_CNT', 'OPN_SV_ALL_CNT', 'OPN_LN_BAL',
+                  'OPN_SV_BAL', 'DIV_YTD_AMT', 'INT_YTD_AMT', 'SV_SD_BAL', 'SV_SD_CNT', 'SV_CERT_BAL',
+                  'SV_CERT_CNT', 'MAX_DAYS_DELQ_CNT', 'MAX_MTHS_DELQ_CNT', 'WO_LN_CNT', 'WO_LN_BAL']
+
+# chance a participation goes to a new person rather than one from a nearby membership
+NEW_INDIVIDUAL_RATE = {101: 0.9, 102: 0.6, 103: 0.5}
+
+# how far back (in participations) a reused individual is looked for
+NEIGHBORHOOD = 50
+
+BATCH = 100000
+
+
+def participations(n_edges, rng):
+    """Member number, individual id and participation type of every participation
+    :param n_edges: approximate number of participations
+    :return: three arrays of equal length
+    """
+    n_members = max(int(n_edges / 1.6), 1)
+    joints = rng.geometric(0.7, n_members) - 1
+    beneficiaries = rng.poisson(0.15, n_members)
+    slots = 1 + joints + beneficiaries
+
+    members = np.repeat(np.arange(1, n_members + 1), slots)
+    first = np.concatenate([[0], np.cumsum(slots)[:-1]])
+    position = np.arange(len(members)) - np.repeat(first, slots)
+    types = np.where(position == 0, 101, np.where(position <= np.repeat(joints, slots), 102, 103))
+
+    new_rate = np.select([types == 101, types == 102], [NEW_INDIVIDUAL_RATE[101], NEW_INDIVIDUAL_RATE[102]],
+                         NEW_INDIVIDUAL_RATE[103])
+    is_new = rng.random(len(members)) < new_rate
+    is_new[0] = True
+
+    # a reused slot points back at an earlier slot, chase the pointers to a new individual
+    slot = np.arange(len(members))
+    ref = np.where(is_new, slot, np.maximum(slot - rng.integers(1, NEIGHBORHOOD, len(members)), 0))
+    ref[0] = 0
+    while True:
+        chased = ref[ref]
+        if np.array_equal(chased, ref):
+            break
+        ref = chased
+    # individual ids start above the member numbers so the two never collide
+    individual_of_new = np.cumsum(is_new) + 10 ** len(str(n_members))
+    individuals = individual_of_new[ref]
+
+    # the same person can only participate once per membership
+    order = np.lexsort((individuals, members))
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = (np.diff(members[order]) != 0) | (np.diff(individuals[order]) != 0)
+    keep = np.sort(order[keep])
+    return members[keep], individuals[keep], types[keep]
+
+
+def write_database(path, n_edges, seed=0):
+    """Writes a synthetic database with about n_edges participations
+    :param path: sqlite file to create, replaced if it exists
+    :param n_edges: approximate number of rows in membershipparticipant_today
+    :param seed: random seed, the same seed always produces the same database
+    :return: dict of table row counts
+    """
+    rng = np.random.default_rng(seed)
+    members, individuals, types = participations(n_edges, rng)
+    n_members = int(members.max())
+    first_individual = int(individuals.min())
+    n_individuals = int(individuals.max()) - first_individual + 1
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE individual_today ("FIRST_NAME" TEXT, "LAST_NAME" TEXT, "OPEN_DATE" TEXT, '
+                 '"INDIVIDUAL_ID" INTEGER)')
+    conn.execute('CREATE TABLE membershipparticipant_today ("MEMBER_NBR" INTEGER, "PARTICIPATION_TYPE" INTEGER, '
+                 '"INDIVIDUAL_ID" INTEGER)')
+    conn.execute('CREATE TABLE agr_membertotal_today (' + ', '.join(
+        f'"{c}" REAL' if c in ('DIV_YTD_AMT', 'INT_YTD_AMT', 'MAX_DAYS_DELQ_CNT') else f'"{c}" INTEGER'
+        for c in MEMBER_COLUMNS) + ')')
+
+    for start in range(0, len(members), BATCH):
+        stop = start + BATCH
+        conn.executemany('INSERT INTO membershipparticipant_today VALUES (?, ?, ?)',
+                         zip(members[start:stop].tolist(), types[start:stop].tolist(),
+                             individuals[start:stop].tolist()))
+
+    for start in range(first_individual, first_individual + n_individuals, BATCH):
+        ids = np.arange(start, min(start + BATCH, first_individual + n_individuals))
+        first = rng.choice(FIRST_NAMES, len(ids))
+        last = rng.choice(LAST_NAMES, len(ids))
+        days = rng.integers(0, 365 * 30, len(ids))
+        dates = (np.datetime64('1995-01-01') + days).astype(str)
+        conn.executemany('INSERT INTO individual_today VALUES (?, ?, ?, ?)',
+                         zip(first.tolist(), last.tolist(), dates.tolist(), ids.tolist()))
+
+    for start in range(1, n_members + 1, BATCH):
+        ids = np.arange(start, min(start + BATCH, n_members + 1))
+        n = len(ids)
+        loans = rng.poisson(1.0, n)
+        savings = 1 + rng.poisson(1.5, n)
+        loan_bal = (loans * rng.gamma(2.0, 9000.0, n)).astype(int)
+        save_bal = (savings * rng.gamma(1.5, 4000.0, n)).astype(int)
+        columns = [ids, rng.poisson(0.5, n), rng.poisson(0.5, n), loans, savings, loan_bal, save_bal,
+                   np.round(save_bal * 0.01, 2), np.round(loan_bal * 0.05, 2),
+                   np.zeros(n, dtype=int), np.zeros(n, dtype=int), np.zeros(n, dtype=int), np.zeros(n, dtype=int),
+                   np.zeros(n), np.zeros(n, dtype=int), np.zeros(n, dtype=int), np.zeros(n, dtype=int)]
+        conn.executemany(f'INSERT INTO agr_membertotal_today VALUES ({", ".join("?" * len(columns))})',
+                         zip(*(c.tolist() for c in columns)))
+
+    conn.commit()
+    conn.close()
+    return {'participations': len(members), 'memberships': n_members, 'individuals': n_individuals}
+
+
+if __name__ == '__main__':
+    print(write_database(sys.argv[2], int(sys.argv[1])))
@@ -0,0 +1,40 @@
+########################################
+# SNAPSHOT CACHE
+# The individual, membership and participation tables are saved locally after
+# they are queried, so that repeated runs on the same day don't need to query
+# the datamart again. Requires the pyarrow package; without it the cache is
+# simply skipped.
+#
+# A snapshot is reused when both the query text (config/sql_queries.py) and the
+# data match. Editing a query therefore always forces a fresh extract.
+########################################
+
+# set to False to always query the database
+use_snapshots = True
+
+# where snapshots are saved. None saves them in the cache folder inside the output folder
+snapshot_location = None
+
+# snapshots older than this many days are deleted
+snapshot_retention_days = 2
+
+# at most this many snapshots are kept, oldest are deleted first
+snapshot_max_count = 4
+
+# a snapshot being written sits in a '.partial' folder until it is complete. One nothing has
+# written to for this many hours was left by a run that stopped, and is deleted
+partial_snapshot_timeout_hours = 6
+
+# Optional query returning a single value that identifies the load date of the
+# _today tables. Leave as None to identify the data by a fingerprint instead: the
+# modification time and size of the sqlite file, or the row count and checksums of
+# the _today tables (ms_sql_data_fingerprint_query in sql_queries.py).
+# The datamart fingerprint reads every row of all three tables on the server on every
+# run, just to check the snapshot is still current. Nothing is transferred, but on a
+# large core it can take a good part of the time a fresh extract would. If the tables
+# carry a load date, set ms_sql_data_date_query to a query that returns it; that is a
+# cheap lookup instead of a scan.
+# Example:
+# ms_sql_data_date_query = 'SELECT max(load_date) FROM membershipparticipant_today'
+sqlite_data_date_query = None
+ms_sql_data_date_query = None
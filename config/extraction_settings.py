@@ -0,0 +1,42 @@
+########################################
+# EXTRACTION
+# How the individual, membership and participation queries are read from the
+# database. The defaults suit both the sqlite demo db and the datamart; they
+# only need changing if the database server limits connections per user.
+########################################
+
+# set to False to run the three extraction queries one after another on a single connection
+parallel_extraction = True
+
+# connections opened to the database for extraction. 3 runs every query at once
+pool_size = 3
+
+# rows fetched per round trip. Larger values mean fewer round trips to the datamart
+# at the cost of a little more memory per fetch
+fetch_arraysize = 10000
+
+# set to True to let the database do more of the work: only participations that can
+# belong to networks of 3 or more nodes are extracted. Only used when the subgraph size
+# filter is 3 or more, and not by the GUI, whose histograms show every network size
+pushdown = False
+
+# a MEMBER_NBR and an INDIVIDUAL_ID with the same value are one node of the graph, an
+# individual, as the networkx backend has always built them, so that membership's
+# attributes are not counted in the network totals. Set to True to keep them as two
+# nodes with the compact backend; its networks can then differ from the networkx backend
+separate_colliding_ids = False
+
+########################################
+# OUT-OF-CORE
+# batch --out-of-core labels the networks without loading the graph into memory, for
+# databases too large for the other modes. Only the component and group tables are saved.
+# MEMBER_NBR and INDIVIDUAL_ID must be integers: text ids, or numbers stored as text with
+# leading zeros, stop the run as soon as one is read. The other modes accept any id.
+########################################
+
+# participation rows fetched and handled per step. More is faster, at the cost of memory
+out_of_core_block = 1000000
+
+# folder for the memory-mapped work files, which are deleted once the run ends. They take
+# roughly 50 bytes per participation. None uses the cache folder inside the output folder
+out_of_core_location = None
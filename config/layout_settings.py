@@ -0,0 +1,22 @@
+########################################
+# NETWORK LAYOUTS
+# The positions each network was drawn with are saved in the cache folder, so an
+# unchanged network is drawn exactly the same way on the next run without
+# computing its layout again. A network that changed starts from the positions
+# its nodes had last time, so it only moves as much as it needs to.
+########################################
+
+# set to False to compute every layout from scratch
+use_layout_cache = True
+
+# 'spring' for the force directed layout, 'spectral' for the fast layout meant for very
+# large networks, or 'auto' to use spectral only from large_network_nodes up
+layout_algorithm = 'auto'
+
+# network size (nodes) from which the 'auto' layout switches to spectral
+large_network_nodes = 1000
+
+# 'lean' draws each network and its summary on one page with a handful of matplotlib
+# artists, which is several times faster. 'classic' is the original drawing, with the
+# summary table on a second page
+renderer = 'lean'
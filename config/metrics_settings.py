@@ -0,0 +1,17 @@
+########################################
+# NETWORK METRICS
+# Adds the edge count, density, diameter and degree statistics of every network to
+# the summary spreadsheet. Metrics and network totals are computed across several
+# processes, which read the graph's arrays from shared memory instead of copies.
+########################################
+
+# set to True to add the metric columns to the summary spreadsheet
+network_metrics = False
+
+# processes computing the metrics and totals. 1 computes them in this process,
+# None uses every core
+metrics_workers = None
+
+# networks of more nodes than this get a quick estimate of their diameter (a lower bound,
+# usually exact) instead of searching from every node
+exact_diameter_nodes = 500
@@ -27,9 +27,49 @@ output_location = 'output'
 # the gephx file
 gephx_filename = 'Total membership graph '
 
+# set to True to gzip the gephx file (saved as .gexf.gz, Gephi opens it directly)
+compress_gexf = False
+
+# set to True to also save the graph as membership, individual and participation tables
+# for other programs (parquet if pyarrow is installed, otherwise csv)
+export_graph_tables = False
+
 # excel file with summary details
 summary_xls_filename = 'Member networks '
 
 # csvs with member_nbr/ individual_id and the subgraph they belong to
 member_group_csv_filename = 'individual group '
 individual_group_csv_filename = 'member group '
+
+# file type of the two group tables: 'csv', or 'parquet' for a smaller file that is faster
+# to load into other programs (needs the pyarrow package, otherwise csv is saved)
+group_table_format = 'csv'
+
+# table of every membership/individual and the component (network) it is in, saved by
+# batch --out-of-core in the group table format
+component_table_filename = 'component ids '
+
+# csv of networks that changed since the last incremental run
+changed_networks_csv_filename = 'networks changed '
+
+# where the network drawings go: 'pdfs' for one pdf per network in the pdfs folder,
+# 'book' for every network as a page of one pdf, or 'svg' for one svg per network in
+# an svgs folder. book and svg are always drawn with the lean renderer (layout_settings.py)
+render_output = 'pdfs'
+pdf_book_filename = 'Member network drawings '
+
+# pdfs are only rendered again when something drawn in them changed: the network's members,
+# participations, totals or title. Set to False to render every pdf on every run
+skip_unchanged_pdfs = True
+
+# delete the pdfs of networks that no longer exist. Only pdfs this program rendered
+# are deleted, anything else in the pdfs folder is left alone
+delete_stale_pdfs = True
+
+# json report of stage timings and the slowest networks
+run_report_filename = 'run report '
+
+# lookup index of the last export, used by 'app.py lookup' to find the network of a member
+# or individual without a full run. It has no date, each export replaces it
+save_network_index = True
+network_index_filename = 'network index.db'
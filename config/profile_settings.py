@@ -0,0 +1,26 @@
+########################################
+# RUN REPORT
+# Every run records how long each stage took (querying, building the graph,
+# rollups, centers, pdfs, csv/excel/gexf output) and how long each pdf took,
+# along with how much each raised the peak memory of the process.
+# The report is saved as json in the output folder and the slowest networks
+# are printed at the end of the run.
+########################################
+
+# set to False to skip saving the json run report
+save_run_report = True
+
+# number of slowest networks printed and saved in the report
+slowest_networks_shown = 10
+
+# also save the timing of every single network (large for big cores). When False
+# only the slowest networks and the totals of each stage are kept during the run
+report_every_network = False
+
+# print each stage's time as soon as it finishes, the summary at the end of the run
+# lists them all either way
+print_stages = False
+
+# record peak Python memory per stage with tracemalloc. Slows the run down noticeably,
+# only turn on while investigating memory use
+trace_memory = False
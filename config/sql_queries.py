@@ -46,3 +46,76 @@ ms_sql_edge_query = '''
 SELECT member_nbr [source], individual_id [target], participation_type
 FROM membershipparticipant_today
 '''
+
+# identifies the data of the _today tables for the snapshot cache when no data date
+# query is set in cache_settings.py. Any change to the tables changes one of the values.
+# It scans all three tables on every run; a data date query avoids that
+ms_sql_data_fingerprint_query = '''
+SELECT (SELECT count_big(*) FROM membershipparticipant_today),
+(SELECT checksum_agg(binary_checksum(*)) FROM membershipparticipant_today),
+(SELECT checksum_agg(binary_checksum(*)) FROM individual_today),
+(SELECT checksum_agg(binary_checksum(*)) FROM AGR_MEMBERTOTAL_TODAY)
+'''
+
+########################################################
+# PROJECTED QUERIES
+# Used by the streaming loader. Only the columns needed for labels and
+# rollups are selected. If you add a column here, also add it to the
+# rollups in member_net/rollups.py
+#######################################################
+
+sqlite_projected_individual_query = '''
+SELECT individual_id [INDIVIDUAL_ID],
+first_name ||' '||last_name||' '||individual_id [label]
+FROM individual_today
+'''
+
+sqlite_projected_member_query = '''
+SELECT member_nbr [MEMBER_NBR], member_nbr [label],
+opn_ln_bal [OPN_LN_BAL], opn_sv_bal [OPN_SV_BAL],
+opn_ln_all_cnt [OPN_LN_ALL_CNT], opn_sv_all_cnt [OPN_SV_ALL_CNT],
+div_ytd_amt [DIV_YTD_AMT], int_ytd_amt [INT_YTD_AMT]
+FROM agr_membertotal_today
+'''
+
+ms_sql_projected_individual_query = '''
+SELECT individual_id [INDIVIDUAL_ID],
+first_name + space(1) + last_name + space(1) + str(individual_id) [label]
+FROM individual_today
+'''
+
+ms_sql_projected_member_query = '''
+SELECT member_nbr [MEMBER_NBR], member_nbr [label],
+opn_ln_bal [OPN_LN_BAL], opn_sv_bal [OPN_SV_BAL],
+opn_ln_all_cnt [OPN_LN_ALL_CNT], opn_sv_all_cnt [OPN_SV_ALL_CNT],
+div_ytd_amt [DIV_YTD_AMT], int_ytd_amt [INT_YTD_AMT]
+FROM AGR_MEMBERTOTAL_TODAY
+'''
+
+########################################################
+# PUSHDOWN QUERIES
+# Used when pushdown is switched on in extraction_settings.py. Only the
+# participations that can belong to a network of 3 or more nodes are
+# extracted: those of memberships with more than one individual, and of
+# individuals with more than one membership. The node queries above are
+# filtered to the memberships and individuals of those participations by
+# adding a WHERE clause to them, so they should not have one of their own.
+#######################################################
+
+sqlite_candidate_edge_query = '''
+SELECT member_nbr [source], individual_id [target], participation_type
+FROM membershipparticipant_today
+WHERE member_nbr IN (SELECT member_nbr FROM membershipparticipant_today
+                     GROUP BY member_nbr HAVING count(DISTINCT individual_id) > 1)
+OR individual_id IN (SELECT individual_id FROM membershipparticipant_today
+                     GROUP BY individual_id HAVING count(DISTINCT member_nbr) > 1)
+'''
+
+ms_sql_candidate_edge_query = '''
+SELECT member_nbr [source], individual_id [target], participation_type
+FROM membershipparticipant_today
+WHERE member_nbr IN (SELECT member_nbr FROM membershipparticipant_today
+                     GROUP BY member_nbr HAVING count(DISTINCT individual_id) > 1)
+OR individual_id IN (SELECT individual_id FROM membershipparticipant_today
+                     GROUP BY individual_id HAVING count(DISTINCT member_nbr) > 1)
+'''
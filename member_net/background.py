@@ -0,0 +1,85 @@
+import queue
+import threading
+
+
+class Cancelled(Exception):
+    """Raised inside a background job once cancel has been requested"""
+
+
+class BackgroundTask:
+    """Runs a function on a worker thread and hands its progress and result back to Tk.
+    The worker never touches Tk widgets: it only puts messages on a queue, which the Tk
+    thread drains every poll_ms with root.after.
+    :param root: the Tk root
+    :param target: function run on the worker thread, called with this task
+    :param on_done: called on the Tk thread with the return value of target
+    :param on_error: called on the Tk thread with the exception target raised (Cancelled included)
+    :param on_progress: called on the Tk thread with (done, total, text). done and total are
+    None for a plain status message
+    :param poll_ms: milliseconds between queue checks
+    """
+
+    def __init__(self, root, target, on_done=None, on_error=None, on_progress=None, poll_ms=100):
+        self.root = root
+        self.target = target
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.poll_ms = poll_ms
+        self.cancel_event = threading.Event()
+        self.finished = False
+        self._messages = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.root.after(self.poll_ms, self._poll)
+        return self
+
+    @property
+    def running(self):
+        return not self.finished
+
+    def cancel(self):
+        """Asks the job to stop at its next check"""
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        """Raises Cancelled if cancel was requested. Called from the worker thread."""
+        if self.cancel_event.is_set():
+            raise Cancelled('Cancelled')
+
+    def progress(self, done, total, text=''):
+        """Reports progress from the worker thread"""
+        self._messages.put(('progress', (done, total, text)))
+
+    def status(self, text):
+        """Reports a status message from the worker thread"""
+        self.progress(None, None, text)
+
+    def _run(self):
+        try:
+            self._messages.put(('done', self.target(self)))
+        except Exception as e:
+            self._messages.put(('error', e))
+
+    def _poll(self):
+        """Delivers queued messages on the Tk thread, and reschedules itself until the job ends"""
+        while True:
+            try:
+                kind, value = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                if self.on_progress is not None:
+                    self.on_progress(*value)
+                continue
+
+            self.finished = True
+            callback = self.on_done if kind == 'done' else self.on_error
+            if callback is not None:
+                callback(value)
+            elif kind == 'error':
+                raise value
+            return
+        self.root.after(self.poll_ms, self._poll)
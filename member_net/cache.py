@@ -0,0 +1,43 @@
+import hashlib
+import json
+import os
+
+import config.output_location as output_settings  # ouput_location.py file
+
+
+def cache_path(filename):
+    """Location of a cache file inside the output folder"""
+    return f'{output_settings.output_location}//cache//{filename}'
+
+
+def network_key(node_ids):
+    """Stable key for a network's membership: a hash of its sorted node ids"""
+    joined = ','.join(sorted(str(n) for n in node_ids))
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()
+
+
+class JsonCache:
+    """Small persisted key/value store, loaded once and written back with save()
+    :param path: json file to read from and write to
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        if os.path.isfile(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.data, f)
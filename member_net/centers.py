@@ -0,0 +1,202 @@
+import time
+from datetime import datetime
+
+import numpy as np
+
+from member_net.compact_graph import CompactGraph, gather_neighbors
+from member_net.components import SubgraphList, get_node_types
+from member_net.cache import JsonCache, cache_path, network_key
+from member_net.options import CENTER_STRATEGIES
+
+# marks the center cache entries used by this run, the others are dropped when it is saved
+RUN = datetime.now().isoformat()
+
+
+class CenterCache:
+    """Center of every network, keyed by center strategy and network_key, kept between runs so
+    reruns keep their titles. Entries no network of this run used are dropped on save.
+    :param path: json file in the cache folder
+    """
+
+    def __init__(self, path=None):
+        self.store = JsonCache(path or cache_path('centers.json'))
+
+    def get(self, strategy, key):
+        """Cached center of a network, or None"""
+        entry = self.store.get(f'{strategy} {key}')
+        return entry[0] if isinstance(entry, list) else None
+
+    def set(self, strategy, key, center):
+        """Stores the center of a network, marking it used by this run"""
+        self.store[f'{strategy} {key}'] = [center, RUN]
+
+    def save(self, prune=True):
+        """:param prune: drop the entries not used by this run"""
+        if prune:
+            self.store.data = {k: v for k, v in self.store.data.items() if isinstance(v, list) and v[1] == RUN}
+        self.store.save()
+
+
+def find_center(graph_object, strategy='degree'):
+    """Picks the node used to name a network
+    :param graph_object: a single network, either backend
+    :param strategy: 'degree' for the highest degree node, 'double_sweep' for a BFS approximation
+    of the graph center, or 'exact' for the minimum eccentricity node (same as nx.center).
+    Ties go to memberships before individuals, then to the lowest id, so both backends agree.
+    :return center: the center node id
+    :return title: the label of the center node used for titling visualizations
+    """
+    node_ids, indptr, indices = _adjacency(graph_object)
+    code = choose_center(indptr, indices, strategy, tie_key(node_ids, get_node_types(graph_object)))
+    return node_ids[code], _label(graph_object, code, node_ids[code])
+
+
+def network_centers(multi, strategy='degree', cache=None, profile=None):
+    """Finds the center and title of every network in multi
+    :param multi: the list of subgraphs from get_subgraphs
+    :param strategy: see find_center
+    :param cache: CenterCache, so reruns keep their titles. Pass False to disable.
+    :param profile: RunProfile recording the time spent choosing each center not found in the cache
+    :return centers: list of center node ids
+    :return titles: list of center labels
+    """
+    if cache is None:
+        cache = CenterCache()
+
+    centers = []
+    titles = []
+    for k in range(len(multi)):
+        node_ids, indptr, indices, graph, codes, is_individual = _network_adjacency(multi, k)
+        key = network_key(node_ids)
+
+        cached = cache.get(strategy, key) if cache else None
+        hit = cached in node_ids
+        start = time.perf_counter()
+        code = node_ids.index(cached) if hit else choose_center(indptr, indices, strategy,
+                                                                tie_key(node_ids, is_individual))
+        if cache:
+            cache.set(strategy, key, node_ids[code])
+
+        centers.append(node_ids[code])
+        titles.append(_label(graph, code if codes is None else codes[code], node_ids[code]))
+        if profile is not None and not hit:
+            profile.network('center', titles[-1], len(node_ids), time.perf_counter() - start)
+
+    if cache:
+        cache.save()
+    return centers, titles
+
+
+def choose_center(indptr, indices, strategy='degree', tie_key=None):
+    """Picks a center on a CSR adjacency
+    :param tie_key: sort key of a node code deciding ties (see tie_key), None for the lowest code
+    :return: the node code of the center
+    """
+    degree = np.diff(indptr)
+    if strategy == 'degree':
+        return _highest(degree, tie_key)
+
+    elif strategy == 'double_sweep':
+        a = _highest(bfs_distances(indptr, indices, _highest(degree, tie_key)), tie_key)
+        dist_a = bfs_distances(indptr, indices, a)
+        dist_b = bfs_distances(indptr, indices, _highest(dist_a, tie_key))
+        # lowest estimated eccentricity, ties to the higher degree
+        estimate = np.maximum(dist_a, dist_b)
+        return _highest(degree, tie_key, np.flatnonzero(estimate == estimate.min()))
+
+    elif strategy == 'exact':
+        eccentricity = np.array([bfs_distances(indptr, indices, i).max() for i in range(len(degree))])
+        return _highest(-eccentricity, tie_key)
+
+    raise ValueError(f"Please specify one of {CENTER_STRATEGIES} as the center strategy")
+
+
+def tie_key(node_ids, is_individual):
+    """Sort key of a node code that puts memberships before individuals, then orders by id.
+    Node order differs between the backends, so ties are decided by this rather than by code."""
+    return lambda code: (bool(is_individual[code]), node_ids[code])
+
+
+def _highest(values, tie_key=None, candidates=None):
+    """Node code of the highest value, among candidates if given, ties decided by tie_key"""
+    candidates = np.arange(len(values)) if candidates is None else candidates
+    candidates = candidates[values[candidates] == values[candidates].max()]
+    if tie_key is None or len(candidates) == 1:
+        return int(candidates[0])
+    return int(min(candidates.tolist(), key=tie_key))
+
+
+def bfs_distances(indptr, indices, source):
+    """Hop distance from source to every node, expanding a whole BFS level per step"""
+    dist = np.full(len(indptr) - 1, -1)
+    dist[source] = 0
+    frontier = np.array([source])
+    d = 0
+    while len(frontier):
+        d += 1
+        nbrs = gather_neighbors(indptr, indices, frontier)
+        frontier = np.unique(nbrs[dist[nbrs] < 0])
+        dist[frontier] = d
+    return dist
+
+
+def local_csr(indptr, indices, codes):
+    """CSR adjacency of a closed set of node codes (e.g. one component), renumbered 0..len(codes)-1
+    :param codes: sorted node codes
+    """
+    counts = indptr[codes + 1] - indptr[codes]
+    local_indptr = np.concatenate([[0], np.cumsum(counts)])
+    local_indices = np.searchsorted(codes, gather_neighbors(indptr, indices, codes))
+    return local_indptr, local_indices
+
+
+def _adjacency(graph_object, node_ids=None):
+    """(node ids, indptr, indices) of a single network for either backend
+    :param node_ids: restrict a networkx graph to these nodes, which must form a closed component
+    """
+    if isinstance(graph_object, CompactGraph):
+        return graph_object.node_ids.tolist(), graph_object.indptr, graph_object.indices
+
+    if node_ids is None:
+        node_ids = list(graph_object)
+    node_index = {n: i for i, n in enumerate(node_ids)}
+    counts = [len(graph_object[n]) for n in node_ids]
+    indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    indices = np.fromiter((node_index[v] for n in node_ids for v in graph_object[n]), dtype=np.int64,
+                          count=int(indptr[-1]))
+    return node_ids, indptr, indices
+
+
+def _network_adjacency(multi, k):
+    """Adjacency of the k-th network, sliced from the parent graph when multi is a compact SubgraphList
+    :return: node ids, indptr, indices, graph holding the labels, parent codes (or None), and
+    whether each node is an individual
+    """
+    if isinstance(multi, SubgraphList) and isinstance(multi.graph_object, CompactGraph):
+        graph = multi.graph_object
+        codes = multi.components.codes(multi.selected[k])
+        codes = np.sort(codes)
+        indptr, indices = local_csr(graph.indptr, graph.indices, codes)
+        return graph.node_ids[codes].tolist(), indptr, indices, graph, codes, codes >= graph.n_members
+
+    if isinstance(multi, SubgraphList):
+        graph = multi.graph_object
+        component = multi.selected[k]
+        node_ids, indptr, indices = _adjacency(graph, multi.components.node_keys(component))
+        is_individual = get_node_types(graph)[multi.components.codes(component)]
+    else:
+        graph = multi[k]
+        node_ids, indptr, indices = _adjacency(graph)
+        is_individual = get_node_types(graph)
+    return node_ids, indptr, indices, graph, None, is_individual
+
+
+def _label(graph_object, code, node_id):
+    """Label attribute of a node, by code for the compact backend or by id for networkx"""
+    if isinstance(graph_object, CompactGraph):
+        if code < graph_object.n_members:
+            label = graph_object.member_attrs['label'].iloc[code]
+        else:
+            label = graph_object.individual_attrs['label'].iloc[code - graph_object.n_members]
+        return label.item() if hasattr(label, 'item') else label
+    return graph_object.nodes[node_id]['label']
@@ -0,0 +1,303 @@
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+import config.extraction_settings as extraction_settings  # extraction_settings.py file
+
+
+class CompactGraph:
+    """Array backed bipartite graph of memberships and individuals.
+
+    Nodes are integer encoded: codes 0..n_members-1 are memberships and the
+    remaining codes are individuals. Adjacency is held in CSR form (indptr,
+    indices) and node attributes stay in the two columnar DataFrames they were
+    queried into, so no per-node dicts are built until a networkx export is
+    requested.
+
+    As in the networkx build, a MEMBER_NBR and an INDIVIDUAL_ID that happen to
+    share a value are one node, an individual, and a pair of nodes has one edge.
+    With separate_colliding_ids in extraction_settings.py the two are kept as
+    separate nodes instead; on export to networkx such an individual is keyed
+    'individual <id>' so the two nodes stay apart.
+    """
+
+    def __init__(self, member_ids, individual_ids, member_attrs, individual_attrs, sources, targets, edge_attrs):
+        """
+        :param member_ids: array of MEMBER_NBR, position = node code
+        :param individual_ids: array of INDIVIDUAL_ID, position + n_members = node code
+        :param member_attrs: DataFrame of membership attributes aligned to member_ids
+        :param individual_attrs: DataFrame of individual attributes aligned to individual_ids
+        :param sources: membership node code of every edge (an individual's code for a membership
+        merged into the individual with the same id)
+        :param targets: individual node code of every edge
+        :param edge_attrs: DataFrame of edge attributes aligned to sources/targets
+        """
+        self.member_ids = np.asarray(member_ids)
+        self.individual_ids = np.asarray(individual_ids)
+        self.member_attrs = member_attrs.reset_index(drop=True)
+        self.individual_attrs = individual_attrs.reset_index(drop=True)
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.edge_attrs = edge_attrs.reset_index(drop=True)
+        self.n_members = len(self.member_ids)
+        self.n_nodes = self.n_members + len(self.individual_ids)
+        self._node_ids = None
+        self.indptr, self.indices, self.edge_index = self._build_csr()
+
+    @classmethod
+    def from_frames(cls, ind, mem, edges):
+        """Build the graph straight from the three query frames.
+        Only nodes that appear in the edge list are kept, matching the networkx build.
+        :param ind: DataFrame of the individual table query
+        :param mem: DataFrame of the membership table query
+        :param edges: DataFrame of the edge query (source = MEMBER_NBR, target = INDIVIDUAL_ID)
+        :return: CompactGraph
+        """
+        builder = CompactGraphBuilder()
+        builder.add_edges(edges)
+        return builder.build(ind, mem)
+
+    def _build_csr(self):
+        """Builds the symmetric CSR adjacency from the edge arrays"""
+        n_edges = len(self.sources)
+        rows = np.concatenate([self.sources, self.targets])
+        cols = np.concatenate([self.targets, self.sources])
+        edge_ids = np.concatenate([np.arange(n_edges), np.arange(n_edges)])
+
+        order = np.argsort(rows, kind='stable')
+        counts = np.bincount(rows, minlength=self.n_nodes)
+        indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return indptr, cols[order], edge_ids[order]
+
+    @property
+    def is_individual(self):
+        """Boolean array, True where the node code is an individual"""
+        return np.arange(self.n_nodes) >= self.n_members
+
+    @property
+    def node_ids(self):
+        """Original MEMBER_NBR/INDIVIDUAL_ID for every node code"""
+        if self._node_ids is None:
+            self._node_ids = np.concatenate([self.member_ids, self.individual_ids])
+        return self._node_ids
+
+    def number_of_nodes(self):
+        return self.n_nodes
+
+    def number_of_edges(self):
+        return len(self.sources)
+
+    def __len__(self):
+        return self.n_nodes
+
+    def degree(self):
+        """Degree of every node code"""
+        return np.diff(self.indptr)
+
+    def neighbors(self, code):
+        """Node codes adjacent to a node code"""
+        return self.indices[self.indptr[code]:self.indptr[code + 1]]
+
+    def connected_components(self):
+        """Yields the node codes of each connected component, in order of their lowest code"""
+        labels, sizes = label_components(self.n_nodes, self.sources, self.targets)
+        order = np.argsort(labels, kind='stable')
+        for codes in np.split(order, np.cumsum(sizes)[:-1]):
+            yield codes
+
+    def subgraph(self, codes):
+        """Returns the induced subgraph on the given node codes as a new CompactGraph.
+        Only the edges of those codes are read, through the CSR edge ids, so slicing every
+        network of a graph costs one pass over their edges rather than one per network.
+        :param codes: node codes to keep
+        """
+        codes = np.sort(np.asarray(codes, dtype=np.int64))
+        edge_ids = np.unique(gather_neighbors(self.indptr, self.edge_index, codes))
+        # new code = position in the sorted codes, so memberships still come first
+        sources = np.searchsorted(codes, self.sources[edge_ids])
+        targets = np.searchsorted(codes, self.targets[edge_ids])
+        inside = (codes[np.minimum(sources, len(codes) - 1)] == self.sources[edge_ids]) & \
+                 (codes[np.minimum(targets, len(codes) - 1)] == self.targets[edge_ids])
+        edge_ids = edge_ids[inside]
+
+        member_codes = codes[codes < self.n_members]
+        individual_codes = codes[codes >= self.n_members] - self.n_members
+        return CompactGraph(self.member_ids[member_codes],
+                            self.individual_ids[individual_codes],
+                            self.member_attrs.iloc[member_codes],
+                            self.individual_attrs.iloc[individual_codes],
+                            sources[inside],
+                            targets[inside],
+                            self.edge_attrs.iloc[edge_ids])
+
+    def node_attributes(self):
+        """Returns the membership and individual attribute frames indexed by their original ids
+        :return members: DataFrame of membership attributes
+        :return individuals: DataFrame of individual attributes
+        """
+        members = self.member_attrs.set_axis(self.member_ids.tolist(), axis=0)
+        individuals = self.individual_attrs.set_axis(self.individual_ids.tolist(), axis=0)
+        return members, individuals
+
+    def node_keys(self):
+        """networkx node key of every node code: the original id, unless an individual's id
+        is also a MEMBER_NBR in this graph"""
+        member_keys = self.member_ids.tolist()
+        collides = np.isin(self.individual_ids, self.member_ids)
+        individual_keys = [f'individual {i}' if c else i for i, c in zip(self.individual_ids.tolist(), collides)]
+        return member_keys + individual_keys
+
+    def to_networkx(self):
+        """Export to a networkx Graph keyed by node_keys(), for GEXF and drawing.
+        Nodes are added in code order."""
+        g = nx.Graph()
+        node_ids = self.node_keys()
+        members, individuals = self.node_attributes()
+        for node_type, frame, keys in (('membership', members, node_ids[:self.n_members]),
+                                       ('individual', individuals, node_ids[self.n_members:])):
+            for node, attrs in zip(keys, frame.to_dict('records')):
+                attrs = {k: v for k, v in attrs.items() if not _is_missing(v)}
+                g.add_node(node, **{'type': node_type, **attrs})
+
+        edge_records = self.edge_attrs.to_dict('records')
+        g.add_edges_from((node_ids[s], node_ids[t], attrs)
+                         for s, t, attrs in zip(self.sources, self.targets, edge_records))
+        return g
+
+
+class CompactGraphBuilder:
+    """Accumulates edge chunks and builds a CompactGraph from them.
+    Only the id arrays and edge attributes of each chunk are kept, so chunks can
+    come straight off a database cursor.
+    """
+
+    def __init__(self):
+        self._sources = []
+        self._targets = []
+        self._edge_attrs = []
+
+    def add_edges(self, edges):
+        """:param edges: DataFrame chunk of the edge query (source = MEMBER_NBR, target = INDIVIDUAL_ID)"""
+        self._sources.append(edges['source'].to_numpy())
+        self._targets.append(edges['target'].to_numpy())
+        self._edge_attrs.append(edges.drop(columns=['source', 'target']))
+
+    def node_ids(self):
+        """Distinct MEMBER_NBR and INDIVIDUAL_ID seen so far
+        :return member_ids, individual_ids:
+        """
+        return (pd.unique(np.concatenate(self._sources)) if self._sources else np.array([]),
+                pd.unique(np.concatenate(self._targets)) if self._targets else np.array([]))
+
+    def build(self, ind, mem, separate_ids=None):
+        """Encodes node ids in order of first appearance and builds the graph
+        :param ind: DataFrame of individual attributes, with an INDIVIDUAL_ID column
+        :param mem: DataFrame of membership attributes, with a MEMBER_NBR column
+        :param separate_ids: keep a MEMBER_NBR and an INDIVIDUAL_ID of the same value as two nodes,
+        None for separate_colliding_ids in extraction_settings.py
+        :return: CompactGraph
+        """
+        if separate_ids is None:
+            separate_ids = extraction_settings.separate_colliding_ids
+
+        sources, member_ids = pd.factorize(np.concatenate(self._sources))
+        targets, individual_ids = pd.factorize(np.concatenate(self._targets))
+        edge_attrs = pd.concat(self._edge_attrs, ignore_index=True)
+        # chunks with different categories concatenate to plain columns
+        categories = [c for c, dtype in self._edge_attrs[0].dtypes.items()
+                      if isinstance(dtype, pd.CategoricalDtype)]
+        if categories:
+            edge_attrs = edge_attrs.astype({c: 'category' for c in categories})
+
+        if not separate_ids:
+            # a membership whose id is also an individual's becomes that individual, as in the networkx build
+            merged = pd.Index(individual_ids).get_indexer(member_ids)
+            kept = merged < 0
+            n_members = int(kept.sum())
+            sources = np.where(kept, np.cumsum(kept) - 1, merged + n_members)[sources]
+            member_ids = member_ids[kept]
+        targets = targets + len(member_ids)
+
+        # networkx keeps one edge per pair of nodes, with the attributes of the last one
+        pairs = pd.DataFrame({'low': np.minimum(sources, targets), 'high': np.maximum(sources, targets)})
+        unique = ~pairs.duplicated(keep='last').to_numpy()
+        if not unique.all():
+            sources, targets, edge_attrs = sources[unique], targets[unique], edge_attrs[unique]
+
+        member_attrs = _align_attributes(mem, 'MEMBER_NBR', member_ids)
+        individual_attrs = _align_attributes(ind, 'INDIVIDUAL_ID', individual_ids)
+
+        return CompactGraph(member_ids, individual_ids, member_attrs, individual_attrs, sources, targets, edge_attrs)
+
+
+def label_components(n_nodes, sources, targets):
+    """Vectorized union-find over an edge list.
+    Every round hooks the larger root of each unsatisfied edge onto the smaller one, then
+    pointer-jumps until each node points straight at its root. A root is therefore always
+    the lowest node code of its component.
+    :param n_nodes: number of node codes
+    :param sources: node code of one end of every edge
+    :param targets: node code of the other end of every edge
+    :return labels: component id of every node code, numbered in order of lowest node code
+    :return sizes: node count of every component id
+    """
+    parent = np.arange(n_nodes)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+
+    while len(sources):
+        root_s = parent[sources]
+        root_t = parent[targets]
+        unsatisfied = root_s != root_t
+        if not unsatisfied.any():
+            break
+
+        # edges whose ends already share a root stay that way, so drop them
+        sources = sources[unsatisfied]
+        targets = targets[unsatisfied]
+        lo = np.minimum(root_s[unsatisfied], root_t[unsatisfied])
+        hi = np.maximum(root_s[unsatisfied], root_t[unsatisfied])
+        np.minimum.at(parent, hi, lo)
+
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    is_root = parent == np.arange(n_nodes)
+    root_label = np.cumsum(is_root) - 1
+    labels = root_label[parent]
+    sizes = np.bincount(labels, minlength=int(is_root.sum()))
+    return labels, sizes
+
+
+def gather_neighbors(indptr, indices, rows):
+    """Concatenated CSR neighbor lists of rows, without a Python loop"""
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    offsets = np.cumsum(counts) - counts
+    return indices[np.repeat(starts - offsets, counts) + np.arange(counts.sum())]
+
+
+def _align_attributes(frame, id_column, ids):
+    """Reorders an attribute frame to follow ids, dropping the id column.
+    Ids missing from the frame get a row of missing values."""
+    frame = frame.drop_duplicates(subset=id_column).set_index(id_column)
+    return frame.reindex(ids)
+
+
+def _is_missing(value):
+    """True for NaN/None attribute values, which networkx nodes simply do not carry"""
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def as_networkx(graph_object):
+    """Returns a networkx Graph for either backend"""
+    if isinstance(graph_object, CompactGraph):
+        return graph_object.to_networkx()
+    return graph_object
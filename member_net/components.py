@@ -0,0 +1,192 @@
+import weakref
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from member_net.compact_graph import CompactGraph, label_components
+
+# graph object -> Components, so the labeling pass runs once per graph
+_component_cache = weakref.WeakKeyDictionary()
+
+# graph object -> boolean individual array, so node typing runs once per graph
+_node_type_cache = weakref.WeakKeyDictionary()
+
+# columns of edge_table
+EDGE_COLUMNS = ['MEMBER_NBR', 'INDIVIDUAL_ID', 'PARTICIPATION_TYPE']
+
+
+class Components:
+    """Connected component labels of a graph.
+    :param labels: component id of every node code
+    :param sizes: node count of every component id
+    :param nodes: node keys in code order (networkx backend only)
+    :param edges: (sources, targets) node codes of every edge the labels were found from
+    (networkx backend only, see edge_codes), None if they weren't all read
+    Node codes sorted by component are kept in order, component i spanning offsets[i]:offsets[i + 1].
+    """
+
+    def __init__(self, labels, sizes, nodes=None, edges=None):
+        self.labels = labels
+        self.sizes = sizes
+        self.nodes = nodes
+        self.edges = edges
+        self.order = np.argsort(labels, kind='stable')
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def codes(self, component):
+        """Node codes belonging to a component id"""
+        return self.order[self.offsets[component]:self.offsets[component + 1]]
+
+    def node_keys(self, component):
+        """Graph node keys belonging to a component id"""
+        codes = self.codes(component)
+        if self.nodes is None:
+            return codes
+        return [self.nodes[c] for c in codes]
+
+    def select(self, min_nodes_in_subgraph):
+        """Component ids with at least min_nodes_in_subgraph nodes"""
+        return np.flatnonzero(self.sizes >= min_nodes_in_subgraph)
+
+    def attributes(self):
+        """Summary statistics of the component sizes"""
+        return {'Total Subgraphs': len(self.sizes),
+                'Min Nodes': int(self.sizes.min()),
+                'Max Nodes': int(self.sizes.max()),
+                'Average Nodes': float(self.sizes.mean())
+                }
+
+
+class SubgraphList:
+    """Sequence of subgraphs that are only built when accessed.
+    :param graph_object: the full graph, either backend
+    :param components: Components of graph_object
+    :param selected: component ids to expose, in order
+    """
+
+    def __init__(self, graph_object, components, selected):
+        self.graph_object = graph_object
+        self.components = components
+        self.selected = selected
+
+    def __len__(self):
+        return len(self.selected)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        nodes = self.components.node_keys(self.selected[i])
+        if isinstance(self.graph_object, CompactGraph):
+            return self.graph_object.subgraph(nodes)
+        return _ordered_subgraph(self.graph_object, nodes)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def node_ids(self, i):
+        """Original node ids of the i-th subgraph, without building it"""
+        nodes = self.components.node_keys(self.selected[i])
+        if isinstance(self.graph_object, CompactGraph):
+            return self.graph_object.node_ids[nodes].tolist()
+        return nodes
+
+
+def _ordered_subgraph(graph_object, nodes):
+    """Copy of the subgraph induced by nodes, with nodes in the given order"""
+    sub = nx.Graph()
+    sub.add_nodes_from((n, graph_object.nodes[n]) for n in nodes)
+    sub.add_edges_from(graph_object.subgraph(nodes).edges(data=True))
+    return sub
+
+
+def get_node_types(graph_object):
+    """Boolean array in the node order of get_components, True where the node is an individual.
+    Read from the 'type' attribute the queries emit, once per graph.
+    """
+    cached = _node_type_cache.get(graph_object)
+    if cached is not None and len(cached) == graph_object.number_of_nodes():
+        return cached
+
+    if isinstance(graph_object, CompactGraph):
+        types = graph_object.is_individual
+    else:
+        types = np.fromiter((d.get('type') == 'individual' for n, d in graph_object.nodes(data=True)),
+                            dtype=bool, count=graph_object.number_of_nodes())
+
+    _node_type_cache[graph_object] = types
+    return types
+
+
+def get_degrees(graph_object):
+    """Degree of every node as an array, in the node order of get_components"""
+    if isinstance(graph_object, CompactGraph):
+        return graph_object.degree()
+    return np.fromiter((d for n, d in graph_object.degree()), dtype=np.int64, count=graph_object.number_of_nodes())
+
+
+def set_components(graph_object, components):
+    """Caches Components labelled elsewhere (see update_components in incremental.py), so
+    get_components returns them for this graph"""
+    shape = (graph_object.number_of_nodes(), graph_object.number_of_edges())
+    _component_cache[graph_object] = (shape, components)
+
+
+def edge_codes(graph_object, nodes):
+    """Node codes of both ends of every edge of a networkx graph, in one pass over its edges
+    :param nodes: node keys in code order
+    :return sources, targets:
+    """
+    node_index = {n: i for i, n in enumerate(nodes)}
+    n_edges = graph_object.number_of_edges()
+    sources = np.fromiter((node_index[u] for u, v in graph_object.edges()), dtype=np.int64, count=n_edges)
+    targets = np.fromiter((node_index[v] for u, v in graph_object.edges()), dtype=np.int64, count=n_edges)
+    return sources, targets
+
+
+def edge_table(graph_object):
+    """The participation edges of a graph as MEMBER_NBR, INDIVIDUAL_ID, PARTICIPATION_TYPE"""
+    if isinstance(graph_object, CompactGraph):
+        node_ids = graph_object.node_ids
+        return pd.DataFrame({'MEMBER_NBR': node_ids[graph_object.sources],
+                             'INDIVIDUAL_ID': node_ids[graph_object.targets],
+                             'PARTICIPATION_TYPE': graph_object.edge_attrs['PARTICIPATION_TYPE'].to_numpy()})
+
+    rows = []
+    for u, v, data in graph_object.edges(data=True):
+        u_individual = graph_object.nodes[u].get('type') == 'individual'
+        v_individual = graph_object.nodes[v].get('type') == 'individual'
+        # a membership merged into the individual of the same id leaves both ends individuals,
+        # which are put in id order so the edge reads the same whichever way networkx yields it
+        if u_individual and (not v_individual or str(v) < str(u)):
+            u, v = v, u
+        rows.append((u, v, data.get('PARTICIPATION_TYPE')))
+    return pd.DataFrame(rows, columns=EDGE_COLUMNS)
+
+
+def get_components(graph_object):
+    """Labels the connected components of a graph in a single pass over its edge list.
+    The result is cached against the graph object until its node or edge count changes.
+    :param graph_object: networkx Graph or CompactGraph
+    :return: Components
+    """
+    shape = (graph_object.number_of_nodes(), graph_object.number_of_edges())
+    cached = _component_cache.get(graph_object)
+    if cached is not None and cached[0] == shape:
+        return cached[1]
+
+    if isinstance(graph_object, CompactGraph):
+        labels, sizes = label_components(graph_object.n_nodes, graph_object.sources, graph_object.targets)
+        components = Components(labels, sizes)
+    else:
+        nodes = list(graph_object)
+        sources, targets = edge_codes(graph_object, nodes)
+        labels, sizes = label_components(len(nodes), sources, targets)
+        # kept for the metrics, which would otherwise read the edges again
+        components = Components(labels, sizes, nodes, (sources, targets))
+
+    _component_cache[graph_object] = (shape, components)
+    return components
@@ -0,0 +1,173 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+import config.sql_queries as sql_queries  # sql_queries.py file
+import config.server_details as server_details  # server_details.py file
+import config.extraction_settings as extraction_settings  # extraction_settings.py file
+
+
+def connect(db_type, shared=False):
+    """Opens a connection to either the sqlite demo db or the datamart
+    :param db_type: sqlite or datamart
+    :param shared: True if the connection may be handed between threads (one at a time), as
+    ConnectionPool does. sqlite refuses that unless told otherwise.
+    :return: DB-API connection
+    """
+    # These variables should be updated in the server_details.py file
+    # sqlite_location = 'demo_data.db'
+    # MSSQL_server_name = 'xxxx'
+    # datamart_name = 'xxxx'
+
+    if db_type == 'sqlite':
+        import sqlite3
+        return sqlite3.connect(server_details.sqlite_location, check_same_thread=not shared)
+
+    elif db_type == 'datamart':
+        import pyodbc
+        try:
+            return pyodbc.connect('Driver={SQL Server};'
+                                  'Server=' + str(server_details.MSSQL_server_name) + ';'
+                                  'Database=' + str(server_details.datamart_name) + ';'
+                                  'Trusted_Connection=yes;')
+
+        except:
+            raise ValueError("Unable to connect to datamart")
+
+    else:
+        raise ValueError("Please specify 'sqlite' or 'datamart'")
+
+
+def configure_cursor(cursor, arraysize=None):
+    """Sets a cursor up for bulk transfers: arraysize rows per fetchmany round trip, and
+    pyodbc's fast_executemany for parameter arrays where the driver has it
+    :return: the cursor
+    """
+    cursor.arraysize = arraysize or extraction_settings.fetch_arraysize
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
+    return cursor
+
+
+class ConnectionPool:
+    """A fixed number of connections to one database, opened on first use and reused until
+    close. Each connection is used by one thread at a time, so queries can run side by side
+    on separate connections. Use it as a context manager so the connections are always closed:
+
+        with ConnectionPool('sqlite', size=3) as pool:
+            with pool.connection() as conn:
+                ...
+
+    :param db_type: sqlite or datamart
+    :param size: most connections open at once. connection() waits for a free one beyond that
+    """
+
+    def __init__(self, db_type, size=None):
+        self.db_type = db_type
+        self.size = max(1, size or extraction_settings.pool_size)
+        self.closed = False
+        self._idle = queue.LifoQueue()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes an idle connection, opens a new one while under size, or waits for one to be released"""
+        if self.closed:
+            raise ValueError('Connection pool is closed')
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._opened) < self.size:
+                conn = connect(self.db_type, shared=True)
+                self._opened.append(conn)
+                return conn
+        return self._idle.get()
+
+    def release(self, conn):
+        """Hands a connection back for reuse, rolling back anything left open on it"""
+        if self.closed:
+            return
+        try:
+            conn.rollback()
+        except Exception:
+            # a broken connection is dropped, a new one is opened in its place
+            with self._lock:
+                self._opened.remove(conn)
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection for the duration of the with block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Closes every connection the pool opened"""
+        with self._lock:
+            self.closed = True
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def extraction_queries(db_type, projected=False, pushdown=False):
+    """The individual, membership and edge queries for a database
+    :param db_type: sqlite or datamart
+    :param projected: True for the column-projected queries used by the streaming loader
+    :param pushdown: True to only extract the participations (and their nodes) that can belong to
+    networks of 3 or more nodes, see the pushdown queries in sql_queries.py
+    :return: individual query, membership query, edge query
+    """
+    if db_type == 'sqlite':
+        if projected:
+            queries = (sql_queries.sqlite_projected_individual_query, sql_queries.sqlite_projected_member_query,
+                       sql_queries.sqlite_edge_query)
+        else:
+            queries = (sql_queries.sqlite_node_individual_query, sql_queries.sqlite_member_individual_query,
+                       sql_queries.sqlite_edge_query)
+        candidate_edges = sql_queries.sqlite_candidate_edge_query
+
+    elif db_type == 'datamart':
+        if projected:
+            queries = (sql_queries.ms_sql_projected_individual_query, sql_queries.ms_sql_projected_member_query,
+                       sql_queries.ms_sql_edge_query)
+        else:
+            queries = (sql_queries.ms_sql_node_individual_query, sql_queries.ms_sql_member_individual_query,
+                       sql_queries.ms_sql_edge_query)
+        candidate_edges = sql_queries.ms_sql_candidate_edge_query
+
+    else:
+        raise ValueError("Please specify 'sqlite' or 'datamart'")
+
+    if not pushdown:
+        return queries
+    individual_query, member_query, _ = queries
+    return (_only_nodes_of(individual_query, 'individual_id', 'target', candidate_edges),
+            _only_nodes_of(member_query, 'member_nbr', 'source', candidate_edges),
+            candidate_edges)
+
+
+def _only_nodes_of(node_query, id_column, edge_column, edge_query):
+    """Adds a WHERE clause to a node query so it only returns the nodes at one end of the edges
+    of edge_query. The clause is appended rather than wrapping the query in a subquery, which
+    would change the case of the column names sqlite reports.
+    """
+    return (f'{node_query.rstrip()}\n'
+            f'WHERE {id_column} IN (SELECT edges.{edge_column} FROM ({edge_query}) edges)\n')
+
@@ -0,0 +1,316 @@
+import gzip
+from datetime import datetime
+from functools import reduce
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from member_net.compact_graph import CompactGraph
+from member_net.components import edge_table
+
+# nodes or edges formatted per write
+CHUNKSIZE = 10000
+
+# xml escapes for attribute values, on top of &, < and >
+_QUOTES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+
+
+def write_gexf(graph_object, path, chunksize=CHUNKSIZE):
+    """Writes the graph to a GEXF file Gephi can open, a chunk of nodes or edges at a time.
+    Attributes are read straight from the columnar tables of a CompactGraph, so no networkx
+    graph or xml tree of the whole graph is built. A path ending in .gz is gzip compressed.
+    :param graph_object: networkx Graph or CompactGraph
+    :param path: file to write
+    :param chunksize: nodes or edges formatted at once
+    """
+    _write_xml(graph_object, path, chunksize, _GEXF)
+
+
+def write_graphml(graph_object, path, chunksize=CHUNKSIZE):
+    """Writes the graph to a GraphML file, streamed the same way as write_gexf"""
+    _write_xml(graph_object, path, chunksize, _GRAPHML)
+
+
+def write_tables(graph_object, prefix, file_format='parquet'):
+    """Writes the graph as three flat tables for other programs: memberships, individuals and
+    participations (MEMBER_NBR, INDIVIDUAL_ID, PARTICIPATION_TYPE). Ids are the original
+    MEMBER_NBR/INDIVIDUAL_ID, so colliding ids stay unambiguous.
+    :param graph_object: networkx Graph or CompactGraph
+    :param prefix: path and start of the file names
+    :param file_format: 'parquet' (needs pyarrow, falls back to csv without it) or 'csv'
+    :return: list of the paths written
+    """
+    if file_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print('pyarrow is not installed, saving the graph tables as csv')
+            file_format = 'csv'
+
+    if isinstance(graph_object, CompactGraph):
+        members, individuals = graph_object.node_attributes()
+    else:
+        members, individuals = (_records_frame(graph_object, t) for t in ('membership', 'individual'))
+    members, individuals = (frame.drop(columns=['type'], errors='ignore') for frame in (members, individuals))
+    tables = {'memberships': members.rename_axis('MEMBER_NBR').reset_index(),
+              'individuals': individuals.rename_axis('INDIVIDUAL_ID').reset_index(),
+              'participations': edge_table(graph_object)}
+
+    paths = []
+    for name, frame in tables.items():
+        path = f'{prefix} {name}.{file_format}'
+        if file_format == 'parquet':
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def _records_frame(graph_object, node_type):
+    """Attribute frame indexed by node id of the networkx nodes of one type"""
+    nodes = [(n, d) for n, d in graph_object.nodes(data=True) if d.get('type') == node_type]
+    return pd.DataFrame.from_records([d for n, d in nodes], index=[n for n, d in nodes])
+
+
+def _open(path):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'wt', compresslevel=6, encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def _write_xml(graph_object, path, chunksize, fmt):
+    """Writes the header, node chunks, edge chunks and footer of one xml format"""
+    node_types, edge_types = _attribute_types(graph_object)
+    with _open(path) as f:
+        f.write(fmt.header(node_types, edge_types))
+        f.write(fmt.open_nodes)
+        for keys, frame in _node_chunks(graph_object, chunksize):
+            f.write(''.join(fmt.nodes(keys, frame, node_types)))
+        f.write(fmt.close_nodes)
+
+        f.write(fmt.open_edges)
+        edge_id = 0
+        for sources, targets, frame in _edge_chunks(graph_object, chunksize):
+            f.write(''.join(fmt.edges(sources, targets, frame, edge_types, edge_id)))
+            edge_id += len(sources)
+        f.write(fmt.close_edges)
+        f.write(fmt.footer)
+
+
+def _attribute_types(graph_object):
+    """Name -> xml type of every node and edge attribute, in a fixed order
+    :return node_types, edge_types: dicts of 'long', 'double', 'boolean' or 'string'
+    """
+    if isinstance(graph_object, CompactGraph):
+        node_types = {}
+        for frame in (graph_object.member_attrs, graph_object.individual_attrs):
+            for c in frame.columns:
+                _widen(node_types, c, _dtype_type(frame[c]))
+        node_types['type'] = 'string'
+        edge_types = {c: _dtype_type(graph_object.edge_attrs[c]) for c in graph_object.edge_attrs.columns}
+    else:
+        node_types = _scan_types(data for n, data in graph_object.nodes(data=True))
+        edge_types = _scan_types(data for u, v, data in graph_object.edges(data=True))
+    return node_types, edge_types
+
+
+def _scan_types(records):
+    """Widest xml type of every key over attribute dicts"""
+    types = {}
+    for data in records:
+        for k, v in data.items():
+            _widen(types, k, _value_type(v))
+    return types
+
+
+def _widen(types, name, xml_type):
+    """Records xml_type for name. long and double widen to double, any other mix to string"""
+    seen = types.setdefault(name, xml_type)
+    if seen != xml_type:
+        types[name] = 'double' if {seen, xml_type} == {'long', 'double'} else 'string'
+
+
+def _dtype_type(series):
+    if pd.api.types.is_bool_dtype(series):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(series):
+        return 'long'
+    if pd.api.types.is_float_dtype(series):
+        return 'double'
+    return 'string'
+
+
+def _value_type(value):
+    if isinstance(value, (bool, np.bool_)):
+        return 'boolean'
+    if isinstance(value, (int, np.integer)):
+        return 'long'
+    if isinstance(value, (float, np.floating)):
+        return 'double'
+    return 'string'
+
+
+def _node_chunks(graph_object, chunksize):
+    """Yields (node keys, attribute frame) per chunk of nodes, labels included"""
+    if isinstance(graph_object, CompactGraph):
+        keys = graph_object.node_keys()
+        for node_type, frame, offset in (('membership', graph_object.member_attrs, 0),
+                                         ('individual', graph_object.individual_attrs, graph_object.n_members)):
+            for start in range(0, len(frame), chunksize):
+                chunk = frame.iloc[start:start + chunksize].assign(type=node_type)
+                yield keys[offset + start:offset + start + len(chunk)], chunk
+    else:
+        nodes = list(graph_object)
+        for start in range(0, len(nodes), chunksize):
+            chunk = nodes[start:start + chunksize]
+            yield chunk, pd.DataFrame.from_records([graph_object.nodes[n] for n in chunk])
+
+
+def _edge_chunks(graph_object, chunksize):
+    """Yields (source keys, target keys, attribute frame) per chunk of edges"""
+    if isinstance(graph_object, CompactGraph):
+        keys = np.array(graph_object.node_keys(), dtype=object)
+        for start in range(0, graph_object.number_of_edges(), chunksize):
+            stop = start + chunksize
+            yield (keys[graph_object.sources[start:stop]], keys[graph_object.targets[start:stop]],
+                   graph_object.edge_attrs.iloc[start:stop])
+    else:
+        edges = graph_object.edges(data=True)
+        chunk = []
+        for edge in edges:
+            chunk.append(edge)
+            if len(chunk) == chunksize:
+                yield [e[0] for e in chunk], [e[1] for e in chunk], pd.DataFrame.from_records([e[2] for e in chunk])
+                chunk = []
+        if chunk:
+            yield [e[0] for e in chunk], [e[1] for e in chunk], pd.DataFrame.from_records([e[2] for e in chunk])
+
+
+def _format_values(series, xml_type):
+    """Values as xml attribute text, None where missing"""
+    present = series.dropna()
+    if xml_type == 'long':
+        text = present.astype('int64').astype(str)
+    elif xml_type == 'double':
+        text = present.astype(float).astype(str)
+    elif xml_type == 'boolean':
+        text = present.astype(bool).map({True: 'true', False: 'false'})
+    else:
+        text = present.astype(str).map(_escape)
+    return text.reindex(series.index)
+
+
+def _escape(value):
+    return escape(str(value), _QUOTES)
+
+
+def _attribute_text(frame, types, template):
+    """One string of formatted attribute elements per row of frame
+    :param template: format string with {key} and {value} for one attribute element
+    """
+    parts = []
+    for key, (name, xml_type) in enumerate(types.items()):
+        if name not in frame.columns:
+            continue
+        values = _format_values(frame[name].reset_index(drop=True), xml_type)
+        prefix, suffix = template.format(key=key, value='\0').split('\0')
+        parts.append((prefix + values + suffix).fillna(''))
+    if not parts:
+        return [''] * len(frame)
+    return reduce(lambda a, b: a + b, parts).tolist()
+
+
+def _labels(keys, frame):
+    if 'label' not in frame.columns:
+        return [_escape(k) for k in keys]
+    return [_escape(k if pd.isna(label) else label) for k, label in zip(keys, frame['label'].tolist())]
+
+
+class _GexfFormat:
+    open_nodes = '    <nodes>\n'
+    close_nodes = '    </nodes>\n'
+    open_edges = '    <edges>\n'
+    close_edges = '    </edges>\n'
+    footer = '  </graph>\n</gexf>\n'
+
+    @staticmethod
+    def header(node_types, edge_types):
+        lines = ["<?xml version='1.0' encoding='utf-8'?>",
+                 '<gexf xmlns="http://www.gexf.net/1.2draft" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                 'xsi:schemaLocation="http://www.gexf.net/1.2draft http://www.gexf.net/1.2draft/gexf.xsd" '
+                 'version="1.2">',
+                 f'  <meta lastmodifieddate="{datetime.now().date().isoformat()}">',
+                 '    <creator>CU member networks</creator>',
+                 '  </meta>',
+                 '  <graph defaultedgetype="undirected" mode="static" name="">',
+                 '    <attributes mode="static" class="edge">']
+        lines += [f'      <attribute id="{i}" title="{_escape(n)}" type="{t}" />' for i, (n, t) in
+                  enumerate(edge_types.items())]
+        lines += ['    </attributes>', '    <attributes mode="static" class="node">']
+        lines += [f'      <attribute id="{i}" title="{_escape(n)}" type="{t}" />' for i, (n, t) in
+                  enumerate(_gexf_node_types(node_types).items())]
+        lines += ['    </attributes>']
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def nodes(keys, frame, node_types):
+        values = _attribute_text(frame, _gexf_node_types(node_types),
+                                 '          <attvalue for="{key}" value="{value}" />\n')
+        for key, label, attvalues in zip(keys, _labels(keys, frame), values):
+            if attvalues:
+                yield (f'      <node id="{_escape(key)}" label="{label}">\n        <attvalues>\n{attvalues}'
+                       f'        </attvalues>\n      </node>\n')
+            else:
+                yield f'      <node id="{_escape(key)}" label="{label}" />\n'
+
+    @staticmethod
+    def edges(sources, targets, frame, edge_types, first_id):
+        values = _attribute_text(frame, edge_types, '          <attvalue for="{key}" value="{value}" />\n')
+        for i, (u, v, attvalues) in enumerate(zip(sources, targets, values), first_id):
+            edge = f'      <edge source="{_escape(u)}" target="{_escape(v)}" id="{i}"'
+            if attvalues:
+                yield f'{edge}>\n        <attvalues>\n{attvalues}        </attvalues>\n      </edge>\n'
+            else:
+                yield f'{edge} />\n'
+
+
+def _gexf_node_types(node_types):
+    """GEXF carries the label on the node element itself"""
+    return {n: t for n, t in node_types.items() if n != 'label'}
+
+
+class _GraphmlFormat:
+    open_nodes = close_nodes = open_edges = close_edges = ''
+    footer = '  </graph>\n</graphml>\n'
+
+    @staticmethod
+    def header(node_types, edge_types):
+        lines = ["<?xml version='1.0' encoding='utf-8'?>",
+                 '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+                 'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                 'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+                 'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">']
+        lines += [f'  <key id="n{i}" for="node" attr.name="{_escape(n)}" attr.type="{t}" />' for i, (n, t) in
+                  enumerate(node_types.items())]
+        lines += [f'  <key id="e{i}" for="edge" attr.name="{_escape(n)}" attr.type="{t}" />' for i, (n, t) in
+                  enumerate(edge_types.items())]
+        lines += ['  <graph edgedefault="undirected">']
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def nodes(keys, frame, node_types):
+        values = _attribute_text(frame, node_types, '      <data key="n{key}">{value}</data>\n')
+        for key, data in zip(keys, values):
+            yield f'    <node id="{_escape(key)}">\n{data}    </node>\n'
+
+    @staticmethod
+    def edges(sources, targets, frame, edge_types, first_id):
+        values = _attribute_text(frame, edge_types, '      <data key="e{key}">{value}</data>\n')
+        for u, v, data in zip(sources, targets, values):
+            yield f'    <edge source="{_escape(u)}" target="{_escape(v)}">\n{data}    </edge>\n'
+
+
+_GEXF = _GexfFormat()
+_GRAPHML = _GraphmlFormat()
@@ -1,9 +1,31 @@
+import traceback
 from tkinter import *
 from tkinter import ttk
 from matplotlib.backends.backend_tkagg import (
     FigureCanvasTkAgg)  # , NavigationToolbar2Tk
 from matplotlib.figure import Figure
+import numpy as np
 from member_net.member_net_functions import *
+from member_net.components import get_components, get_degrees
+from member_net.background import BackgroundTask
+
+
+# bars per histogram
+HISTOGRAM_BINS = 10
+
+
+def binned_counts(counts, minimum, bins=HISTOGRAM_BINS):
+    """Histogram of a count array (counts[v] = number of times value v occurs) from minimum up
+    :return edges: bins + 1 bin edges
+    :return heights: total count in every bin
+    """
+    values = np.arange(len(counts))
+    keep = values >= minimum
+    if not keep.any() or counts[keep].sum() == 0:
+        return np.linspace(minimum, minimum + 1, bins + 1), np.zeros(bins)
+    values = values[keep][counts[keep] > 0]
+    heights, edges = np.histogram(values, bins=bins, weights=counts[values])
+    return edges, heights
 
 
 class GraphJob:
@@ -12,100 +34,179 @@ class GraphJob:
         self.db_type = None
         self.n = None
         self.ind = None
-        self.subgraph_count = [0]
+        self.subgraph_count = np.zeros(1, dtype=np.int64)
         self.max_subgraph = 0
         self.max_degree = 0
         self.min_degree = 1
         self.min_connections = 2
         self.canvas = None
         self.top = None
-        self.degree = None
-        self.degrees = None
+        self.degrees = np.zeros(1, dtype=np.int64)
+        self.profile = None
+        self.task = None
 
     def make_graph(self):
-        self.G, self.ind = generate_member_graph(self.db_type)
+        self.profile = RunProfile(profile_settings.trace_memory)
+        self.G, self.ind = generate_member_graph(self.db_type, profile=self.profile)
 
     def count_subgraphs(self):
-        s = [self.G.subgraph(c).copy() for c in nx.connected_components(self.G)]
-        cc = []
-        for subgraph in s:
-            cc.append(len(nx.nodes(subgraph)))
-        self.subgraph_count = cc
-        self.max_subgraph = max(cc)
+        # number of networks of every size, indexed by size
+        self.subgraph_count = np.bincount(get_components(self.G).sizes)
+        self.max_subgraph = len(self.subgraph_count) - 1
 
     def count_degrees(self):
-        self.degree = nx.degree(self.G)
-        self.degrees = [node[1] for node in self.degree]
-        self.max_degree = max(self.degrees)
+        # number of nodes with every degree, indexed by degree
+        self.degrees = np.bincount(get_degrees(self.G))
+        self.max_degree = len(self.degrees) - 1
 
     def print_both_histograms(self):
         # New window
         self.top = Toplevel(root)
 
-        # two frames so the graphs don't print on top of eachother
-        f1 = Frame(self.top)
-        f2 = Frame(self.top)
-
-        # filter histogram by min specified in menu
-        print_degrees = [d for d in self.degrees if d >= self.min_degree]
-        print_subgraph = [s for s in self.subgraph_count if s>= self.min_connections]
-
         ###############################################################
         # DEGREES
         ###############################################################
         self.fig1 = Figure(figsize=(5, 4), dpi=100)
-        self.fig1.add_subplot(xlabel='Degrees (number of connections)', ylabel='Count').hist(
-            print_degrees,
-            bins=10,
-            rwidth=.9)
+        self.ax1 = self.fig1.add_subplot(xlabel='Degrees (number of connections)', ylabel='Count')
+        self.bars1 = self.ax1.bar(np.zeros(HISTOGRAM_BINS), np.zeros(HISTOGRAM_BINS), align='edge')
         self.fig1.suptitle('Degrees (connections) per Membership/Individual', fontsize=12)
         self.canvas1 = FigureCanvasTkAgg(self.fig1, master=self.top)
-        self.canvas1.draw_idle()
 
         ########################################################################
         # SUBGRAPHS
         #######################################################################
         self.fig = Figure(figsize=(5, 4), dpi=100)
-        self.fig.add_subplot(xlabel='Size (total individuals/memberships in a network)', ylabel='Count').hist(
-            print_subgraph, bins=10, rwidth=.9)
+        self.ax = self.fig.add_subplot(xlabel='Size (total individuals/memberships in a network)', ylabel='Count')
+        self.bars = self.ax.bar(np.zeros(HISTOGRAM_BINS), np.zeros(HISTOGRAM_BINS), align='edge')
         self.fig.suptitle('Network Sizes', fontsize=12)
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.top)
-        self.canvas.draw_idle()
+
+        self.draw_histograms()
 
         # display
         self.canvas1.get_tk_widget().grid(column = 1, row=1)
         self.canvas.get_tk_widget().grid(column=2, row=1)
 
-    def update_histograms(self):
-        # Destroy window and recreate
-        self.top.destroy()
+    def draw_histograms(self):
+        """Sets the existing bars to the counts at or above the min selections"""
+        for ax, bars, canvas, counts, minimum in ((self.ax1, self.bars1, self.canvas1, self.degrees, self.min_degree),
+                                                  (self.ax, self.bars, self.canvas, self.subgraph_count,
+                                                   self.min_connections)):
+            edges, heights = binned_counts(counts, minimum)
+            width = (edges[1] - edges[0]) * .9
+            for bar, left, height in zip(bars, edges, heights):
+                bar.set_x(left)
+                bar.set_width(width)
+                bar.set_height(height)
+            ax.set_xlim(edges[0], edges[-1])
+            ax.set_ylim(0, max(heights.max(), 1) * 1.05)
+            canvas.draw_idle()
 
+    def update_histograms(self):
         # Update min selections
-        self.min_degree = h1_select.current()
-        self.min_connections = h2_select.current()
+        self.min_degree = int(h1_select.get() or self.min_degree)
+        self.min_connections = int(h2_select.get() or self.min_connections)
 
-        # rerun histogram
-        self.print_both_histograms()
+        # recreate the window if it was closed, otherwise redraw it in place
+        if self.top is None or not self.top.winfo_exists():
+            self.print_both_histograms()
+        else:
+            self.draw_histograms()
 
     def update_menus(self):
-        n_selected['values'] = list(range(self.max_subgraph))
-        h1_select['values'] = list(range(self.max_degree))
-        h2_select['values'] = list(range(self.max_subgraph))
+        # only the sizes and degrees that occur
+        sizes = np.flatnonzero(self.subgraph_count).tolist()
+        n_selected['values'] = sizes
+        h1_select['values'] = np.flatnonzero(self.degrees).tolist()
+        h2_select['values'] = sizes
+
+    def busy(self):
+        """True while a background job is running, so a second click doesn't start another"""
+        if self.task is not None and self.task.running:
+            print('Please wait for the current job to finish, or cancel it')
+            return True
+        return False
+
+    def start_task(self, target, on_done, message):
+        """Runs target on a background thread with the progress bar and cancel button hooked up"""
+        status_text.set(message)
+        progress_bar.configure(mode='indeterminate', value=0)
+        progress_bar.start(10)
+        cancel_button.configure(state=NORMAL)
+        self.task = BackgroundTask(root, target, on_done=lambda result: self.finish_task(on_done, result),
+                                   on_error=self.task_failed, on_progress=self.show_progress).start()
+
+    def show_progress(self, done, total, text):
+        if text:
+            status_text.set(text)
+        if total:
+            progress_bar.stop()
+            progress_bar.configure(mode='determinate', maximum=total, value=done)
+            status_text.set(f'{text or "Rendering pdfs"}: {done} of {total}')
+
+    def finish_task(self, on_done, result):
+        progress_bar.stop()
+        progress_bar.configure(mode='determinate', value=progress_bar['maximum'])
+        cancel_button.configure(state=DISABLED)
+        on_done(result)
+
+    def task_failed(self, error):
+        progress_bar.stop()
+        progress_bar.configure(mode='determinate', value=0)
+        cancel_button.configure(state=DISABLED)
+        if isinstance(error, Cancelled):
+            status_text.set(str(error))
+            print(error)
+        else:
+            status_text.set(f'Failed: {error}. See terminal for details.')
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def cancel(self):
+        if self.task is not None and self.task.running:
+            status_text.set('Cancelling...')
+            self.task.cancel()
 
     def initialize_db_and_graph(self, event):
+        if self.busy():
+            return
         selection = db_selected.current()
         label = db_selected['values'][selection]
         self.db_type = label
+        self.start_task(self.load_graph, self.graph_loaded, f'Loading {label} and building the graph...')
+
+    def load_graph(self, task):
+        """Background part of initialize: query, build and count"""
         self.make_graph()
+        task.check_cancelled()
+        task.status('Counting networks and connections...')
         self.count_subgraphs()
         self.count_degrees()
+
+    def graph_loaded(self, result):
+        """Tk part of initialize, once the graph is built"""
+        if self.top is not None and self.top.winfo_exists():
+            self.top.destroy()
         self.print_both_histograms()
         self.update_menus()
+        status_text.set(f'{self.G.number_of_nodes()} nodes loaded, select a size and execute')
         print(self.db_type, self.ind)
 
     def execute(self, event):
-        self.n = n_selected.current()
-        multi = get_subgraphs(self.G, self.n)
+        if self.busy():
+            return
+        if self.G is None:
+            print('Please initialize a database first')
+            return
+        # widgets are only read on the Tk thread
+        self.n = int(n_selected.get() or 0)
+        workers = int(workers_selected.get() or 1)
+        self.start_task(lambda task: self.export(task, workers), self.exported, 'Beginning export...')
+
+    def export(self, task, workers):
+        """Background part of execute: every pdf, table and the gexf"""
+        profile = self.profile or RunProfile(profile_settings.trace_memory)
+        with profile.stage('components'):
+            multi = get_subgraphs(self.G, self.n)
         check_output()
 
         # Message
@@ -115,24 +216,38 @@ class GraphJob:
         print(f'To change export location, edit output_locations.py in the config folder')
         print('#'*30)
         print('Generating graphics..')
+        task.status('Generating graphics...')
 
-        subnetwork_df, columns, igroup, mgroup = subgraph_output(multi, self.ind)
+        subnetwork_df, columns, igroup, mgroup = subgraph_output(multi, self.ind, workers=workers, profile=profile,
+                                                                 progress=task.progress, cancel=task.cancel_event)
 
         # Export member/individual/group to csv
         print('Generating member/individual and group tables...')
-        output_csvs(igroup, mgroup)
+        task.status('Generating member/individual and group tables...')
+        with profile.stage('csv output'):
+            output_csvs(igroup, mgroup)
 
         # Export summary spreadsheet
         print('Generating summary spreadsheet...')
-        output_excel(subnetwork_df, columns)
+        task.status('Generating summary spreadsheet...')
+        with profile.stage('excel output'):
+            output_excel(subnetwork_df, columns)
 
         # Export gexf
         print('Generating gexf...')
-        nx.write_gexf(self.G, f'{output_location}//{gephx_filename}{timestamp}.gexf')
+        task.status('Generating gexf...')
+        with profile.stage('gexf output'):
+            output_graph(self.G)
 
+        output_run_report(profile)
+        # the next export gets a fresh report, the graph is already loaded
+        self.profile = None
+
+    def exported(self, result):
         print(f'Spreadsheet saved as Member subnetworks - {timestamp}.xlsx in the output directory:{output_location}.')
         print(f'GEXF file saved as Total membership networks - {timestamp}.gexf in the output directory:{output_location}.')
         print('Done!')
+        status_text.set(f'Done! Files saved in {output_location}')
 
 ################################################################
 # THE GUI
@@ -144,13 +259,14 @@ job = GraphJob()
 # Set up root object
 root = Tk()
 root.title('Credit Union Member Network Analyzer')
-root.geometry('400x350')
+root.geometry('400x420')
 db_frame = Frame(root)
 hist_frame = Frame(root)
 last_frame = Frame(root)
 welcome_frame = Frame(root)
 optional_frame = Frame(root)
 select_n_frame = Frame(root)
+progress_frame = Frame(root)
 
 # Welcome message
 welcome_message = Label(welcome_frame, text = 'See terminal for status and error messages.')
@@ -193,6 +309,13 @@ n_selected = ttk.Combobox(last_frame, width=5, textvariable=n)
 n_selected['values'] = list(range(job.max_subgraph))
 n_selected.current()
 
+# Rendering processes
+workers_label = Label(last_frame, text='Render processes')
+w = StringVar()
+workers_selected = ttk.Combobox(last_frame, width=5, textvariable=w)
+workers_selected['values'] = list(range(1, (os.cpu_count() or 1) + 1))
+workers_selected.current(0)
+
 # Exit buttons
 exit_button = Button(last_frame, text='        Exit        ', bd='5', command=root.destroy)
 
@@ -200,6 +323,12 @@ exit_button = Button(last_frame, text='        Exit        ', bd='5', command=ro
 execute_button = Button(last_frame, text='4) Execute', bd='5')
 execute_button.bind("<Button-1>", job.execute)
 
+# Progress
+status_text = StringVar(value='Select a database to begin')
+status_label = Label(progress_frame, textvariable=status_text, wraplength=380)
+progress_bar = ttk.Progressbar(progress_frame, orient=HORIZONTAL, length=280, mode='determinate')
+cancel_button = Button(progress_frame, text='Cancel', bd='5', state=DISABLED, command=job.cancel)
+
 #############################################################################
 # WIDGET LAYOUT
 #############################################################################
@@ -210,6 +339,7 @@ optional_frame.grid(row=3, column=1)
 hist_frame.grid(row=4, column=1)
 select_n_frame.grid(row=5, column=1)
 last_frame.grid(row=6, column=1)
+progress_frame.grid(row=7, column=1, pady=10)
 
 # top third
 welcome_message.grid(column=1, row=1, sticky=W)
@@ -229,4 +359,11 @@ hist_update.grid(column=3, row=3, sticky=W)
 select_n_message.grid(column=1, row=1, pady=10)
 n_selected.grid(column=1, row=1, sticky=W)
 execute_button.grid(column=2, row=1, sticky=W)
-exit_button.grid(column=1, row=9, sticky=W, pady=30)
\ No newline at end of file
+workers_selected.grid(column=1, row=2, sticky=W)
+workers_label.grid(column=2, row=2, sticky=W)
+exit_button.grid(column=1, row=9, sticky=W, pady=30)
+
+# progress
+status_label.grid(column=1, row=1, columnspan=2, sticky=W)
+progress_bar.grid(column=1, row=2, sticky=W)
+cancel_button.grid(column=2, row=2, sticky=W)
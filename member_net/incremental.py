@@ -0,0 +1,227 @@
+import os
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from member_net.cache import cache_path, network_key
+from member_net.centers import CenterCache
+from member_net.compact_graph import CompactGraph, gather_neighbors, label_components
+from member_net.components import EDGE_COLUMNS, Components, edge_table, get_components, set_components
+
+
+def diff_edges(previous, current):
+    """Edges added and removed between two edge tables
+    :return added, removed: DataFrames of EDGE_COLUMNS
+    """
+    merged = previous.merge(current, on=EDGE_COLUMNS, how='outer', indicator=True)
+    added = merged.loc[merged['_merge'] == 'right_only', EDGE_COLUMNS]
+    removed = merged.loc[merged['_merge'] == 'left_only', EDGE_COLUMNS]
+    return added, removed
+
+
+def plain_array(values):
+    """Values as an array numpy saves without pickling: numbers keep their dtype, anything
+    else (text, mixed or missing codes) is stored as text"""
+    array = np.asarray(values)
+    return array.astype(str) if array.dtype == object else array
+
+
+def update_components(graph_object, previous, touched):
+    """Components of a graph, relabelling only what changed since the previous run: the previous
+    components holding a node touched by an added or removed edge, and the nodes that are new.
+    Every other component kept all its edges, so it keeps its nodes. Components are numbered
+    in order of their lowest node code, as get_components numbers them.
+    :param previous: the previous run's state, with the node ids and their component label
+    :param touched: ids of the nodes at either end of an added or removed edge
+    :return: Components, or None when node ids aren't unique (separate_colliding_ids)
+    """
+    compact = isinstance(graph_object, CompactGraph)
+    nodes = graph_object.node_ids if compact else list(graph_object)
+    node_index = pd.Index(nodes)
+    previous_index = pd.Index(previous['node_ids'])
+    if not (node_index.is_unique and previous_index.is_unique):
+        return None
+
+    position = previous_index.get_indexer(node_index)
+    previous_label = np.where(position >= 0, previous['node_component'][position], -1)
+    affected = np.unique(previous_label[node_index.isin(list(touched)) & (previous_label >= 0)])
+    relabel = (previous_label < 0) | np.isin(previous_label, affected)
+
+    # the edges of the relabelled nodes, which can only lead to other relabelled nodes
+    codes = np.flatnonzero(relabel)
+    if compact:
+        edge_ids = np.unique(gather_neighbors(graph_object.indptr, graph_object.edge_index, codes))
+        sources, targets = graph_object.sources[edge_ids], graph_object.targets[edge_ids]
+    else:
+        code_of = {nodes[c]: c for c in codes.tolist()}
+        edges = list(graph_object.edges(code_of))
+        sources = np.fromiter((code_of[u] for u, v in edges), dtype=np.int64, count=len(edges))
+        targets = np.fromiter((code_of[v] for u, v in edges), dtype=np.int64, count=len(edges))
+    local = np.cumsum(relabel) - 1
+    local_labels, _ = label_components(len(codes), local[sources], local[targets])
+
+    labels = previous_label
+    labels[codes] = local_labels + len(previous['component_network'])
+    labels, sizes = _number_by_lowest_code(labels)
+    return Components(labels, sizes, None if compact else nodes)
+
+
+def _number_by_lowest_code(labels):
+    """Renumbers component labels 0.. in order of the lowest node code of each
+    :return labels, sizes:
+    """
+    order = np.argsort(labels, kind='stable')
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.concatenate([[True], sorted_labels[1:] != sorted_labels[:-1]]))
+    sizes = np.diff(np.append(starts, len(labels)))
+    # the stable sort puts the lowest code of every label first
+    rank = np.empty(len(starts), dtype=np.int64)
+    rank[np.argsort(order[starts])] = np.arange(len(starts))
+    numbered = np.empty(len(labels), dtype=np.int64)
+    numbered[order] = np.repeat(rank, sizes)
+    return numbered, np.bincount(numbered, minlength=len(starts))
+
+
+class IncrementalPlan:
+    """Which of today's networks need re-rendering, based on the edges that changed since the last run.
+    A network is changed when it holds an endpoint of an added or removed edge, or when it wasn't one
+    of the networks exported last time (e.g. the size filter changed). The first run treats every
+    network as changed.
+
+    The components of the graph are updated from the previous run's rather than labelled afresh
+    (see update_components), and cached so get_subgraphs uses them: create the plan before
+    calling get_subgraphs, then pass it the networks with select.
+    :param graph_object: the full graph, either backend
+    """
+
+    def __init__(self, graph_object):
+        self.graph_object = graph_object
+        self.state_path = cache_path('incremental.npz')
+        edges = edge_table(graph_object)
+        self.current_edges = pd.DataFrame({c: plain_array(edges[c]) for c in EDGE_COLUMNS})
+        self.previous = self._load_state()
+        self.multi = None
+
+        if self.previous is None:
+            self.added = self.removed = self.current_edges.iloc[:0]
+            self.touched = set()
+            self.components = get_components(graph_object)
+            return
+
+        self.added, self.removed = diff_edges(self.previous['edges'], self.current_edges)
+        changed_edges = pd.concat([self.added, self.removed])
+        self.touched = set(changed_edges[['MEMBER_NBR', 'INDIVIDUAL_ID']].values.ravel().tolist())
+        self.components = update_components(graph_object, self.previous, self.touched)
+        if self.components is None:
+            self.components = get_components(graph_object)
+        set_components(graph_object, self.components)
+
+    def select(self, multi):
+        """Finds which networks of multi changed
+        :param multi: the list of subgraphs from get_subgraphs of this plan's graph
+        """
+        self.multi = multi
+        self.keys = [network_key(multi.node_ids(k)) for k in range(len(multi))]
+        if self.previous is None:
+            self.changed = np.arange(len(multi))
+            self.is_new = np.ones(len(multi), dtype=bool)
+            return
+
+        touched = self.touched
+        previous_keys = set(self.previous['keys'])
+        previous_nodes = self.previous['nodes']
+        changed = []
+        is_new = []
+        for k in range(len(multi)):
+            node_ids = multi.node_ids(k)
+            if self.keys[k] not in previous_keys or not touched.isdisjoint(node_ids):
+                changed.append(k)
+            is_new.append(not any(n in previous_nodes for n in node_ids))
+        self.changed = np.array(changed, dtype=np.int64)
+        self.is_new = np.array(is_new)
+
+    def _load_state(self):
+        """Edges, network keys, titles, node components and node -> network of the previous run, if any.
+        A state saved by an older version, with pickled arrays, is treated as no state."""
+        if not os.path.isfile(self.state_path):
+            return None
+        try:
+            with np.load(self.state_path, allow_pickle=False) as state:
+                state = {name: state[name] for name in state.files}
+            node_network = state['component_network'][state['node_component']]
+        except (ValueError, KeyError):
+            return None
+        exported = node_network >= 0
+        return {'edges': pd.DataFrame({c: state[c] for c in EDGE_COLUMNS}),
+                'keys': state['keys'].tolist(),
+                'titles': state['titles'].tolist(),
+                'node_ids': state['node_ids'],
+                'node_component': state['node_component'],
+                'component_network': state['component_network'],
+                'nodes': dict(zip(state['node_ids'][exported].tolist(), node_network[exported].tolist()))}
+
+    def seed_centers(self, strategy='degree', cache=None):
+        """Keeps group ids stable: a changed network takes over the center of the previous network
+        most of its nodes belonged to, as long as that center is still part of it.
+        :param strategy: center strategy of the run, see find_center
+        :param cache: CenterCache, None for the one in the cache folder
+        """
+        if self.previous is None:
+            return
+        cache = cache or CenterCache()
+        for k in self.changed:
+            node_ids = self.multi.node_ids(k)
+            previous_networks = Counter(self.previous['nodes'][n] for n in node_ids if n in self.previous['nodes'])
+            present = set(node_ids)
+            for network, count in previous_networks.most_common():
+                center = cache.get(strategy, self.previous['keys'][network])
+                if center in present:
+                    cache.set(strategy, self.keys[k], center)
+                    break
+        # the centers of unchanged networks are only used later, by network_centers
+        cache.save(prune=False)
+
+    def report(self, titles):
+        """DataFrame of the networks that changed since the last run
+        :param titles: title of every network today, in the order of multi
+        """
+        # today's network of every node touched by a changed edge
+        network_of = {}
+        for k in self.changed:
+            network_of.update((n, k) for n in self.multi.node_ids(k) if n in self.touched)
+        added = Counter(network_of.get(m, network_of.get(i)) for m, i in
+                        zip(self.added['MEMBER_NBR'], self.added['INDIVIDUAL_ID']))
+        removed = Counter(network_of.get(m, network_of.get(i)) for m, i in
+                          zip(self.removed['MEMBER_NBR'], self.removed['INDIVIDUAL_ID']))
+
+        rows = [[titles[k], 'new' if self.is_new[k] else 'changed', len(self.multi.node_ids(k)), added[k], removed[k]]
+                for k in self.changed]
+        if self.previous is not None:
+            current_keys = set(self.keys)
+            previous_members = defaultdict(list)
+            for n, network in self.previous['nodes'].items():
+                previous_members[network].append(n)
+            for network, key in enumerate(self.previous['keys']):
+                # a previous network is gone if its membership changed along with an edge it held
+                nodes = previous_members[network]
+                if key not in current_keys and not self.touched.isdisjoint(nodes):
+                    rows.append([self.previous['titles'][network], 'split, merged or removed', len(nodes), 0, 0])
+
+        return pd.DataFrame(rows, columns=['Group title (Center)', 'Change', 'Nodes', 'Edges added', 'Edges removed'])
+
+    def save(self, titles):
+        """Stores today's edges, components and networks as the baseline for the next run"""
+        components = self.multi.components
+        component_network = np.full(len(components), -1, dtype=np.int64)
+        component_network[self.multi.selected] = np.arange(len(self.multi))
+        node_ids = self.graph_object.node_ids if components.nodes is None else components.nodes
+
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        np.savez(self.state_path,
+                 keys=np.array(self.keys, dtype=str),
+                 titles=np.array([str(t) for t in titles], dtype=str),
+                 node_ids=plain_array(node_ids),
+                 node_component=components.labels,
+                 component_network=component_network,
+                 **{c: plain_array(self.current_edges[c]) for c in EDGE_COLUMNS})
@@ -0,0 +1,131 @@
+import numpy as np
+import networkx as nx
+
+from member_net.cache import JsonCache, cache_path
+
+LAYOUT_ALGORITHMS = ('auto', 'spring', 'spectral')
+
+# spring_layout iterations from a random start, and when warm starting from cached positions
+SPRING_ITERATIONS = 50
+WARM_ITERATIONS = 15
+
+
+def compute_layout(graph_object, pos=None, algorithm='auto', large_network_nodes=1000, seed=0):
+    """Node positions for drawing a network.
+    Complete cached positions are returned as they are. Partial ones warm start the layout:
+    known nodes keep their place and the rest start next to their placed neighbors.
+    :param graph_object: networkx graph of one network
+    :param pos: dict of node -> (x, y) from the layout cache, complete or partial
+    :param algorithm: 'spring', 'spectral', or 'auto' for spectral above large_network_nodes
+    :param large_network_nodes: network size from which 'auto' uses the spectral layout
+    :param seed: random seed, so the same network is always drawn the same way
+    :return: dict of node -> (x, y)
+    """
+    if algorithm not in LAYOUT_ALGORITHMS:
+        raise ValueError(f"Please specify one of {LAYOUT_ALGORITHMS} as the layout algorithm")
+    if pos and all(n in pos for n in graph_object):
+        return pos
+    if algorithm == 'auto':
+        algorithm = 'spectral' if len(graph_object) >= large_network_nodes else 'spring'
+
+    if algorithm == 'spectral':
+        return spectral_layout(graph_object, seed=seed)
+
+    if pos:
+        # only the new nodes move, so the rest of the drawing stays where it was
+        return nx.spring_layout(graph_object, pos=_place_new_nodes(graph_object, pos, seed),
+                                fixed=[n for n in graph_object if n in pos], iterations=WARM_ITERATIONS, seed=seed)
+    return nx.spring_layout(graph_object, iterations=SPRING_ITERATIONS, seed=seed)
+
+
+def _place_new_nodes(graph_object, pos, seed=0):
+    """Completes partial positions, putting each new node next to the mean of its placed neighbors"""
+    rng = np.random.default_rng(seed)
+    pos = {n: np.asarray(p, dtype=float) for n, p in pos.items() if n in graph_object}
+    missing = [n for n in graph_object if n not in pos]
+    # breadth first from the placed nodes, so chains of new nodes grow outwards
+    while missing:
+        placed = []
+        for n in missing:
+            anchors = [pos[m] for m in graph_object[n] if m in pos]
+            if anchors:
+                placed.append((n, np.mean(anchors, axis=0) + rng.normal(0, 0.05, 2)))
+        if not placed:
+            # nothing left touches a placed node, scatter the rest
+            placed = [(n, rng.uniform(-1, 1, 2)) for n in missing]
+        pos.update(placed)
+        missing = [n for n in missing if n not in pos]
+    return pos
+
+
+def spectral_layout(graph_object, iterations=300, seed=0):
+    """Layout of a large network from the two leading non-trivial eigenvectors of its lazy
+    random walk, by subspace iteration over the edge list. Each iteration is two bincounts over
+    the edges, so it scales to networks far too big for spring_layout's dense force matrix.
+    :return: dict of node -> (x, y), scaled to [-1, 1]
+    """
+    nodes = list(graph_object)
+    n = len(nodes)
+    if n < 3:
+        return nx.circular_layout(graph_object)
+    node_index = {node: i for i, node in enumerate(nodes)}
+    n_edges = graph_object.number_of_edges()
+    u = np.fromiter((node_index[a] for a, b in graph_object.edges()), dtype=np.int64, count=n_edges)
+    v = np.fromiter((node_index[b] for a, b in graph_object.edges()), dtype=np.int64, count=n_edges)
+    degree = np.bincount(u, minlength=n) + np.bincount(v, minlength=n)
+    degree = np.maximum(degree, 1).astype(float)
+
+    x = np.random.default_rng(seed).standard_normal((n, 2))
+    for _ in range(iterations):
+        neighbor_sum = np.column_stack([np.bincount(u, x[v, k], n) + np.bincount(v, x[u, k], n) for k in range(2)])
+        x = 0.5 * x + 0.5 * neighbor_sum / degree[:, None]
+        x = _orthonormalize(x, degree)
+
+    x -= x.mean(axis=0)
+    x /= max(np.abs(x).max(), 1e-12)
+    return {node: x[i] for i, node in enumerate(nodes)}
+
+
+def _orthonormalize(x, degree):
+    """Makes the columns of x degree-weighted orthonormal and orthogonal to the constant vector"""
+    x = x - (degree @ x) / degree.sum()
+    for k in range(x.shape[1]):
+        for j in range(k):
+            x[:, k] -= (degree * x[:, j] * x[:, k]).sum() * x[:, j]
+        x[:, k] /= max(np.sqrt((degree * x[:, k] ** 2).sum()), 1e-12)
+    return x
+
+
+class LayoutCache:
+    """Node positions of every rendered network, keyed by network_key, kept between runs.
+    An unchanged network is drawn from its cached positions without running a layout, and
+    a changed one warm starts from the positions its nodes had before.
+    :param path: json file in the cache folder
+    """
+
+    def __init__(self, path=None):
+        self.store = JsonCache(path or cache_path('layouts.json'))
+        self._node_positions = None
+
+    def positions(self, key, graph_object):
+        """Cached positions for a network: complete if it is unchanged, partial if some of its
+        nodes were drawn before, otherwise None"""
+        cached = self.store.get(key)
+        if cached is None:
+            if self._node_positions is None:
+                self._node_positions = {n: p for network in self.store.data.values() for n, p in network.items()}
+            cached = self._node_positions
+        pos = {n: cached[str(n)] for n in graph_object if str(n) in cached}
+        return pos or None
+
+    def update(self, key, pos):
+        """Stores the positions a network was drawn with"""
+        self.store[key] = {str(n): [round(float(x), 4), round(float(y), 4)] for n, (x, y) in pos.items()}
+
+    def prune(self, keys):
+        """Forgets the networks that no longer exist"""
+        keys = set(keys)
+        self.store.data = {k: v for k, v in self.store.data.items() if k in keys}
+
+    def save(self):
+        self.store.save()
@@ -0,0 +1,171 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import config.extraction_settings as extraction_settings
+from member_net.compact_graph import CompactGraphBuilder
+from member_net.connections import ConnectionPool, configure_cursor, extraction_queries
+from member_net.snapshots import data_date, open_snapshot_cache, snapshot_key
+
+# columns downcast to the smallest integer dtype that fits
+INTEGER_COLUMNS = ['INDIVIDUAL_ID', 'MEMBER_NBR', 'source', 'target', 'OPN_LN_ALL_CNT', 'OPN_SV_ALL_CNT']
+
+# code columns stored as categories, since some cores use alphanumeric codes
+CATEGORY_COLUMNS = ['PARTICIPATION_TYPE']
+
+# money columns, which can arrive as Decimal objects from the datamart
+FLOAT_COLUMNS = ['OPN_LN_BAL', 'OPN_SV_BAL', 'DIV_YTD_AMT', 'INT_YTD_AMT']
+
+
+def downcast(frame):
+    """Converts a query chunk to compact numeric dtypes in place
+    :param frame: DataFrame from one of the projected queries
+    :return: the same DataFrame
+    """
+    for column in frame.columns:
+        if column in INTEGER_COLUMNS:
+            # text ids are left as they are, converting them would drop leading zeros
+            if pd.api.types.is_numeric_dtype(frame[column]):
+                frame[column] = pd.to_numeric(frame[column], downcast='integer')
+        elif column in FLOAT_COLUMNS:
+            frame[column] = pd.to_numeric(frame[column]).astype('float64')
+        elif column in CATEGORY_COLUMNS:
+            frame[column] = frame[column].astype('category')
+    return frame
+
+
+def fetch_chunks(conn, query, chunksize=None):
+    """Yields untyped DataFrame chunks of a query from a bulk configured cursor
+    :param chunksize: rows per chunk, None for the whole result in one DataFrame
+    """
+    cursor = configure_cursor(conn.cursor())
+    try:
+        cursor.execute(query)
+        columns = [d[0] for d in cursor.description]
+        if not chunksize:
+            yield pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
+            return
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    finally:
+        cursor.close()
+
+
+def read_frame(conn, query):
+    """Reads a whole query into a DataFrame, like pd.read_sql"""
+    chunks = fetch_chunks(conn, query)
+    try:
+        return next(chunks)
+    finally:
+        chunks.close()
+
+
+def read_chunks(conn, query, chunksize):
+    """Yields typed DataFrame chunks of a query, fetched chunksize rows at a time"""
+    for chunk in fetch_chunks(conn, query, chunksize):
+        yield downcast(chunk)
+
+
+def read_node_table(conn, query, chunksize, id_column, keep_ids):
+    """Reads a node attribute query in chunks, keeping only the nodes the graph uses
+    :param id_column: MEMBER_NBR or INDIVIDUAL_ID
+    :param keep_ids: ids that appear in the edge list
+    :return: DataFrame of the kept rows
+    """
+    keep_ids = pd.Index(keep_ids)
+    kept = [chunk[chunk[id_column].isin(keep_ids)] for chunk in read_chunks(conn, query, chunksize)]
+    if not kept:
+        return pd.DataFrame(columns=[id_column, 'label'])
+    return downcast(pd.concat(kept, ignore_index=True))
+
+
+def read_queries(pool, read, queries, parallel=None):
+    """Runs read(conn, query) for each query, each on its own pooled connection
+    :param pool: ConnectionPool. Queries run side by side up to the pool size
+    :param read: function of a connection and a query (or whatever queries holds)
+    :param parallel: False to run them one after another, None for the configured setting
+    :return: tuple of the results, in query order
+    """
+    if parallel is None:
+        parallel = extraction_settings.parallel_extraction
+
+    def run(query):
+        with pool.connection() as conn:
+            return read(conn, query)
+
+    if not parallel or pool.size == 1 or len(queries) == 1:
+        return tuple(run(query) for query in queries)
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(queries))) as executor:
+        return tuple(executor.map(run, queries))
+
+
+def load_member_frames(db_type, use_snapshots=True, pushdown=False):
+    """Reads the individual, membership and edge queries in full, from today's snapshot when there is one
+    :param db_type: sqlite or datamart
+    :param use_snapshots: False to always query the database
+    :param pushdown: True to leave out the participations that can only form networks of 2 nodes
+    :return ind, mem, edges: DataFrames of the three queries
+    """
+    queries = extraction_queries(db_type, pushdown=pushdown)
+    cache = open_snapshot_cache() if use_snapshots else None
+    key = snapshot_key(queries, data_date(db_type)) if cache else None
+
+    frames = cache.load(key) if cache else None
+    if frames is not None:
+        print('Loaded tables from snapshot cache')
+        return frames
+
+    with ConnectionPool(db_type) as pool:
+        frames = read_queries(pool, read_frame, queries)
+    if cache:
+        cache.save(key, *frames)
+    return frames
+
+
+def stream_member_graph(db_type, chunksize=100000, use_snapshots=True, pushdown=False):
+    """Builds a CompactGraph from the projected queries without holding a whole result set in memory.
+    The edge query is fed to the graph builder one chunk at a time, then the node queries are
+    read in chunks and filtered down to the nodes that have edges. Chunks are also written to
+    the snapshot cache as they arrive, and a matching snapshot is read instead of the database.
+    :param db_type: sqlite or datamart
+    :param chunksize: rows fetched per round trip
+    :param use_snapshots: False to always query the database
+    :param pushdown: True to leave out the participations that can only form networks of 2 nodes
+    :return G: CompactGraph
+    :return ind: DataFrame of the individuals in the graph
+    """
+    individual_query, member_query, edge_query = extraction_queries(db_type, projected=True, pushdown=pushdown)
+    cache = open_snapshot_cache() if use_snapshots else None
+    key = snapshot_key((individual_query, member_query, edge_query), data_date(db_type)) if cache else None
+
+    builder = CompactGraphBuilder()
+    if cache and cache.exists(key):
+        print('Loaded tables from snapshot cache')
+        ind, mem, edges = (downcast(frame) for frame in cache.load(key))
+        builder.add_edges(edges)
+        return builder.build(ind, mem), ind
+
+    snapshot = cache.writer(key) if cache else None
+    with ConnectionPool(db_type, size=min(extraction_settings.pool_size, 2)) as pool:
+        with pool.connection() as conn:
+            for chunk in read_chunks(conn, edge_query, chunksize):
+                builder.add_edges(chunk)
+                if snapshot:
+                    snapshot.write('edge', chunk)
+
+        # the node tables are filtered by the edge list, so only they can be read side by side
+        member_ids, individual_ids = builder.node_ids()
+        node_tables = [(member_query, 'MEMBER_NBR', member_ids), (individual_query, 'INDIVIDUAL_ID', individual_ids)]
+        mem, ind = read_queries(pool, lambda conn, table: read_node_table(conn, table[0], chunksize, *table[1:]),
+                                node_tables)
+
+    if snapshot:
+        snapshot.write('membership', mem)
+        snapshot.write('individual', ind)
+        snapshot.close()
+
+    return builder.build(ind, mem), ind
+
@@ -0,0 +1,276 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import config.output_location as output_settings  # ouput_location.py file
+
+# membership totals kept per network, the columns of network_rollups
+ROLLUP_COLUMNS = ['Nodes', 'Individuals', 'Memberships', 'OPN_SV_BAL', 'OPN_LN_BAL', 'OPN_LN_ALL_CNT',
+                  'OPN_SV_ALL_CNT', 'PPM', 'DIV_YTD_AMT', 'INT_YTD_AMT']
+
+SCHEMA = f'''
+CREATE TABLE networks (NETWORK INTEGER PRIMARY KEY, GROUP_ID TEXT, TITLE TEXT, PDF TEXT,
+                       {', '.join(f'{c} REAL' for c in ROLLUP_COLUMNS)},
+                       NODE_START INTEGER, NODE_END INTEGER, EDGE_START INTEGER, EDGE_END INTEGER);
+CREATE TABLE nodes (ROW INTEGER PRIMARY KEY, NODE_ID, NODE_TYPE TEXT, LABEL, NETWORK INTEGER);
+CREATE TABLE edges (ROW INTEGER PRIMARY KEY, MEMBER_NBR, INDIVIDUAL_ID, PARTICIPATION_TYPE, NETWORK INTEGER);
+CREATE TABLE info (KEY TEXT PRIMARY KEY, VALUE);
+'''
+
+# created after the rows are inserted, which is faster than maintaining them row by row
+INDEXES = '''
+CREATE INDEX nodes_by_id ON nodes (NODE_ID);
+CREATE INDEX networks_by_group ON networks (GROUP_ID);
+'''
+
+
+def index_path():
+    """Location of the network index inside the output folder"""
+    return f'{output_settings.output_location}//{output_settings.network_index_filename}'
+
+
+def write_network_index(path, members, individuals, rollups, titles, centers, edges, links=None):
+    """Saves the networks of an export as a sqlite file that answers "which network is this
+    member in" without a full run. Nodes and edges are stored sorted by network, so each
+    network is one range of rows, found through the networks table. The file is written
+    next to the old one and swapped in at the end, so lookups never see half an index.
+    :param path: index file
+    :param members: membership table from network_nodes
+    :param individuals: individual table from network_nodes
+    :param rollups: network_rollups of the same networks
+    :param titles: title of every network
+    :param centers: center node id of every network
+    :param edges: edge_table of the networks, with a NETWORK column
+    :param links: drawing of every network relative to the output folder, None if they are the
+    pdfs named after their titles
+    """
+    import numpy as np
+    import pandas as pd
+
+    nodes = pd.concat([_node_rows(members, 'membership'), _node_rows(individuals, 'individual')],
+                      ignore_index=True).sort_values('NETWORK', kind='stable', ignore_index=True)
+    edges = edges.sort_values('NETWORK', kind='stable', ignore_index=True)
+    positions = np.arange(len(rollups))
+    node_bounds = np.searchsorted(nodes['NETWORK'].to_numpy(), [positions, positions + 1])
+    edge_bounds = np.searchsorted(edges['NETWORK'].to_numpy(), [positions, positions + 1])
+
+    networks = rollups[ROLLUP_COLUMNS].astype(float)
+    networks.insert(0, 'PDF', [f'pdfs/{title}.pdf' for title in titles] if links is None else list(links))
+    networks.insert(0, 'TITLE', list(titles))
+    networks.insert(0, 'GROUP_ID', [f'group-{center}' for center in centers])
+    networks.insert(0, 'NETWORK', positions)
+    networks['NODE_START'], networks['NODE_END'] = node_bounds
+    networks['EDGE_START'], networks['EDGE_END'] = edge_bounds
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    building = f'{path}.building'
+    if os.path.isfile(building):
+        os.remove(building)
+    conn = sqlite3.connect(building)
+    try:
+        conn.executescript(SCHEMA)
+        _insert(conn, 'networks', networks)
+        _insert(conn, 'nodes', nodes[['NODE_ID', 'NODE_TYPE', 'LABEL', 'NETWORK']])
+        _insert(conn, 'edges', edges[['MEMBER_NBR', 'INDIVIDUAL_ID', 'PARTICIPATION_TYPE', 'NETWORK']])
+        conn.execute('INSERT INTO info VALUES (?, ?)', ('built', datetime.now().isoformat(timespec='seconds')))
+        conn.executescript(INDEXES)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(building, path)
+
+
+def _node_rows(frame, node_type):
+    """NODE_ID, NODE_TYPE, LABEL and NETWORK of a network_nodes table"""
+    import pandas as pd
+
+    return pd.DataFrame({'NODE_ID': frame['NODE_ID'].to_numpy(),
+                         'NODE_TYPE': node_type,
+                         'LABEL': frame['label'].to_numpy() if 'label' in frame else None,
+                         'NETWORK': frame['NETWORK'].to_numpy()})
+
+
+def _insert(conn, table, frame):
+    """Inserts a DataFrame's rows, numbering ROW from 0 where the table has one"""
+    columns = list(frame.columns)
+    rows = zip(*(_plain(frame[c]) for c in columns))
+    if table in ('nodes', 'edges'):
+        columns = ['ROW'] + columns
+        rows = ((i, *row) for i, row in enumerate(rows))
+    placeholders = ', '.join('?' * len(columns))
+    conn.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})', rows)
+
+
+def _plain(column):
+    """A column as Python values sqlite accepts, with missing values as NULL"""
+    return [None if value != value else value for value in column.astype(object).tolist()]
+
+
+class NetworkIndex:
+    """Read side of the network index: finds the network of a member or individual and returns
+    its members, totals and pdf, rendering the pdf if it is missing.
+    :param path: index file, defaults to the one in the output folder
+    """
+
+    def __init__(self, path=None):
+        self.path = path or index_path()
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError(f'No network index at {self.path}, run an export first')
+        self.conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+        self.conn.row_factory = sqlite3.Row
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def built(self):
+        """When the index was written"""
+        return self.conn.execute("SELECT VALUE FROM info WHERE KEY = 'built'").fetchone()[0]
+
+    def find(self, node_id, node_type=None):
+        """The networks a MEMBER_NBR or INDIVIDUAL_ID belongs to. Usually one, but an id used
+        by both a membership and an individual can be in two.
+        :param node_id: the id, as a number or text
+        :param node_type: 'membership' or 'individual' to only match that kind of node
+        :return: list of network dicts (see network)
+        """
+        query = 'SELECT DISTINCT NETWORK FROM nodes WHERE NODE_ID IN (?, ?)'
+        params = [node_id, _as_number(node_id)]
+        if node_type:
+            query += ' AND NODE_TYPE = ?'
+            params.append(node_type)
+        return [self.network(row['NETWORK']) for row in self.conn.execute(query, params)]
+
+    def group(self, group_id):
+        """The networks of a GROUP_ID from the group tables. Usually one, but when member and
+        individual ids are kept apart (see separate_colliding_ids) two centers can share an id,
+        and so a group id.
+        :return: list of network dicts (see network)
+        """
+        rows = self.conn.execute('SELECT NETWORK FROM networks WHERE GROUP_ID = ? ORDER BY NETWORK', (group_id,))
+        return [self.network(row['NETWORK']) for row in rows.fetchall()]
+
+    def network(self, network):
+        """A network's title, group id, totals and pdf path
+        :param network: position of the network in the export
+        :return: dict of the networks row, plus PDF_PATH
+        """
+        row = dict(self.conn.execute('SELECT * FROM networks WHERE NETWORK = ?', (network,)).fetchone())
+        # PPM is saved as NULL for networks without memberships
+        row.update({c: float('nan') for c in ROLLUP_COLUMNS if row[c] is None})
+        row['PDF_PATH'] = os.path.join(os.path.dirname(self.path), row['PDF'])
+        return row
+
+    def nodes(self, network):
+        """The memberships and individuals of a network, as dicts of NODE_ID, NODE_TYPE and LABEL"""
+        return self._rows('nodes', 'NODE', network)
+
+    def edges(self, network):
+        """The participations of a network, as dicts of MEMBER_NBR, INDIVIDUAL_ID and PARTICIPATION_TYPE"""
+        return self._rows('edges', 'EDGE', network)
+
+    def _rows(self, table, prefix, network):
+        """Rows of a table in the range recorded for a network"""
+        start, end = self.conn.execute(f'SELECT {prefix}_START, {prefix}_END FROM networks WHERE NETWORK = ?',
+                                       (network,)).fetchone()
+        rows = self.conn.execute(f'SELECT * FROM {table} WHERE ROW >= ? AND ROW < ?', (start, end))
+        return [{k: row[k] for k in row.keys() if k not in ('ROW', 'NETWORK')} for row in rows]
+
+    def pdf(self, network, render=True):
+        """Path of a network's pdf, rendering it first if it is missing
+        :param render: False to return None instead of rendering a missing pdf
+        """
+        path = self.network(network)['PDF_PATH']
+        if os.path.isfile(path):
+            return path
+        if not render:
+            return None
+        return self.render(network)
+
+    def render(self, network):
+        """Draws one network's pdf (or svg, for an svg export) from the index, reusing its cached
+        layout if there is one
+        :return: path of the drawing
+        """
+        import networkx as nx
+
+        import config.layout_settings as layout_settings  # layout_settings.py file
+        from member_net.cache import network_key
+        from member_net.layouts import LayoutCache
+        from member_net.rendering import RenderJob, render_network, summary_table
+
+        row = self.network(network)
+        nodes = self.nodes(network)
+        member_ids = {n['NODE_ID'] for n in nodes if n['NODE_TYPE'] == 'membership'}
+
+        # individuals whose id is also a MEMBER_NBR are keyed apart, as in CompactGraph.node_keys
+        def key(node_id, node_type):
+            return f'individual {node_id}' if node_type == 'individual' and node_id in member_ids else node_id
+
+        graph = nx.Graph()
+        for n in nodes:
+            graph.add_node(key(n['NODE_ID'], n['NODE_TYPE']), type=n['NODE_TYPE'], label=n['LABEL'])
+        for e in self.edges(network):
+            graph.add_edge(e['MEMBER_NBR'], key(e['INDIVIDUAL_ID'], 'individual'),
+                           PARTICIPATION_TYPE=e['PARTICIPATION_TYPE'])
+        colors = ['c' if data['type'] == 'individual' else 'm' for _, data in graph.nodes(data=True)]
+
+        layouts = LayoutCache(os.path.join(os.path.dirname(self.path), 'cache', 'layouts.json')) \
+            if layout_settings.use_layout_cache else None
+        layout_key = network_key(n['NODE_ID'] for n in nodes)
+        pos = layouts.positions(layout_key, graph) if layouts is not None else None
+
+        # a network drawn into the book gets a pdf of its own
+        path = row['PDF_PATH'] if os.path.dirname(row['PDF']) else \
+            os.path.join(os.path.dirname(self.path), 'pdfs', f"{row['TITLE']}.pdf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # svgs are only drawn by the lean renderer, as in render_jobs
+        renderer = 'lean' if path.endswith('.svg') else layout_settings.renderer
+        job = RenderJob(graph, colors, None, row['TITLE'], summary_table(row['TITLE'], len(graph), row),
+                        path, layout_key, pos, layout_settings.layout_algorithm,
+                        layout_settings.large_network_nodes, renderer)
+        result = render_network(job)
+        if layouts is not None:
+            layouts.update(layout_key, result['pos'])
+            layouts.save()
+        return result['path']
+
+
+def _as_number(value):
+    """value as an int where it is one, since ids are stored as numbers"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def lookup(args):
+    """Prints the network of a member or individual, see lookup_parser in options.py"""
+    if args.output:
+        output_settings.output_location = args.output
+    with NetworkIndex() as index:
+        networks = index.group(args.id) if args.id.startswith('group-') else index.find(args.id, args.type)
+        if not networks:
+            print(f'{args.id} is not in any exported network (index built {index.built})')
+            return 1
+
+        for network in networks:
+            pdf = index.pdf(network['NETWORK'], render=not args.no_render)
+            print(f'The {network["TITLE"]} network ({network["GROUP_ID"]})')
+            print(f'  PDF: {pdf or "not rendered"}')
+            print(f'  {int(network["Nodes"])} nodes: {int(network["Memberships"])} memberships, '
+                  f'{int(network["Individuals"])} individuals')
+            print(f'  Total savings ${network["OPN_SV_BAL"]:,.2f}, total loans ${network["OPN_LN_BAL"]:,.2f}, '
+                  f'PPM {network["PPM"]:.2f}')
+            print(f'  Dividends paid ${network["DIV_YTD_AMT"]:,.2f}, '
+                  f'interest received ${network["INT_YTD_AMT"]:,.2f}')
+            if args.nodes:
+                for n in index.nodes(network['NETWORK']):
+                    print(f'    {n["NODE_TYPE"]:<12}{n["NODE_ID"]!s:<14}{n["LABEL"]}')
+    return 0
@@ -1,55 +1,77 @@
-import pandas as pd
-# import numpy as np
-import networkx as nx
-import pyodbc
-import sqlite3
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-import matplotlib.gridspec as gridspec
 from datetime import datetime
 import os
 
-import config.sql_queries as sql_queries  # sql_queries.py file
-import config.server_details as server_details  # server_details.py file
+# pandas, numpy, networkx and the modules built on them are imported by the functions that
+# use them, so the batch arguments are checked and the gui opens before they load
+from member_net.profiling import RunProfile
+from member_net.background import Cancelled
+from member_net.cache import network_key
+from member_net.options import GRAPH_BACKENDS
+import config.extraction_settings as extraction_settings  # extraction_settings.py file
+import config.layout_settings as layout_settings  # layout_settings.py file
+import config.metrics_settings as metrics_settings  # metrics_settings.py file
+import config.profile_settings as profile_settings  # profile_settings.py file
 from config.output_location import *  # ouput_location.py file
+import config.output_location as output_settings
 
 timestamp = datetime.now().date().strftime("%b %d %Y")
 
 
-def generate_member_graph(db_type):
+def generate_member_graph(db_type, backend='networkx', chunksize=None, use_snapshots=True, profile=None,
+                          pushdown=False):
     """Generates the graph object using either sqlite or the datamart db.
     :param db_type: sqlite or datamart
+    :param backend: 'networkx' for a networkx Graph, or 'compact' for the array backed CompactGraph
+    :param chunksize: if given, stream the projected queries this many rows at a time (see loader.py)
+    :param use_snapshots: reuse today's snapshot of the tables if there is one (see cache_settings.py)
+    :param profile: RunProfile to record the extract and build stages in
+    :param pushdown: only extract the participations that can belong to networks of 3 or more nodes
+    (see use_pushdown). The graph then holds no 2 node networks.
     :return G: graph object
     :return ind: dataframe of the individuals, required to generate the color map.
     """
-    # These variables should be updated in the server_details.py file
-    # sqlite_location = 'demo_data.db'
-    # MSSQL_server_name = 'xxxx'
-    # datamart_name = 'xxxx'
-
-    if db_type == 'sqlite':
-        from sqlite3 import connect
-        conn = sqlite3.connect(server_details.sqlite_location)
-        ind = pd.read_sql(sql_queries.sqlite_node_individual_query, conn)
-        mem = pd.read_sql(sql_queries.sqlite_member_individual_query, conn)
-        edges = pd.read_sql(sql_queries.sqlite_edge_query, conn)
-
-    elif db_type == 'datamart':
-        try:
-            conn = pyodbc.connect('Driver={SQL Server};'
-                                  'Server=' + str(server_details.MSSQL_server_name) + ';'
-                                  'Database=' + str(server_details.datamart_name) + ';'
-                                  'Trusted_Connection=yes;')
+    from member_net.compact_graph import CompactGraph
+    from member_net.loader import load_member_frames, stream_member_graph
 
-        except:
-            raise ValueError("Unable to connect to datamart")
+    if backend not in GRAPH_BACKENDS:
+        raise ValueError("Please specify 'networkx' or 'compact' as the graph backend")
 
-        ind = pd.read_sql(sql_queries.ms_sql_node_individual_query, conn)
-        mem = pd.read_sql(sql_queries.ms_sql_member_individual_query, conn)
-        edges = pd.read_sql(sql_queries.ms_sql_edge_query, conn)
+    profile = profile or RunProfile()
 
-    else:
-        raise ValueError("Please specify 'sqlite' or 'datamart'")
+    if chunksize:
+        with profile.stage('extract and build graph'):
+            g, ind = stream_member_graph(db_type, chunksize, use_snapshots, pushdown)
+        if backend == 'compact':
+            return g, ind
+        with profile.stage('convert to networkx'):
+            return g.to_networkx(), ind
+
+    with profile.stage('extract'):
+        ind, mem, edges = load_member_frames(db_type, use_snapshots, pushdown)
+
+    if backend == 'compact':
+        with profile.stage('build graph'):
+            return CompactGraph.from_frames(ind, mem, edges), ind
+
+    with profile.stage('build graph'):
+        return _networkx_graph(ind, mem, edges), ind
+
+
+def use_pushdown(requested, min_nodes):
+    """Whether the pushdown queries can be used. They only leave out networks of 2 nodes, so
+    the size filter must be 3 or more.
+    :param requested: pushdown asked for, by the setting in extraction_settings.py or --pushdown
+    :param min_nodes: the smallest subgraph size filter of the run
+    """
+    if requested and min_nodes < 3:
+        print('Pushdown needs a subgraph size filter of 3 or more, extracting every participation')
+        return False
+    return requested
+
+
+def _networkx_graph(ind, mem, edges):
+    """networkx Graph of the participation edges with the member and individual attributes"""
+    import networkx as nx
 
     # make attribute dictionary
     mem_dict = mem.set_index('MEMBER_NBR')
@@ -63,22 +85,38 @@ def generate_member_graph(db_type):
     g = nx.from_pandas_edgelist(edges, edge_attr=True)
     nx.set_node_attributes(g, mem_dict)
 
-    return g, ind
+    return g
 
 
-def generate_color_map(graph_object, individual_df):
+def generate_color_map(graph_object, individual_df=None):
     """ Generates a color map corresponding with whether a node represents an individual or membership
-    :param graph_object: NetworkX graph object
-    :param individual_df: DataFrame of the individual table query
+    :param graph_object: NetworkX graph object or CompactGraph
+    :param individual_df: no longer used, node types come from the 'type' attribute the queries emit
     :return colors: A list of colors to be passed to the networkx.draw() function
     """
-    individual_nodes = list(individual_df['INDIVIDUAL_ID'])
+    from member_net.compact_graph import CompactGraph
+
+    if isinstance(graph_object, CompactGraph):
+        types = graph_object.is_individual
+    else:
+        types = (node[1].get('type') == 'individual' for node in graph_object.nodes(data=True))
+    return ['c' if individual else 'm' for individual in types]
 
-    for n in graph_object.nodes:
-        graph_object.nodes[n]['color'] = 'c' if n in individual_nodes else 'm'
 
-    colors = [node[1]['color'] for node in graph_object.nodes(data=True)]
-    return colors
+def network_color_maps(multi):
+    """Yields the color map of every subgraph in multi. For the list from get_subgraphs the
+    colors are typed once for the whole graph and sliced per subgraph."""
+    import numpy as np
+    from member_net.components import SubgraphList, get_node_types
+
+    if not isinstance(multi, SubgraphList):
+        for graph in multi:
+            yield generate_color_map(graph)
+        return
+
+    colors = np.where(get_node_types(multi.graph_object), 'c', 'm')
+    for component in multi.selected:
+        yield colors[multi.components.codes(component)].tolist()
 
 
 def separate_members_individuals(graph_object):
@@ -87,6 +125,12 @@ def separate_members_individuals(graph_object):
     :return subgraph_individuals: A data frame of individual nodes and their attributes
     :return subgraph_members: A data frame of member nodes and their attributes
     """
+    import pandas as pd
+    from member_net.compact_graph import CompactGraph
+
+    if isinstance(graph_object, CompactGraph):
+        subgraph_members, subgraph_individuals = graph_object.node_attributes()
+        return subgraph_individuals, subgraph_members
 
     subgraph_individuals = {}
     subgraph_members = {}
@@ -127,54 +171,54 @@ def get_subgraphs(graph_object, min_nodes_in_subgraph):
     """Finds subgraphs and filters them for minimum number of desired nodes
     :param graph_object: The original big graph
     :param min_nodes_in_subgraph: The minimum number of nodes a subgraph should have
-    :return multi: A list of the subgraphs
+    :return multi: A list of the subgraphs, each built only when it is accessed
     """
-    s = [graph_object.subgraph(c).copy() for c in nx.connected_components(graph_object)]
-    n = min_nodes_in_subgraph
-    multi = []
+    from member_net.components import SubgraphList, get_components
 
-    for sub in s:
-        if len(nx.nodes(sub)) >= n:
-            multi.append(sub)
+    components = get_components(graph_object)
+    n = min_nodes_in_subgraph
+    multi = SubgraphList(graph_object, components, components.select(n))
 
     print(f'{len(multi)} networks with at least {n} nodes')
     return multi
 
 
 def get_subgraph_attributes(graph_object):
-    """Returns some attributes about the subgraphs in a network"""
-
-    node_counts = []
-    s = [graph_object.subgraph(c).copy() for c in nx.connected_components(graph_object)]
-    for sub in s:
-        node_count = len(nx.nodes(sub))
-        node_counts.append(node_count)
+    """Returns some attributes about the subgraphs in a network
+    :param graph_object: either backend, or the OutOfCoreComponents of a graph too large to load"""
+    from member_net.components import get_components
+    from member_net.out_of_core import OutOfCoreComponents
 
-    attributes = {'Total Subgraphs': len(s),
-                  'Min Nodes': min(node_counts),
-                  'Max Nodes': max(node_counts),
-                  'Average Nodes': sum(node_counts) / len(node_counts)
-                  }
+    if isinstance(graph_object, OutOfCoreComponents):
+        attributes = graph_object.attributes()
+    else:
+        attributes = get_components(graph_object).attributes()
 
-    print(f'Total Subgraphs: {len(s)}')
-    print(f'Min Nodes: {min(node_counts)}')
-    print(f'Max Nodes: {max(node_counts)}')
-    print(f'Avg Nodes: {sum(node_counts) / len(node_counts)}')
+    print(f'Total Subgraphs: {attributes["Total Subgraphs"]}')
+    print(f'Min Nodes: {attributes["Min Nodes"]}')
+    print(f'Max Nodes: {attributes["Max Nodes"]}')
+    print(f'Avg Nodes: {attributes["Average Nodes"]}')
 
     return attributes
 
 
-def make_graph(graph_object, color_map):
+def make_graph(graph_object, color_map, center=None):
     """Makes the graph and returns variables needed for further visualization
+    :param center: the center node, found with find_center if not given
     :return center: center node
     :return title: the label of the center node used for titling visualizations
     :return node_count: the number of nodes
     :return fig1: the graph
     """
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    from member_net.centers import find_center
 
     fig1 = plt.figure()
-    center = nx.center(graph_object)[0]
-    title = graph_object.nodes[center]['label']
+    if center is None:
+        center, title = find_center(graph_object)
+    else:
+        title = graph_object.nodes[center]['label']
 
     # degrees = nx.degree(graph_object)
     node_count = len(nx.nodes(graph_object))
@@ -197,6 +241,8 @@ def make_graph(graph_object, color_map):
 
 def make_table(dataframe):
     """Format the attribute dataframe for printing"""
+    import matplotlib.pyplot as plt
+
     fig2 = plt.figure(figsize=(4, 2))
     ax = fig2.add_subplot(111)
 
@@ -213,118 +259,315 @@ def make_table(dataframe):
 def check_output():
     """Create output folder if it doesn't exist already"""
     pdf_output = f'{output_location}//pdfs'
-    if os.path.isdir(output_location) == False:
-        os.mkdir(output_location)
-        os.mkdir(pdf_output)
-    if os.path.isdir(output_location) == True:
-        if os.path.isdir(pdf_output) == False:
-            os.mkdir(pdf_output)
+    os.makedirs(pdf_output, exist_ok=True)
+
+
+def drawing_links(names, render_to):
+    """Where each network's drawing is saved, relative to the output folder
+    :param names: file names from pdf_names
+    :param render_to: 'pdfs', 'book' (every network a page of one pdf) or 'svg'
+    """
+    if render_to == 'book':
+        return [f'{pdf_book_filename}{timestamp}.pdf'] * len(names)
+    if render_to == 'svg':
+        return [f'svgs/{name}.svg' for name in names]
+    if render_to == 'pdfs':
+        return [f'pdfs/{name}.pdf' for name in names]
+    raise ValueError("Please specify 'pdfs', 'book' or 'svg' as the render output")
+
+
+def set_output_location(path):
+    """Redirects every output file, and the cache folder, to another folder for this run"""
+    global output_location
+    output_location = path
+    output_settings.output_location = path
 
 
 def make_pdf(fig1, fig2, title):
     """Export the graph image and the table to pdf"""
+    from matplotlib.backends.backend_pdf import PdfPages
+
     pp = PdfPages(f'{output_location}//pdfs//{title}.pdf')
     pp.savefig(fig1, bbox_inches='tight')
     pp.savefig(fig2, bbox_inches='tight')
     pp.close()
 
 
-def subgraph_output(multi, ind):
-    """Iterates through the subgraphs, produces pdfs, and returns summary
-    dataframe """
-    subnetwork_df = []
+def subgraph_output(multi, ind, render=True, workers=1, center_strategy='degree', render_only=None, profile=None,
+                    progress=None, cancel=None, network_index=None, render_to=None,
+                    metrics=None, metrics_workers=None):
+    """Rolls up every subgraph, optionally produces pdfs, and returns summary
+    dataframe
+    :param multi: the list of subgraphs from get_subgraphs
+    :param ind: DataFrame of the individual table query (no longer needed for coloring)
+    :param render: False to skip the pdfs and only build the summary and group tables
+    :param workers: number of processes rendering pdfs, 1 renders in this process
+    :param center_strategy: how new networks pick their center/title, see find_center
+    :param render_only: positions in multi to render, None renders every network
+    :param profile: RunProfile recording each stage and the time spent on every pdf
+    :param progress: called with (pdfs done, pdfs to render) after every pdf
+    :param cancel: threading.Event, once set the export stops after the current pdf by raising Cancelled
+    :param network_index: save the lookup index of these networks (see lookup.py), None leaves it
+    to save_network_index in output_location.py
+    :param render_to: 'pdfs', 'book' or 'svg', None leaves it to render_output in output_location.py
+    :param metrics: add the network metric columns to the summary, None leaves it to
+    network_metrics in metrics_settings.py
+    :param metrics_workers: processes computing the metrics and network totals, None for the setting
+    """
+    from member_net.centers import network_centers
+    from member_net.layouts import LayoutCache
+    from member_net.lookup import index_path, write_network_index
+    from member_net.network_metrics import METRIC_COLUMNS, network_metrics
+    from member_net.render_manifest import RenderManifest, content_hashes, pdf_names
+    from member_net.rollups import group_tables, network_edges, network_nodes, network_rollups, summary_rows
+
     columns = ['Group title (Center)', 'PDF link', 'Nodes', 'Individuals', 'Memberships', 'Total Savings',
                'Total Loans', 'PPM', 'Dividends Paid', 'Interest Received']
 
-    igroup = []
-    mgroup = []
-
-    for i in range(len(multi)):
-        # specify subgraph
-        graph = multi[i]
-        colors = generate_color_map(graph, ind)
-
-        # Set up graph visualization and get attributes
-        center, title, node_count, fig1 = make_graph(graph, colors)
-
-        # separate member nodes and individual nodes
-        i, m = separate_members_individuals(graph)
-
-        # extract group and member/individual pairs
-        i2, m2 = format_member_individuals_for_concat(m, i, center)
+    profile = profile or RunProfile()
+    if metrics is None:
+        metrics = metrics_settings.network_metrics
+    if network_index is None:
+        network_index = save_network_index
+
+    # every network's nodes in one table per node type
+    with profile.stage('network nodes'):
+        members, individuals = network_nodes(multi)
+
+    # metrics and network totals are computed across processes, a part of the networks each
+    metrics_df = None
+    if metrics:
+        with profile.stage('network metrics'):
+            metrics_df = network_metrics(multi, metrics_workers, members=members)
+        columns = columns + METRIC_COLUMNS
+
+    # every network's totals, counts and group tables in one pass
+    with profile.stage('rollups'):
+        rollups = network_rollups(members, individuals, len(multi), metrics_df)
+    with profile.stage('centers'):
+        centers, titles = network_centers(multi, center_strategy, profile=profile)
+        names = pdf_names(titles, centers)
+        render_to = render_to or render_output
+        links = drawing_links(names, render_to)
+    with profile.stage('group tables'):
+        igroup, mgroup = group_tables(members, individuals, centers)
+        subnetwork_df = summary_rows(rollups, titles, links,
+                                     None if metrics_df is None else metrics_df[METRIC_COLUMNS])
+    edges = None
+    if network_index:
+        with profile.stage('network index'):
+            edges = network_edges(multi, members, individuals)
+            write_network_index(index_path(), members, individuals, rollups, titles, centers, edges, links)
+
+    if render:
+        # matplotlib is only loaded when pdfs are actually rendered
+        from member_net.rendering import render_book, render_pdfs
+
+        layouts = LayoutCache() if layout_settings.use_layout_cache else None
+        # a book holds every network, so it is always drawn whole
+        render_only = sorted(set(range(len(multi)) if render_only is None or render_to == 'book' else render_only))
+        if render_to == 'svg':
+            os.makedirs(f'{output_location}//svgs', exist_ok=True)
+
+        # pdfs rendered from the same content on an earlier run are kept as they are
+        manifest = RenderManifest(f'{output_location}//pdfs') if skip_unchanged_pdfs and render_to == 'pdfs' else None
+        if manifest is not None:
+            with profile.stage('content hashes'):
+                if edges is None:
+                    edges = network_edges(multi, members, individuals)
+                hashes = content_hashes(members, individuals, edges, rollups, titles, layout_settings.renderer)
+                # checked once per network, so the two lists always split render_only
+                flags = {i: manifest.unchanged(names[i], hashes[i]) for i in render_only}
+                unchanged = [i for i in render_only if flags[i]]
+                render_only = [i for i in render_only if not flags[i]]
+            print(f'{len(unchanged)} pdfs unchanged since the last run, {len(render_only)} to render')
+
+        total = len(render_only)
+        # drain the renderer, pdfs are written in the order of multi
+        try:
+            with profile.stage('render pdfs'):
+                jobs = render_jobs(multi, rollups, centers, titles, render_only, layouts, links, render_to)
+                if render_to == 'book':
+                    results = render_book(jobs, f'{output_location}//{links[0]}')
+                else:
+                    results = render_pdfs(jobs, workers)
+                for done, (i, result) in enumerate(zip(render_only, results), 1):
+                    profile.network('render', result['title'], result['nodes'], result['wall'], result['cpu'],
+                                    result.get('memory'))
+                    if layouts is not None:
+                        layouts.update(result['key'], result['pos'])
+                    if manifest is not None:
+                        manifest.record(names[i], hashes[i])
+                    if progress is not None:
+                        progress(done, total)
+                    if cancel is not None and cancel.is_set():
+                        raise Cancelled(f'Export cancelled after {done} of {total} pdfs')
+        finally:
+            # pdfs finished before a cancel or error still count as rendered next time
+            if manifest is not None:
+                manifest.save()
+
+        if manifest is not None and delete_stale_pdfs:
+            deleted = manifest.collect_garbage(names)
+            manifest.save()
+            if deleted:
+                print(f'Deleted {len(deleted)} pdfs of networks that no longer exist')
+        if layouts is not None:
+            layouts.prune(network_keys(multi))
+            layouts.save()
+    return subnetwork_df, columns, igroup, mgroup
 
-        # concat to list
-        igroup += i2
-        mgroup += m2
 
-        # calculate summary stats of membership attributes
-        total_loan = sum(m['OPN_LN_BAL'])
-        total_saving = sum(m['OPN_SV_BAL'])
-        loan_count = sum(m['OPN_LN_ALL_CNT'])
-        saving_count = sum(m['OPN_SV_ALL_CNT'])
-        total_dividend = sum(m['DIV_YTD_AMT'])
-        total_interest = sum(m['INT_YTD_AMT'])
+def render_jobs(multi, rollups, centers, titles, render_only=None, layouts=None, links=None, render_to='pdfs'):
+    """Yields a RenderJob per subgraph, in the order of multi
+    :param layouts: LayoutCache to draw unchanged networks from, None lays out every network afresh
+    :param links: drawing of every network relative to the output folder (see drawing_links), None
+    saves each pdf under its title
+    :param render_to: 'pdfs' draws with the renderer in layout_settings.py, a book or svgs always
+    use the lean renderer
+    """
+    from member_net.compact_graph import as_networkx
+    from member_net.rendering import RenderJob, summary_table
 
-        products_per_member = (loan_count + saving_count) / len(m)
+    render_only = set(range(len(multi)) if render_only is None else render_only)
+    keys = network_keys(multi) if layouts is not None else None
+    for i, colors in enumerate(network_color_maps(multi)):
+        if i not in render_only:
+            continue
 
-        plt.title(f'The {title} network')
+        # specify subgraph, drawing needs networkx so the compact backend is exported one network at a time
+        graph = as_networkx(multi[i])
 
         # make summary table formatted for display
-        account_dict = {'Center': title,
-                        'Nodes': node_count,
-                        'Individuals': len(i),
-                        'Memberships': len(m),
-                        'Total Savings': f'${total_saving:,.2f}',
-                        'Total Loans': f'${total_loan:,.2f}',
-                        'PPM': f'{products_per_member:.2n}',
-                        'Dividends Paid': f'${total_dividend:,.2f}',
-                        'Interest received': f'${total_interest:,.2f}'}
-
-        act_df = pd.DataFrame.from_dict(account_dict, orient='index').rename(columns={0: ''})
-
-        export_list = [title, f'=HYPERLINK("pdfs/{title}.pdf")', node_count, len(i), len(m), total_saving, total_loan,
-                       products_per_member, total_dividend,
-                       total_interest]
-
-        # make the account summary table
-        fig2 = make_table(act_df)
-
-        # save graph and table as pdf
-        make_pdf(fig1, fig2, title)
-
-        subnetwork_df.append(export_list)
-
-        # close the plot to save memory
-        plt.close(fig1)
-        plt.close(fig2)
-    return subnetwork_df, columns, igroup, mgroup
-
-
-def output_csvs(individual_group, member_group):
-    """Save the tables containing individual/member and subgraph id (group)"""
-    individual_group = pd.DataFrame(individual_group, columns=['INDIVIDUAL_ID', 'GROUP_ID'])
-    member_group = pd.DataFrame(member_group, columns=['MEMBER_NBR', 'GROUP_ID'])
-    individual_group.to_csv(f'{output_location}//{individual_group_csv_filename}{timestamp}.csv', index=False)
-    member_group.to_csv(f'{output_location}//{member_group_csv_filename}{timestamp}.csv', index=False)
-
-
-def output_excel(subnetwork_df, columns):
-    """Save summary excel file"""
-    d = pd.DataFrame(subnetwork_df, columns=columns)
-    d.to_excel(f'{output_location}//{summary_xls_filename}-{timestamp}.xlsx')
+        title = titles[i]
+        act_df = summary_table(title, len(graph), rollups.iloc[i])
+
+        # cached positions skip or warm start the layout
+        key = keys[i] if layouts is not None else None
+        pos = layouts.positions(key, graph) if layouts is not None else None
+        link = f'pdfs/{title}.pdf' if links is None else links[i]
+        yield RenderJob(graph, colors, centers[i], title, act_df, f'{output_location}//{link}', key, pos,
+                        layout_settings.layout_algorithm, layout_settings.large_network_nodes,
+                        layout_settings.renderer if render_to == 'pdfs' else 'lean')
+
+
+def network_keys(multi):
+    """network_key of every network in multi, the same keys the center cache uses"""
+    from member_net.components import SubgraphList
+
+    if isinstance(multi, SubgraphList):
+        return [network_key(multi.node_ids(k)) for k in range(len(multi))]
+    return [network_key(graph.nodes) for graph in multi]
+
+
+def incremental_subgraph_output(multi, ind, workers=1, center_strategy='degree', profile=None, progress=None,
+                                cancel=None, metrics=None, metrics_workers=None, plan=None):
+    """subgraph_output that only re-renders the networks whose edges changed since the last
+    incremental run. Summary rows and group tables are still rolled up for every network.
+    :param plan: IncrementalPlan of the graph, made before get_subgraphs so only the changed
+    components are labelled again. None makes one here, after the graph was labelled in full
+    :return: the subgraph_output results plus a DataFrame of the networks that changed
+    """
+    from member_net.incremental import IncrementalPlan
+
+    profile = profile or RunProfile()
+    with profile.stage('changed networks'):
+        plan = plan or IncrementalPlan(multi.graph_object)
+        plan.select(multi)
+        plan.seed_centers(center_strategy)
+    print(f'{len(plan.added)} edges added, {len(plan.removed)} edges removed since the last run')
+    print(f'{len(plan.changed)} of {len(multi)} networks changed')
+
+    subnetwork_df, columns, igroup, mgroup = subgraph_output(multi, ind, True, workers, center_strategy,
+                                                             render_only=plan.changed, profile=profile,
+                                                             progress=progress, cancel=cancel,
+                                                             metrics=metrics, metrics_workers=metrics_workers)
+    titles = subnetwork_df.titles
+    with profile.stage('save incremental state'):
+        changes = plan.report(titles)
+        plan.save(titles)
+    return subnetwork_df, columns, igroup, mgroup, changes
+
+
+def output_changes(changes):
+    """Save the report of networks changed since the last run"""
+    changes.to_csv(f'{output_location}//{changed_networks_csv_filename}{timestamp}.csv', index=False)
+
+
+def output_csvs(individual_group, member_group, label='', file_format=None):
+    """Save the tables containing individual/member and subgraph id (group), a chunk of rows at a time.
+    Accepts the GroupTables from subgraph_output, DataFrames or lists of [id, group] pairs.
+    :param label: added to the end of the file names, e.g. to tell size filters apart
+    :param file_format: 'csv' or 'parquet', None leaves it to group_table_format in output_location.py"""
+    from member_net.table_writers import group_chunks, write_table
+
+    file_format = file_format or group_table_format
+    individual_group = group_chunks(individual_group, ['INDIVIDUAL_ID', 'GROUP_ID'])
+    member_group = group_chunks(member_group, ['MEMBER_NBR', 'GROUP_ID'])
+    write_table(f'{output_location}//{individual_group_csv_filename}{timestamp}{label}',
+                individual_group, file_format)
+    write_table(f'{output_location}//{member_group_csv_filename}{timestamp}{label}',
+                member_group, file_format)
+
+
+def output_excel(subnetwork_df, columns, label=''):
+    """Save summary excel file, streaming the rows into a write only workbook
+    :param subnetwork_df: summary rows from subgraph_output, any iterable of rows
+    :param label: added to the end of the file name"""
+    from member_net.table_writers import write_xlsx
+
+    write_xlsx(f'{output_location}//{summary_xls_filename}-{timestamp}{label}.xlsx', columns, subnetwork_df)
+
+
+def output_graph(graph_object, gexf=True, tables=None):
+    """Save the full graph as gexf, plus the flat graph tables
+    :param tables: save the graph tables, None leaves it to export_graph_tables in output_location.py"""
+    from member_net.graph_export import write_gexf, write_tables
+
+    if tables is None:
+        tables = export_graph_tables
+    if gexf:
+        extension = 'gexf.gz' if compress_gexf else 'gexf'
+        write_gexf(graph_object, f'{output_location}//{gephx_filename}{timestamp}.{extension}')
+    if tables:
+        write_tables(graph_object, f'{output_location}//{gephx_filename}{timestamp}')
+
+
+def output_run_report(profile):
+    """Print the stage timings and slowest networks, and save the json run report"""
+    profile.print_summary(profile_settings.slowest_networks_shown)
+    if profile_settings.save_run_report:
+        profile.save(f'{output_location}//{run_report_filename}{timestamp}.json',
+                     profile_settings.slowest_networks_shown, profile_settings.report_every_network)
 
 
 def cli():
     """Initiate and run the app via command line"""
+    from member_net.incremental import IncrementalPlan
+
     db = input('Sqlite or DataMart?').lower()
 
     n = int(input('Subgraph size filter? Enter an integer.'))
 
+    workers = input('Number of processes for rendering pdfs? Press enter for 1.')
+    workers = int(workers) if workers.strip() else 1
+
+    incremental = input('Only re-render networks that changed since the last run? (y/n)').lower().startswith('y')
+
     check_output()
+    profile = RunProfile(profile_settings.trace_memory)
+
+    pushdown = use_pushdown(extraction_settings.pushdown, n)
+    g, ind = generate_member_graph(db, profile=profile, pushdown=pushdown)
 
-    g, ind = generate_member_graph(db)
+    # an incremental run only labels the components whose edges changed
+    plan = None
+    if incremental:
+        with profile.stage('diff edges'):
+            plan = IncrementalPlan(g)
 
-    multi = get_subgraphs(g, n)
+    with profile.stage('components'):
+        multi = get_subgraphs(g, n)
 
     print('#'*14)
     print('Beginning export...')
@@ -332,42 +575,137 @@ def cli():
     print(f'To change export location, edit output_locations.py in the config folder')
     print('Generating graphics..')
 
-    subnetwork_df, columns, igroup, mgroup = subgraph_output(multi, ind)
+    if incremental:
+        subnetwork_df, columns, igroup, mgroup, changes = incremental_subgraph_output(multi, ind, workers,
+                                                                                      profile=profile,
+                                                                                      plan=plan)
+        print('Generating changed networks report...')
+        output_changes(changes)
+    else:
+        subnetwork_df, columns, igroup, mgroup = subgraph_output(multi, ind, workers=workers, profile=profile)
 
     # Export member/individual/group to csv
     print('Generating member/individual and group tables...')
-    output_csvs(igroup, mgroup)
+    with profile.stage('csv output'):
+        output_csvs(igroup, mgroup)
 
     # Export summary spreadsheet
     print('Generating summary spreadsheet...')
-    output_excel(subnetwork_df, columns)
+    with profile.stage('excel output'):
+        output_excel(subnetwork_df, columns)
 
     # Export gexf
     print('Generating gexf...')
-    nx.write_gexf(g, f'{output_location}//{gephx_filename}{timestamp}.gexf')
+    with profile.stage('gexf output'):
+        output_graph(g)
 
+    output_run_report(profile)
     print('All done')
 
 
-def main():
-    """Main function to execute the whole thing. Accepts 'gui' or 'cli' as argv"""
-    import sys
+def batch(args):
+    """Run the export without prompts. Every size filter shares one graph load and component labeling.
+    Pdfs are rendered once, for the smallest filter, since larger filters export a subset of its
+    networks. With several filters the summary and group files are labelled 'min <n> nodes'.
+    :param args: parsed arguments, see batch_parser in options.py
+    """
+    from member_net.incremental import IncrementalPlan
 
-    # If no argument is passed, default to GUI
-    if len(sys.argv) < 2:
-        import member_net.gui as gooey
-        gooey.root.mainloop()
+    if args.output:
+        set_output_location(args.output)
+    check_output()
+    profile = RunProfile(profile_settings.trace_memory)
+    thresholds = sorted(set(args.min_nodes))
 
-    # If an argument is passed, evaluate it
-    else:
-        mode = str(sys.argv[1]).lower()
+    pushdown = use_pushdown(args.pushdown or extraction_settings.pushdown, thresholds[0])
+    if args.out_of_core:
+        out_of_core_batch(args, thresholds, profile, pushdown)
+        output_run_report(profile)
+        print('All done')
+        return
 
-        if mode == 'cli':
-            cli()
+    g, ind = generate_member_graph(args.db, args.backend, args.chunksize, not args.no_snapshots, profile=profile,
+                                   pushdown=pushdown)
 
-        if mode == 'gui':
-            import member_net.gui as gooey
-            gooey.root.mainloop()
+    # an incremental run only labels the components whose edges changed
+    plan = None
+    if args.incremental and 'pdf' in args.artifacts:
+        with profile.stage('diff edges'):
+            plan = IncrementalPlan(g)
 
+    print('#'*14)
+    print('Beginning export...')
+    print(f'Output folder: {output_location}')
+
+    for i, n in enumerate(thresholds):
+        label = f' min {n} nodes' if len(thresholds) > 1 else ''
+        print(f'Size filter {n}...')
+        with profile.stage('components'):
+            multi = get_subgraphs(g, n)
+
+        render = 'pdf' in args.artifacts and i == 0
+        if render and args.incremental:
+            subnetwork_df, columns, igroup, mgroup, changes = incremental_subgraph_output(
+                multi, ind, args.workers, args.center_strategy, profile=profile,
+                metrics=args.metrics or None, metrics_workers=args.metrics_workers, plan=plan)
+            output_changes(changes)
         else:
-            print(f'Please input \'cli\' or \'gui\' only')
+            subnetwork_df, columns, igroup, mgroup = subgraph_output(multi, ind, render, args.workers,
+                                                                     args.center_strategy, profile=profile,
+                                                                     network_index=None if i == 0 else False,
+                                                                     render_to=args.render_to,
+                                                                     metrics=args.metrics or None,
+                                                                     metrics_workers=args.metrics_workers)
+
+        if 'csv' in args.artifacts:
+            with profile.stage('csv output'):
+                output_csvs(igroup, mgroup, label, args.group_format)
+        if 'excel' in args.artifacts:
+            with profile.stage('excel output'):
+                output_excel(subnetwork_df, columns, label)
+
+    if 'gexf' in args.artifacts or 'tables' in args.artifacts:
+        with profile.stage('gexf output'):
+            output_graph(g, 'gexf' in args.artifacts, 'tables' in args.artifacts)
+
+    output_run_report(profile)
+    print('All done')
+
+
+def out_of_core_batch(args, thresholds, profile, pushdown=False):
+    """Batch run for graphs larger than memory. The edges are streamed into a memory-mapped
+    union-find (see out_of_core.py), the centers of the networks are chosen a bucket of them at a
+    time, then the component of every node and the group tables of each size filter are written
+    out a block at a time. Drawings, the summary spreadsheet and
+    the gephx file need the graph itself, so they are skipped.
+    :param args: parsed arguments, see batch_parser in options.py
+    :param thresholds: sorted size filters
+    """
+    from member_net.out_of_core import label_out_of_core
+
+    skipped = [artifact for artifact in args.artifacts if artifact != 'csv']
+    if skipped:
+        print(f'Skipping {", ".join(skipped)}, which need the graph in memory')
+    file_format = args.group_format or group_table_format
+
+    with profile.stage('label components out of core'):
+        components = label_out_of_core(args.db, args.chunksize, not args.no_snapshots, pushdown)
+    try:
+        print(f'{components.n_edges} participations, {components.n_nodes} nodes')
+        get_subgraph_attributes(components)
+        # the exported networks are named after the same centers as in the other modes
+        with profile.stage('centers'):
+            components.find_centers(thresholds[0], args.center_strategy)
+        with profile.stage('component table'):
+            components.write_component_table(f'{output_location}//{component_table_filename}{timestamp}', file_format)
+
+        if 'csv' in args.artifacts:
+            for n in thresholds:
+                label = f' min {n} nodes' if len(thresholds) > 1 else ''
+                print(f'{components.count(n)} networks with at least {n} nodes')
+                with profile.stage('csv output'):
+                    components.write_group_tables(
+                        f'{output_location}//{individual_group_csv_filename}{timestamp}{label}',
+                        f'{output_location}//{member_group_csv_filename}{timestamp}{label}', n, file_format)
+    finally:
+        components.close()
@@ -0,0 +1,281 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import config.metrics_settings as metrics_settings  # metrics_settings.py file
+from member_net.centers import bfs_distances, local_csr
+from member_net.compact_graph import CompactGraph, gather_neighbors
+from member_net.components import edge_codes
+from member_net.rollups import ROLLUP_COLUMNS, network_nodes
+
+# metric columns, in the order they are added to the summary spreadsheet
+METRIC_COLUMNS = ['Edges', 'Density', 'Diameter', 'Min Degree', 'Max Degree', 'Mean Degree']
+
+# source/node pairs a batch of exact diameter searches holds at most
+PAIRS_PER_SEARCH = 4000000
+
+# arrays attached by each worker process, see _attach_worker
+_worker_arrays = None
+
+
+class SharedArrays:
+    """Numpy arrays copied once into multiprocessing.shared_memory blocks, so worker processes
+    map them without a copy or a pickle. Close it (or use it as a context manager) to free the blocks.
+    :param arrays: dict of name -> array
+    """
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+                self.spec[name] = (block.name, array.dtype.str, array.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(spec):
+    """Maps the arrays of a SharedArrays spec in another process
+    :return blocks, arrays: the SharedMemory blocks, which must outlive the arrays, and dict of name -> array
+    """
+    blocks = []
+    arrays = {}
+    for name, (block_name, dtype, shape) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+
+def graph_arrays(multi, members=None):
+    """The flat arrays every network's metrics and totals are computed from
+    :param multi: the SubgraphList from get_subgraphs, either backend
+    :param members: membership table from network_nodes, for the totals of a networkx graph.
+    None builds it here
+    :return: dict of indptr/indices (CSR adjacency of the whole graph), order/offsets (node
+    codes of each component), selected (component of each network) and totals (ROLLUP_COLUMNS of
+    every node code, NaN for individuals and nodes outside the networks)
+    """
+    graph = multi.graph_object
+    components = multi.components
+    if isinstance(graph, CompactGraph):
+        indptr, indices = graph.indptr, graph.indices
+        totals = np.full((graph.n_nodes, len(ROLLUP_COLUMNS)), np.nan)
+        member_attrs = graph.member_attrs.reindex(columns=ROLLUP_COLUMNS)
+        totals[:graph.n_members] = member_attrs.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    else:
+        nodes = components.nodes
+        sources, targets = components.edges or edge_codes(graph, nodes)
+        indptr, indices = csr(len(nodes), sources, targets)
+        if members is None:
+            members = network_nodes(multi)[0]
+        totals = np.full((len(nodes), len(ROLLUP_COLUMNS)), np.nan)
+        codes = pd.Index(nodes).get_indexer(members['NODE_ID'])
+        member_totals = members.reindex(columns=ROLLUP_COLUMNS).apply(pd.to_numeric, errors='coerce')
+        totals[codes] = member_totals.to_numpy(dtype=float)
+    return {'indptr': indptr, 'indices': indices, 'order': components.order, 'offsets': components.offsets,
+            'selected': np.asarray(multi.selected), 'totals': totals}
+
+
+def csr(n_nodes, sources, targets):
+    """Symmetric CSR adjacency of an edge list, as CompactGraph builds it
+    :return indptr, indices:
+    """
+    rows = np.concatenate([sources, targets])
+    order = np.argsort(rows, kind='stable')
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_nodes))])
+    return indptr, np.concatenate([targets, sources])[order]
+
+
+def network_cost(sizes, exact_diameter_nodes):
+    """Rough work of each network: an exact diameter searches from every node, so it grows with
+    the square of the size, an estimate only takes a few searches"""
+    sizes = np.asarray(sizes, dtype=float)
+    return np.where(sizes <= exact_diameter_nodes, sizes * sizes, 4 * sizes)
+
+
+def size_partitions(costs, parts):
+    """Splits networks into parts of about equal total cost, each network going to the least
+    loaded part in order of decreasing cost (longest processing time first)
+    :param costs: cost of every network
+    :param parts: number of parts
+    :return: list of arrays of network positions, most costly part first, empty parts dropped
+    """
+    heap = [(0.0, p) for p in range(parts)]
+    members = [[] for _ in range(parts)]
+    for k in np.argsort(-np.asarray(costs), kind='stable'):
+        load, p = heapq.heappop(heap)
+        members[p].append(k)
+        heapq.heappush(heap, (load + costs[k], p))
+    loads = {p: load for load, p in heap}
+    order = sorted(range(parts), key=lambda p: -loads[p])
+    return [np.sort(np.asarray(members[p], dtype=np.int64)) for p in order if members[p]]
+
+
+def network_codes(arrays, networks):
+    """Node codes of some networks, one network after another
+    :return codes, starts, counts: the codes, and where each network's codes start and how many it has
+    """
+    offsets = arrays['offsets']
+    components = arrays['selected'][networks]
+    counts = offsets[components + 1] - offsets[components]
+    starts = np.cumsum(counts) - counts
+    codes = arrays['order'][np.repeat(offsets[components] - starts, counts) + np.arange(counts.sum())]
+    return codes, starts, counts
+
+
+def partition_metrics(arrays, networks, exact_diameter_nodes):
+    """Metrics and ROLLUP_COLUMNS totals of some networks, each column computed for all of them at once
+    :param arrays: graph_arrays, or their shared memory copies
+    :param networks: network positions
+    :return: DataFrame indexed by network position
+    """
+    networks = np.asarray(networks, dtype=np.int64)
+    index = pd.Index(networks, name='NETWORK')
+    if not len(networks):
+        return pd.DataFrame(columns=METRIC_COLUMNS + ROLLUP_COLUMNS, index=index)
+
+    indptr = arrays['indptr']
+    codes, starts, counts = network_codes(arrays, networks)
+    degree = indptr[codes + 1] - indptr[codes]
+    degree_sum = np.add.reduceat(degree, starts)
+    edges = degree_sum // 2
+    frame = pd.DataFrame({'Edges': edges,
+                          'Density': np.where(counts > 1, 2 * edges / np.maximum(counts * (counts - 1), 1), 0.0),
+                          'Diameter': diameters(arrays, codes, starts, counts, exact_diameter_nodes),
+                          'Min Degree': np.minimum.reduceat(degree, starts),
+                          'Max Degree': np.maximum.reduceat(degree, starts),
+                          'Mean Degree': degree_sum / counts}, index=index)
+    frame[ROLLUP_COLUMNS] = np.add.reduceat(np.nan_to_num(arrays['totals'][codes]), starts, axis=0)
+    return frame
+
+
+def diameters(arrays, codes, starts, counts, exact_diameter_nodes):
+    """Diameter of every network (see network_codes). Networks up to exact_diameter_nodes are searched
+    from every node, a batch of networks at a time. Larger ones get a double sweep: the farthest
+    distance from the node farthest from the highest degree node, a lower bound that is exact for
+    trees and most sparse networks.
+    """
+    indptr, indices = arrays['indptr'], arrays['indices']
+    result = np.zeros(len(counts), dtype=np.int64)
+
+    exact = np.flatnonzero(counts <= exact_diameter_nodes)
+    batches = (np.cumsum(counts[exact].astype(np.int64) ** 2) - 1) // PAIRS_PER_SEARCH
+    for batch in np.split(exact, np.flatnonzero(np.diff(batches)) + 1):
+        if not len(batch):
+            continue
+        batch_codes, _, batch_counts = _slice_codes(codes, starts[batch], counts[batch])
+        result[batch] = np.maximum.reduceat(eccentricities(indptr, indices, batch_codes, batch_counts),
+                                            np.cumsum(batch_counts) - batch_counts)
+
+    for k in np.flatnonzero(counts > exact_diameter_nodes):
+        network = np.sort(codes[starts[k]:starts[k] + counts[k]])
+        local_indptr, local_indices = local_csr(indptr, indices, network)
+        far = int(np.argmax(bfs_distances(local_indptr, local_indices, int(np.argmax(np.diff(local_indptr))))))
+        result[k] = bfs_distances(local_indptr, local_indices, far).max()
+    return result
+
+
+def _slice_codes(codes, starts, counts):
+    """The codes of some networks out of network_codes, one network after another"""
+    offsets = np.cumsum(counts) - counts
+    return codes[np.repeat(starts - offsets, counts) + np.arange(counts.sum())], offsets, counts
+
+
+def eccentricities(indptr, indices, codes, counts):
+    """Eccentricity of every node of some networks, from a breadth first search out of each node
+    run side by side: every level expands the frontier of all the searches in one step. Whether a
+    search has reached a node is one flag per (source, node) pair of the same network, so a batch
+    needs the sum of the squared network sizes in flags.
+    :param codes: node codes of the networks, one network after another
+    :param counts: node count of each network
+    :return: eccentricity of every node in codes
+    """
+    network = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(len(codes)) - np.repeat(np.cumsum(counts) - counts, counts)
+    size = counts[network]
+    base = np.repeat(np.cumsum(counts ** 2) - counts ** 2, counts) + local * size
+    sorter = np.argsort(codes)
+    sorted_codes = codes[sorter]
+
+    reached = np.zeros(int((counts ** 2).sum()), dtype=bool)
+    claim = np.zeros(len(reached), dtype=np.int64)
+    eccentricity = np.zeros(len(codes), dtype=np.int64)
+    search = np.arange(len(codes))
+    node = search
+    reached[base + local] = True
+    d = 0
+    while len(search):
+        d += 1
+        degree = indptr[codes[node] + 1] - indptr[codes[node]]
+        search = np.repeat(search, degree)
+        node = sorter[np.searchsorted(sorted_codes, gather_neighbors(indptr, indices, codes[node]))]
+        pair = base[search] + local[node]
+        new = ~reached[pair]
+        search, node, pair = search[new], node[new], pair[new]
+        # a node reached along several edges is kept once
+        claim[pair] = np.arange(len(pair))
+        first = claim[pair] == np.arange(len(pair))
+        search, node = search[first], node[first]
+        reached[pair] = True
+        eccentricity[search] = d
+    return eccentricity
+
+
+def _attach_worker(spec):
+    global _worker_arrays
+    _worker_arrays = attach(spec)
+
+
+def _worker_metrics(networks, exact_diameter_nodes):
+    return partition_metrics(_worker_arrays[1], networks, exact_diameter_nodes)
+
+
+def network_metrics(multi, workers=None, exact_diameter_nodes=None, members=None):
+    """Metrics and ROLLUP_COLUMNS totals of every network in multi, computed across processes.
+    The graph's arrays are put in shared memory once, and each process gets a part of the
+    networks of about equal work, balanced by network size.
+    :param multi: the SubgraphList from get_subgraphs
+    :param workers: number of processes, 1 computes in this process, None for metrics_workers
+    in metrics_settings.py (None there uses every core)
+    :param exact_diameter_nodes: see diameter, None for the setting in metrics_settings.py
+    :param members: membership table from network_nodes, see graph_arrays
+    :return: DataFrame of METRIC_COLUMNS and ROLLUP_COLUMNS indexed by network position
+    """
+    workers = workers or metrics_settings.metrics_workers or os.cpu_count() or 1
+    if exact_diameter_nodes is None:
+        exact_diameter_nodes = metrics_settings.exact_diameter_nodes
+
+    arrays = graph_arrays(multi, members)
+    sizes = np.diff(arrays['offsets'])[arrays['selected']]
+    workers = min(workers, len(multi))
+    if workers <= 1:
+        return partition_metrics(arrays, range(len(multi)), exact_diameter_nodes).reindex(range(len(multi)))
+
+    parts = size_partitions(network_cost(sizes, exact_diameter_nodes), workers)
+    with SharedArrays(arrays) as shared:
+        del arrays
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker, initargs=(shared.spec,)) as pool:
+            frames = list(pool.map(_worker_metrics, parts, [exact_diameter_nodes] * len(parts)))
+    return pd.concat(frames).sort_index()
@@ -0,0 +1,60 @@
+import argparse
+
+from config.output_location import output_location  # ouput_location.py file
+
+# Choices shared by the command line and the pipeline. This module only imports the standard
+# library, so arguments (and --help) are handled before pandas, networkx or matplotlib load.
+
+CENTER_STRATEGIES = ('degree', 'double_sweep', 'exact')
+
+GRAPH_BACKENDS = ('networkx', 'compact')
+
+ARTIFACTS = ('pdf', 'csv', 'excel', 'gexf', 'tables')
+
+RENDER_OUTPUTS = ('pdfs', 'book', 'svg')
+
+
+def batch_parser():
+    """Arguments of the non-interactive batch mode"""
+    parser = argparse.ArgumentParser(prog='app.py batch',
+                                     description='Export member networks without prompts, e.g. from a scheduled task')
+    parser.add_argument('--db', required=True, choices=['sqlite', 'datamart'], type=str.lower)
+    parser.add_argument('--min-nodes', type=int, nargs='+', default=[3],
+                        help='one or more subgraph size filters, all exported from a single graph load')
+    parser.add_argument('--output', help=f'output folder, defaults to output_location.py ({output_location})')
+    parser.add_argument('--artifacts', nargs='+', choices=ARTIFACTS, default=['pdf', 'csv', 'excel', 'gexf'],
+                        help='files to produce. tables saves the graph as parquet/csv tables')
+    parser.add_argument('--group-format', choices=['csv', 'parquet'],
+                        help='file type of the group tables, defaults to output_location.py')
+    parser.add_argument('--workers', type=int, default=1, help='processes rendering pdfs')
+    parser.add_argument('--render-to', choices=RENDER_OUTPUTS,
+                        help='a pdf per network, one multi-page pdf (book), or an svg per network. '
+                             'Defaults to output_location.py')
+    parser.add_argument('--metrics', action='store_true',
+                        help='add edges, density, diameter and degree statistics to the summary spreadsheet')
+    parser.add_argument('--metrics-workers', type=int,
+                        help='processes computing the metrics and network totals, defaults to metrics_settings.py')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only re-render pdfs of networks that changed since the last incremental run')
+    parser.add_argument('--center-strategy', choices=CENTER_STRATEGIES, default='degree')
+    parser.add_argument('--backend', choices=GRAPH_BACKENDS, default='networkx')
+    parser.add_argument('--chunksize', type=int, help='stream the queries this many rows at a time')
+    parser.add_argument('--no-snapshots', action='store_true', help='always query the database')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='label the networks without loading the graph into memory, saving only the '
+                             'component and group tables')
+    parser.add_argument('--pushdown', action='store_true',
+                        help='filter participations in the database (size filters of 3 or more)')
+    return parser
+
+
+def lookup_parser():
+    """Arguments of the network lookup"""
+    parser = argparse.ArgumentParser(prog='app.py lookup',
+                                     description='Show the network a member or individual is in, from the last export')
+    parser.add_argument('id', help='MEMBER_NBR, INDIVIDUAL_ID, or a group id from the group tables')
+    parser.add_argument('--type', choices=['membership', 'individual'], help='only match this kind of node')
+    parser.add_argument('--output', help=f'output folder of the export, defaults to output_location.py ({output_location})')
+    parser.add_argument('--nodes', action='store_true', help='also list every membership and individual')
+    parser.add_argument('--no-render', action='store_true', help="don't render the pdf if it is missing")
+    return parser
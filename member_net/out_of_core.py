@@ -0,0 +1,510 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import config.extraction_settings as extraction_settings  # extraction_settings.py file
+from member_net.cache import cache_path, network_key
+from member_net.centers import CenterCache, choose_center
+from member_net.connections import ConnectionPool, extraction_queries
+from member_net.loader import read_chunks
+from member_net.snapshots import data_date, open_snapshot_cache, snapshot_key
+from member_net.table_writers import write_table
+
+# Out-of-core component labeling: the participation edges are streamed once from the database
+# (or today's snapshot), and everything sized by the number of nodes or edges lives in
+# memory-mapped work files. Only one block of rows is held in memory at a time.
+#
+# Node codes follow CompactGraph: 0..n_members-1 are memberships, the rest individuals. Here
+# the codes are in id order rather than order of first appearance, since the ids are sorted
+# on disk to encode them. Code order is therefore the order centers break ties in (memberships
+# first, then by id), see tie_key in centers.py.
+
+
+class SpillFile:
+    """Append only binary file of one dtype, read back as a memory-mapped array
+    :param path: file to create
+    """
+
+    def __init__(self, path, dtype=np.int64):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self._file = open(path, 'wb')
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self._file.write(values.tobytes())
+        self.size += len(values)
+
+    def close(self):
+        self._file.close()
+
+    def array(self):
+        """The file as a read only memmap, closing it first"""
+        if not self._file.closed:
+            self.close()
+        return open_array(self.path, self.dtype, self.size, 'r')
+
+
+def open_array(path, dtype, size, mode='w+'):
+    """np.memmap of size items, or an empty array for size 0, which can't be mapped"""
+    if size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, shape=(size,))
+
+
+def edge_chunks(db_type, chunksize, use_snapshots=True, pushdown=False):
+    """Yields DataFrame chunks of the projected edge query, from today's snapshot when there is one.
+    Only the edges are read, the node attribute queries aren't needed to label components.
+    """
+    queries = extraction_queries(db_type, projected=True, pushdown=pushdown)
+    cache = open_snapshot_cache() if use_snapshots else None
+    key = snapshot_key(queries, data_date(db_type)) if cache else None
+    if cache and cache.exists(key):
+        print('Reading edges from snapshot cache')
+        yield from cache.read_batches(key, 'edge', chunksize)
+        return
+
+    with ConnectionPool(db_type, size=1) as pool:
+        with pool.connection() as conn:
+            yield from read_chunks(conn, queries[2], chunksize)
+
+
+class OutOfCoreComponents:
+    """Connected components of the participation edges, labeled without holding the graph in memory.
+    Edge ids are spilled to disk as they arrive, encoded as node codes through sorted id files,
+    and joined in a memory-mapped union-find. Call close() to delete the work files.
+    :param directory: folder for the work files, created if needed and deleted by close()
+    :param block: rows handled per step
+    :param separate_ids: keep a MEMBER_NBR and an INDIVIDUAL_ID of the same value as two nodes,
+    None for separate_colliding_ids in extraction_settings.py
+    """
+
+    def __init__(self, directory, block=1000000, separate_ids=None):
+        self.directory = directory
+        self.block = block
+        if separate_ids is None:
+            separate_ids = extraction_settings.separate_colliding_ids
+        self.separate_ids = separate_ids
+        os.makedirs(directory, exist_ok=True)
+        self.member_ids = self.individual_ids = None
+        self.sources = self.targets = None
+        self.n_members = self.n_nodes = self.n_edges = 0
+        self.degree = self.labels = self.sizes = self.centers = None
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{name}.bin')
+
+    def build(self, chunks):
+        """Labels the components of the edges in chunks
+        :param chunks: iterable of DataFrames with source (MEMBER_NBR) and target (INDIVIDUAL_ID) columns
+        :return: self
+        """
+        sources, targets = self._spill_edges(chunks)
+        self.sources, self.targets = sources, targets
+        self.n_members = len(self.member_ids)
+        self.n_nodes = self.n_members + len(self.individual_ids)
+        self.n_edges = len(sources)
+
+        # new work files start out zeroed
+        parent = open_array(self.path('parent'), np.int64, self.n_nodes)
+        self.degree = open_array(self.path('degree'), np.int64, self.n_nodes)
+        for start, stop in self._node_blocks():
+            parent[start:stop] = np.arange(start, stop)
+
+        for start in range(0, self.n_edges, self.block):
+            s, t = self._encode(sources[start:start + self.block], targets[start:start + self.block])
+            for codes in (s, t):
+                u, counts = np.unique(codes, return_counts=True)
+                self.degree[u] += counts
+            union(parent, s, t)
+
+        self._label(parent)
+        self._find_centers()
+        return self
+
+    def _spill_edges(self, chunks):
+        """Writes the edge ids to disk and builds the sorted id files
+        :return sources, targets: memmaps of the MEMBER_NBR and INDIVIDUAL_ID of every edge
+        """
+        sources = SpillFile(self.path('sources'))
+        targets = SpillFile(self.path('targets'))
+        runs = {'member_ids': IdRuns(self, 'member_ids'), 'individual_ids': IdRuns(self, 'individual_ids')}
+        for chunk in chunks:
+            check_integer_ids(chunk)
+            s = chunk['source'].to_numpy(dtype=np.int64)
+            t = chunk['target'].to_numpy(dtype=np.int64)
+            sources.append(s)
+            targets.append(t)
+            runs['member_ids'].add(s)
+            runs['individual_ids'].add(t)
+        self.member_ids = runs['member_ids'].merge()
+        self.individual_ids = runs['individual_ids'].merge()
+        if not self.separate_ids:
+            self._merge_colliding_ids()
+        return sources.array(), targets.array()
+
+    def _merge_colliding_ids(self):
+        """Drops the member ids that are also individual ids, so those memberships are encoded as
+        the individual of the same id, as CompactGraphBuilder.build does"""
+        kept = SpillFile(self.path('kept member_ids'))
+        for start in range(0, len(self.member_ids), self.block):
+            ids = self.member_ids[start:start + self.block]
+            kept.append(ids[~contains(self.individual_ids, ids)])
+        self.member_ids = kept.array()
+
+    def _encode(self, sources, targets):
+        """Node codes of a block of edge ids
+        :return s, t: codes of the MEMBER_NBR (an individual's code for a merged membership) and INDIVIDUAL_ID
+        """
+        s = np.searchsorted(self.member_ids, sources)
+        merged = ~contains(self.member_ids, sources)
+        if merged.any():
+            s[merged] = np.searchsorted(self.individual_ids, sources[merged]) + self.n_members
+        t = np.searchsorted(self.individual_ids, targets) + self.n_members
+        return s, t
+
+    def _label(self, parent):
+        """Flattens the union-find into component labels, numbered in order of lowest node code.
+        A node's parent is never above it, so a single pass in code order leaves every parent a root.
+        """
+        self.labels = open_array(self.path('labels'), np.int64, self.n_nodes)
+        sizes = open_array(self.path('sizes'), np.int64, self.n_nodes)
+        n_components = 0
+        for start, stop in self._node_blocks():
+            roots = parent[start:stop].copy()
+            while True:
+                jumped = parent[roots]
+                if np.array_equal(jumped, roots):
+                    break
+                roots = jumped
+                parent[start:stop] = roots
+            is_root = roots == np.arange(start, stop)
+            self.labels[start:stop][is_root] = np.arange(n_components, n_components + is_root.sum())
+            n_components += int(is_root.sum())
+            self.labels[start:stop] = self.labels[roots]
+            u, counts = np.unique(self.labels[start:stop], return_counts=True)
+            sizes[u] += counts
+        self.sizes = sizes[:n_components]
+
+    def _find_centers(self):
+        """Center (highest degree node) of every component, ties to the lowest node code. Repeated
+        participations count towards the degree here, find_centers replaces the centers of the
+        exported networks with the ones the other modes choose."""
+        n = len(self.sizes)
+        best = open_array(self.path('best degree'), np.int64, n)
+        self.centers = open_array(self.path('centers'), np.int64, n)
+        for start in range(0, n, self.block):
+            best[start:start + self.block] = -1
+            self.centers[start:start + self.block] = -1
+
+        for start, stop in self._node_blocks():
+            np.maximum.at(best, self.labels[start:stop], self.degree[start:stop])
+        for start, stop in self._node_blocks():
+            labels = self.labels[start:stop]
+            is_best = self.degree[start:stop] == best[labels]
+            u, first = np.unique(labels[is_best], return_index=True)
+            unset = self.centers[u] < 0
+            self.centers[u[unset]] = np.flatnonzero(is_best)[first[unset]] + start
+
+    def find_centers(self, min_nodes_in_subgraph, strategy='degree', cache=None):
+        """Chooses the centers of the components of at least min_nodes_in_subgraph nodes as
+        network_centers does: from the center cache, or with choose_center on the component's
+        adjacency, repeated participations counted once. The edges of those components are first
+        sorted into bucket files of about a block of nodes each, then a bucket at a time is read
+        back, so only a block of nodes (or one larger component) is held in memory.
+        :param strategy: see find_center
+        :param cache: CenterCache, None for the one in the cache folder, False to disable
+        """
+        if cache is None:
+            cache = CenterCache()
+        bucket = self._center_buckets(min_nodes_in_subgraph)
+
+        counts = {}
+        for start in range(0, self.n_edges, self.block):
+            s, t = self._encode(self.sources[start:start + self.block], self.targets[start:start + self.block])
+            b = bucket[self.labels[s]]
+            keep = b >= 0
+            s, t, b = s[keep], t[keep], b[keep]
+            order = np.argsort(b, kind='stable')
+            pairs = np.column_stack([np.minimum(s, t), np.maximum(s, t)])[order]
+            values, first = np.unique(b[order], return_index=True)
+            for value, rows in zip(values, np.split(pairs, first[1:])):
+                # opened per write, there can be more buckets than open files allowed
+                with open(self.path(f'bucket {value}'), 'ab') as f:
+                    f.write(np.ascontiguousarray(rows).tobytes())
+                counts[value] = counts.get(value, 0) + len(rows)
+
+        for value in sorted(counts):
+            pairs = np.unique(np.fromfile(self.path(f'bucket {value}'), dtype=np.int64).reshape(-1, 2), axis=0)
+            os.remove(self.path(f'bucket {value}'))
+            labels = np.asarray(self.labels[pairs[:, 0]])
+            order = np.argsort(labels, kind='stable')
+            pairs, labels = pairs[order], labels[order]
+            components, first = np.unique(labels, return_index=True)
+            for component, edges in zip(components, np.split(pairs, first[1:])):
+                self.centers[component] = self._choose_center(edges, strategy, cache)
+        if cache:
+            cache.save()
+
+    def _center_buckets(self, min_nodes_in_subgraph):
+        """Bucket of every component, numbered by its first node's place among the nodes of the
+        components with at least min_nodes_in_subgraph nodes, a block of nodes per bucket. -1 for
+        smaller components."""
+        bucket = open_array(self.path('bucket'), np.int64, len(self.sizes))
+        nodes_before = 0
+        for start in range(0, len(self.sizes), self.block):
+            sizes = np.where(self.sizes[start:start + self.block] >= min_nodes_in_subgraph,
+                             self.sizes[start:start + self.block], 0)
+            ends = np.cumsum(sizes) + nodes_before
+            bucket[start:start + self.block] = np.where(sizes > 0, (ends - sizes) // self.block, -1)
+            nodes_before = int(ends[-1])
+        return bucket
+
+    def _choose_center(self, edges, strategy, cache):
+        """Center code of one component from its distinct (low, high) code pairs, see network_centers"""
+        codes = np.unique(edges)
+        low = np.searchsorted(codes, edges[:, 0])
+        high = np.searchsorted(codes, edges[:, 1])
+        # the symmetric adjacency CompactGraph builds, a merged self loop counted twice
+        rows = np.concatenate([low, high])
+        order = np.argsort(rows, kind='stable')
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(codes)))])
+        indices = np.concatenate([high, low])[order]
+
+        node_ids = self.node_ids(codes).tolist()
+        key = network_key(node_ids)
+        cached = cache.get(strategy, key) if cache else None
+        # codes are in tie order already, so no tie key is needed
+        local = node_ids.index(cached) if cached in node_ids else choose_center(indptr, indices, strategy)
+        if cache:
+            cache.set(strategy, key, node_ids[local])
+        return codes[local]
+
+    def _node_blocks(self):
+        for start in range(0, self.n_nodes, self.block):
+            yield start, min(start + self.block, self.n_nodes)
+
+    def node_ids(self, codes):
+        """MEMBER_NBR or INDIVIDUAL_ID of node codes"""
+        codes = np.asarray(codes)
+        ids = np.empty(len(codes), dtype=np.int64)
+        is_member = codes < self.n_members
+        ids[is_member] = self.member_ids[codes[is_member]]
+        ids[~is_member] = self.individual_ids[codes[~is_member] - self.n_members]
+        return ids
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def count(self, min_nodes_in_subgraph):
+        """Number of components with at least min_nodes_in_subgraph nodes"""
+        return sum(int((self.sizes[start:start + self.block] >= min_nodes_in_subgraph).sum())
+                   for start in range(0, len(self.sizes), self.block))
+
+    def attributes(self):
+        """Summary statistics of the component sizes, as Components.attributes"""
+        smallest, largest = np.iinfo(np.int64).max, 0
+        for start in range(0, len(self.sizes), self.block):
+            sizes = self.sizes[start:start + self.block]
+            smallest = min(smallest, int(sizes.min()))
+            largest = max(largest, int(sizes.max()))
+        return {'Total Subgraphs': len(self.sizes),
+                'Min Nodes': smallest,
+                'Max Nodes': largest,
+                'Average Nodes': self.n_nodes / len(self.sizes)
+                }
+
+    def component_chunks(self, min_nodes_in_subgraph=1):
+        """Yields a DataFrame per block of nodes: NODE_ID, NODE_TYPE, COMPONENT, COMPONENT_NODES and
+        GROUP_ID, for the nodes in components of at least min_nodes_in_subgraph nodes. Rows are in
+        node code order, memberships by MEMBER_NBR then individuals by INDIVIDUAL_ID.
+        """
+        for start, stop in self._node_blocks():
+            codes = np.arange(start, stop)
+            labels = np.asarray(self.labels[start:stop])
+            sizes = np.asarray(self.sizes[labels])
+            keep = sizes >= min_nodes_in_subgraph
+            codes, labels, sizes = codes[keep], labels[keep], sizes[keep]
+            yield pd.DataFrame({'NODE_ID': self.node_ids(codes),
+                                'NODE_TYPE': np.where(codes < self.n_members, 'membership', 'individual'),
+                                'COMPONENT': labels,
+                                'COMPONENT_NODES': sizes,
+                                'GROUP_ID': pd.Series(self.node_ids(self.centers[labels])).astype(str).radd('group-')})
+
+    def write_component_table(self, prefix, file_format='csv'):
+        """Saves the component of every node, see component_chunks
+        :return: the path written
+        """
+        return write_table(prefix, self.component_chunks(), file_format)
+
+    def write_group_tables(self, individual_prefix, member_prefix, min_nodes_in_subgraph, file_format='csv'):
+        """Saves the individual and member group tables of the networks with at least
+        min_nodes_in_subgraph nodes, with the columns of output_csvs. Rows are in id order
+        rather than grouped by network.
+        :return: the two paths written
+        """
+        def group_chunks(node_type, id_column):
+            for chunk in self.component_chunks(min_nodes_in_subgraph):
+                chunk = chunk[chunk['NODE_TYPE'] == node_type]
+                yield chunk[['NODE_ID', 'GROUP_ID']].rename(columns={'NODE_ID': id_column})
+
+        return (write_table(individual_prefix, group_chunks('individual', 'INDIVIDUAL_ID'), file_format),
+                write_table(member_prefix, group_chunks('membership', 'MEMBER_NBR'), file_format))
+
+    def close(self):
+        """Deletes the work files"""
+        self.member_ids = self.individual_ids = self.sources = self.targets = None
+        self.degree = self.labels = self.sizes = self.centers = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class IdRuns:
+    """Distinct ids seen in the edge chunks, kept as sorted runs on disk and merged into one
+    sorted id file at the end. Chunk ids are gathered in memory until a block's worth, so a
+    run covers many chunks.
+    """
+
+    def __init__(self, components, name):
+        self.components = components
+        self.name = name
+        self.spill = SpillFile(components.path(f'{name} runs'))
+        self.bounds = []
+        self.pending = []
+        self.pending_size = 0
+
+    def add(self, ids):
+        ids = np.unique(ids)
+        self.pending.append(ids)
+        self.pending_size += len(ids)
+        if self.pending_size >= self.components.block:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            run = np.unique(np.concatenate(self.pending))
+            self.bounds.append((self.spill.size, self.spill.size + len(run)))
+            self.spill.append(run)
+        self.pending = []
+        self.pending_size = 0
+
+    def merge(self):
+        """Merges the runs pairwise until one is left
+        :return: memmap of the sorted distinct ids
+        """
+        self.flush()
+        data = self.spill.array()
+        runs = [data[a:b] for a, b in self.bounds]
+        round_number = 0
+        while len(runs) > 1:
+            out = SpillFile(self.components.path(f'{self.name} merge {round_number}'))
+            bounds = []
+            for k in range(0, len(runs), 2):
+                start = out.size
+                merge_unique(runs[k], runs[k + 1] if k + 1 < len(runs) else runs[k][:0], out,
+                             self.components.block)
+                bounds.append((start, out.size))
+            data = out.array()
+            runs = [data[a:b] for a, b in bounds]
+            round_number += 1
+        return runs[0] if runs else np.empty(0, dtype=np.int64)
+
+
+def check_integer_ids(chunk):
+    """Raises ValueError unless the MEMBER_NBR and INDIVIDUAL_ID of an edge chunk are integers.
+    The work files hold ids as int64, so text ids (or numbers kept as text for their leading
+    zeros) can't be labelled out of core; the other modes take any id."""
+    for column, name in (('source', 'MEMBER_NBR'), ('target', 'INDIVIDUAL_ID')):
+        if not pd.api.types.is_integer_dtype(chunk[column].dtype):
+            example = chunk[column].iloc[0] if len(chunk) else None
+            raise ValueError(f'--out-of-core needs integer {name} values, the participation query '
+                             f'returned {chunk[column].dtype} (e.g. {example!r}). Run without '
+                             f'--out-of-core, or select the ids as integers')
+
+
+def merge_unique(a, b, out, block):
+    """Appends the sorted union of two sorted distinct arrays to a SpillFile, a block at a time.
+    Each step takes the values up to the smaller of the two block ends, so a value held by both
+    arrays always lands in the same step.
+    """
+    i = j = 0
+    while i < len(a) or j < len(b):
+        a_block = a[i:i + block]
+        b_block = b[j:j + block]
+        if not len(a_block) or not len(b_block):
+            rest = a_block if len(a_block) else b_block
+            out.append(rest)
+            i += len(a_block)
+            j += len(b_block)
+            continue
+        limit = min(a_block[-1], b_block[-1])
+        n_a = np.searchsorted(a_block, limit, side='right')
+        n_b = np.searchsorted(b_block, limit, side='right')
+        out.append(np.union1d(a_block[:n_a], b_block[:n_b]))
+        i += n_a
+        j += n_b
+
+
+def contains(sorted_values, values):
+    """Whether each of values is in a sorted array"""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return np.asarray(sorted_values[positions] == values)
+
+
+def union(parent, sources, targets):
+    """Joins the components of every edge in a memory-mapped union-find.
+    Roots are found by following parents, the nodes visited are pointed straight at their root,
+    then the larger root of each edge whose ends differ is hooked onto the smaller one. A root is
+    therefore always the lowest node code of its component, and a parent is never above its node.
+    """
+    while len(sources):
+        root_s = find(parent, sources)
+        root_t = find(parent, targets)
+        differ = root_s != root_t
+        if not differ.any():
+            break
+        # edges whose ends already share a root stay that way, so drop them
+        sources = sources[differ]
+        targets = targets[differ]
+        lo = np.minimum(root_s[differ], root_t[differ])
+        hi = np.maximum(root_s[differ], root_t[differ])
+        np.minimum.at(parent, hi, lo)
+
+
+def find(parent, codes):
+    """Root of every node code, compressing the path of each"""
+    roots = parent[codes]
+    while True:
+        jumped = parent[roots]
+        if np.array_equal(jumped, roots):
+            break
+        roots = jumped
+    parent[codes] = roots
+    return roots
+
+
+def label_out_of_core(db_type, chunksize=None, use_snapshots=True, pushdown=False, directory=None):
+    """Streams the edge query into OutOfCoreComponents
+    :param db_type: sqlite or datamart
+    :param chunksize: rows fetched per round trip and handled per step, None for out_of_core_block
+    in extraction_settings.py
+    :param use_snapshots: read today's snapshot of the edges if there is one
+    :param pushdown: only extract the participations that can belong to networks of 3 or more nodes
+    :param directory: parent folder of the work files, None for out_of_core_location in
+    extraction_settings.py
+    :return: OutOfCoreComponents, close it once done
+    """
+    block = chunksize or extraction_settings.out_of_core_block
+    directory = directory or extraction_settings.out_of_core_location or cache_path('out of core')
+    os.makedirs(directory, exist_ok=True)
+    components = OutOfCoreComponents(tempfile.mkdtemp(prefix='components ', dir=directory), block)
+    try:
+        return components.build(edge_chunks(db_type, block, use_snapshots, pushdown))
+    except BaseException:
+        components.close()
+        raise
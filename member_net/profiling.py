@@ -0,0 +1,200 @@
+import heapq
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import config.profile_settings as profile_settings  # profile_settings.py file
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb(children=False):
+    """Peak resident memory in MB of this process, or of its finished worker processes, over
+    their whole life so far: it only ever grows. None where it can't be read cheaply (Windows
+    without psutil).
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes everywhere else
+        return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+    if children:
+        return None
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round(getattr(info, 'peak_wset', info.rss) / 2 ** 20, 1)
+
+
+def rss_mb():
+    """Resident memory in MB of this process right now, None where it can't be read cheaply"""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return round(psutil.Process().memory_info().rss / 2 ** 20, 1)
+
+
+def memory_used(before, after):
+    """Change in resident memory and growth of the peak between two memory_sample calls.
+    The peak only grows when the code in between pushed memory past every earlier high, so
+    a stage that reuses memory freed by an earlier one shows no growth.
+    :return rss_change_mb, peak_growth_mb: either None where it couldn't be read
+    """
+    rss = None if None in (before[0], after[0]) else round(after[0] - before[0], 1)
+    peak = None if None in (before[1], after[1]) else round(max(0.0, after[1] - before[1]), 1)
+    return rss, peak
+
+
+def memory_sample():
+    """:return: the current and peak resident memory of this process in MB, see memory_used"""
+    return rss_mb(), peak_rss_mb()
+
+
+class RunProfile:
+    """Wall time, CPU time and memory of every pipeline stage, plus the time and memory of
+    individual networks. A stage records the resident memory at its start and end, and how much
+    it raised the process's peak; the process peak itself only ever grows, so it is kept
+    as process_peak_rss_mb. Only clock and memory counter reads are added per stage, so it can stay
+    on for production runs. tracemalloc is much more expensive and off by default.
+    Unless every network is kept, only the slowest networks and the totals of each stage are held.
+    :param trace_memory: also record the peak Python allocation of each stage, None for the setting
+    :param print_stages: print each stage's time as it finishes, None for the setting
+    :param keep_networks: keep the record of every network, None for report_every_network
+    :param top_n: slowest networks held when they aren't all kept, None for slowest_networks_shown
+    (all settings in profile_settings.py)
+    """
+
+    def __init__(self, trace_memory=None, print_stages=None, keep_networks=None, top_n=None):
+        self.trace_memory = profile_settings.trace_memory if trace_memory is None else trace_memory
+        self.print_stages = profile_settings.print_stages if print_stages is None else print_stages
+        self.keep_networks = profile_settings.report_every_network if keep_networks is None else keep_networks
+        self.top_n = profile_settings.slowest_networks_shown if top_n is None else top_n
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.stages = []
+        self.networks = []
+        self._slowest = []
+        self._totals = {}
+        self._count = itertools.count()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the code inside the with block as one stage"""
+        if self.trace_memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+        memory = memory_sample()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            end = memory_sample()
+            rss_change, peak_growth = memory_used(memory, end)
+            record = {'stage': name,
+                      'wall_s': round(wall, 4),
+                      'cpu_s': round(cpu, 4),
+                      'rss_start_mb': memory[0],
+                      'rss_end_mb': end[0],
+                      'rss_change_mb': rss_change,
+                      'peak_rss_growth_mb': peak_growth,
+                      'process_peak_rss_mb': end[1]}
+            if self.trace_memory:
+                record['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            self.stages.append(record)
+            if self.print_stages:
+                print(f'{name}: {record["wall_s"]:.2f}s')
+
+    def network(self, stage, title, nodes, wall, cpu=None, memory=None):
+        """Records the time one network spent in a stage
+        :param memory: (rss_change_mb, peak_growth_mb) of the network, from memory_used in the
+        process that handled it, None if not measured
+        """
+        rss_change, peak_growth = memory or (None, None)
+        record = {'stage': stage, 'title': title, 'nodes': nodes,
+                  'wall_s': round(wall, 4), 'cpu_s': None if cpu is None else round(cpu, 4),
+                  'rss_change_mb': rss_change, 'peak_rss_growth_mb': peak_growth}
+        t = self._totals.setdefault(stage, {'networks': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'max_wall_s': 0.0})
+        t['networks'] += 1
+        t['wall_s'] += record['wall_s']
+        t['cpu_s'] += record['cpu_s'] or 0.0
+        t['max_wall_s'] = max(t['max_wall_s'], record['wall_s'])
+        if self.keep_networks:
+            self.networks.append(record)
+        # the count breaks ties, so records themselves are never compared
+        entry = (record['wall_s'], next(self._count), record)
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, entry)
+        elif self._slowest and entry[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self, n=10, stage=None):
+        """The n slowest network records, optionally only those of one stage. Unless every
+        network is kept, they are picked from the top_n slowest of all stages."""
+        records = self.networks if self.keep_networks else [r for _, _, r in self._slowest]
+        records = [r for r in records if stage is None or r['stage'] == stage]
+        return sorted(records, key=lambda r: r['wall_s'], reverse=True)[:n]
+
+    def network_totals(self):
+        """Count, total, mean and max wall time of the network records of each stage"""
+        totals = {stage: dict(t) for stage, t in self._totals.items()}
+        for t in totals.values():
+            t['mean_wall_s'] = round(t['wall_s'] / t['networks'], 4)
+            t['wall_s'] = round(t['wall_s'], 4)
+            t['cpu_s'] = round(t['cpu_s'], 4)
+        return totals
+
+    def report(self, top_n=10, include_networks=False):
+        """The run as a JSON serializable dict
+        :param top_n: number of slowest networks listed
+        :param include_networks: also list the timing of every network
+        """
+        report = {'started': self.started,
+                  'total_wall_s': round(time.perf_counter() - self._start, 4),
+                  'process_peak_rss_mb': peak_rss_mb(),
+                  'peak_rss_workers_mb': peak_rss_mb(children=True),
+                  'stages': self.stages,
+                  'network_totals': self.network_totals(),
+                  'slowest_networks': self.slowest(top_n)}
+        if include_networks:
+            report['networks'] = self.networks
+        return report
+
+    def save(self, path, top_n=10, include_networks=False):
+        """Writes the run report as json"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(top_n, include_networks), f, indent=2, default=str)
+
+    def print_summary(self, top_n=10):
+        """Prints the stage timings and the slowest networks"""
+        print('#'*14)
+        print('Stage timings')
+        for r in self.stages:
+            growth = r['peak_rss_growth_mb']
+            memory = '' if growth is None else f'{growth:>10.1f}MB peak growth'
+            print(f'{r["stage"]:<28}{r["wall_s"]:>10.2f}s wall{r["cpu_s"]:>10.2f}s cpu{memory}')
+        slowest = self.slowest(top_n)
+        if slowest:
+            print(f'Slowest {len(slowest)} networks')
+            for r in slowest:
+                print(f'{r["stage"]:<10}{r["wall_s"]:>8.2f}s  {r["nodes"]:>6} nodes  {r["title"]}')
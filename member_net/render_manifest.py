@@ -0,0 +1,92 @@
+import hashlib
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from member_net.cache import JsonCache, cache_path
+
+# part of every content hash. Bump it when the drawing or summary table changes, so every
+# pdf is rendered again once
+RENDER_VERSION = 1
+
+
+def pdf_names(titles, centers):
+    """File name (without .pdf) of every network's pdf. Usually the title, but networks sharing
+    a title get their group id added, so one pdf can't overwrite another.
+    :param titles: title of every network
+    :param centers: center node id of every network
+    """
+    counts = Counter(titles)
+    return [f'{title} (group-{center})' if counts[title] > 1 else str(title) for title, center in zip(titles, centers)]
+
+
+def content_hashes(members, individuals, edges, rollups, titles, style=''):
+    """Hash of everything drawn in each network's pdf: its sorted node ids, its participations
+    and their types, its rollup values and its title
+    :param members: membership table from network_nodes
+    :param individuals: individual table from network_nodes
+    :param edges: network_edges of the same networks
+    :param rollups: network_rollups of the same networks
+    :param titles: title of every network
+    :param style: drawing settings the pdfs depend on, such as the renderer
+    :return: list of hex digests, in network order
+    """
+    nodes = pd.concat([_network_lines(members, ['NODE_ID'], 'm'), _network_lines(individuals, ['NODE_ID'], 'i'),
+                       _network_lines(edges, ['MEMBER_NBR', 'INDIVIDUAL_ID', 'PARTICIPATION_TYPE'], 'e')])
+    content = nodes.groupby(level=0).agg('\n'.join).reindex(np.arange(len(titles)), fill_value='')
+    hashes = []
+    for title, rollup, lines in zip(titles, rollups.itertuples(index=False), content):
+        text = f'{RENDER_VERSION} {style}\n{title}\n{tuple(rollup)!r}\n{lines}'
+        hashes.append(hashlib.sha1(text.encode('utf-8')).hexdigest())
+    return hashes
+
+
+def _network_lines(frame, columns, prefix):
+    """One sorted line per row of frame, the lines of every network joined into one string
+    :return: Series of text indexed by NETWORK
+    """
+    lines = frame[columns[0]].astype(str).radd(prefix + ',')
+    for column in columns[1:]:
+        lines = lines + ',' + frame[column].astype(str)
+    lines = pd.Series(lines.to_numpy(), index=frame['NETWORK'].to_numpy())
+    return lines.sort_values().groupby(level=0).agg('\n'.join)
+
+
+class RenderManifest:
+    """The content hash each pdf was last rendered from, kept between runs. A network whose hash
+    matches its pdf is not rendered again, and pdfs no network uses any more can be deleted.
+    Only pdfs listed here are ever deleted, so other files in the pdf folder are left alone.
+    :param folder: the pdf folder
+    :param path: json file in the cache folder
+    """
+
+    def __init__(self, folder, path=None):
+        self.folder = folder
+        self.store = JsonCache(path or cache_path('render manifest.json'))
+
+    def path(self, name):
+        return f'{self.folder}//{name}.pdf'
+
+    def unchanged(self, name, content_hash):
+        """True if the pdf exists and was rendered from the same content"""
+        return self.store.get(name) == content_hash and os.path.isfile(self.path(name))
+
+    def record(self, name, content_hash):
+        self.store[name] = content_hash
+
+    def collect_garbage(self, names):
+        """Deletes the pdfs this manifest rendered that are not in names, the pdf names of this run
+        :return: names of the deleted pdfs
+        """
+        names = set(names)
+        stale = [name for name in self.store.data if name not in names]
+        for name in stale:
+            if os.path.isfile(self.path(name)):
+                os.remove(self.path(name))
+            del self.store.data[name]
+        return stale
+
+    def save(self):
+        self.store.save()
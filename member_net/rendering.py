@@ -0,0 +1,269 @@
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.figure import Figure
+from matplotlib.text import TextPath
+from matplotlib.transforms import Affine2D
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+
+from member_net.layouts import compute_layout
+from member_net.profiling import memory_sample, memory_used
+
+RENDERERS = ('lean', 'classic')
+
+# networks with more nodes than this are drawn without node and participation labels,
+# which would only overlap into a black smudge
+LABEL_LIMIT = 150
+
+# page size of the lean renderer, in inches
+PAGE_SIZE = (8.5, 11)
+
+
+class RenderJob:
+    """Everything a worker needs to draw one network, kept picklable
+    :param graph: networkx graph of the network
+    :param colors: node colors in graph node order
+    :param center: center node id
+    :param title: label of the center node
+    :param summary: DataFrame of the summary table
+    :param path: pdf file to write
+    :param key: network key the layout is cached under
+    :param pos: cached node positions, complete or partial (see compute_layout)
+    :param layout: layout algorithm, see compute_layout
+    :param large_network_nodes: network size from which the 'auto' layout switches to spectral
+    :param renderer: 'lean' for one page drawn with collections, or 'classic' for the original
+    networkx drawing with the summary table on a second page
+    """
+
+    def __init__(self, graph, colors, center, title, summary, path, key=None, pos=None, layout='auto',
+                 large_network_nodes=1000, renderer='lean'):
+        self.graph = graph
+        self.colors = colors
+        self.center = center
+        self.title = title
+        self.summary = summary
+        self.path = path
+        self.key = key
+        self.pos = pos
+        self.layout = layout
+        self.large_network_nodes = large_network_nodes
+        self.renderer = renderer
+
+
+def summary_table(title, nodes, rollup):
+    """The summary table printed under a network
+    :param title: network title (center label)
+    :param nodes: number of nodes in the network
+    :param rollup: a row of network_rollups, or any mapping with its columns
+    :return: DataFrame of the formatted values
+    """
+    account_dict = {'Center': title,
+                    'Nodes': nodes,
+                    'Individuals': int(rollup['Individuals']),
+                    'Memberships': int(rollup['Memberships']),
+                    'Total Savings': f'${rollup["OPN_SV_BAL"]:,.2f}',
+                    'Total Loans': f'${rollup["OPN_LN_BAL"]:,.2f}',
+                    'PPM': f'{rollup["PPM"]:.2n}',
+                    'Dividends Paid': f'${rollup["DIV_YTD_AMT"]:,.2f}',
+                    'Interest received': f'${rollup["INT_YTD_AMT"]:,.2f}'}
+
+    return pd.DataFrame.from_dict(account_dict, orient='index').rename(columns={0: ''})
+
+
+def draw_network(fig, graph_object, color_map, title, pos=None):
+    """Draws a network onto an explicit Figure instead of the pyplot state
+    :param pos: node positions, a spring layout is computed if not given
+    """
+    ax = fig.add_subplot(111)
+
+    # layout for display
+    if pos is None:
+        pos = compute_layout(graph_object, algorithm='spring')
+
+    nx.draw_networkx(graph_object, pos=pos, ax=ax, node_color=color_map, node_size=1000, with_labels=False)
+
+    # add node labels
+    node_labels = nx.get_node_attributes(graph_object, 'label')
+    nx.draw_networkx_labels(graph_object, pos=pos, labels=node_labels, ax=ax)
+
+    # add edge labels
+    edge_labels = nx.get_edge_attributes(graph_object, 'PARTICIPATION_TYPE')
+    nx.draw_networkx_edge_labels(graph_object, pos, edge_labels, ax=ax)
+
+    ax.set_axis_off()
+    ax.set_title(f'The {title} network')
+    return fig
+
+
+def draw_network_lean(ax, graph_object, color_map, title, pos):
+    """Draws a network with one LineCollection for the participations and one scatter for the
+    nodes, instead of an artist per node and edge. The node labels and the participation labels
+    are one collection each (see label_collection), without the boxes networkx puts behind edge
+    labels, and are left off networks over LABEL_LIMIT nodes.
+    :param ax: Axes to draw on
+    :param pos: node positions
+    """
+    nodes = list(graph_object)
+    index = {n: i for i, n in enumerate(nodes)}
+    xy = np.array([pos[n] for n in nodes], dtype=float).reshape(-1, 2)
+    edges = list(graph_object.edges(data='PARTICIPATION_TYPE'))
+    ends = np.array([(index[u], index[v]) for u, v, _ in edges], dtype=np.int64).reshape(-1, 2)
+    segments = xy[ends]
+
+    ax.add_collection(LineCollection(segments, colors='k', linewidths=1, zorder=1))
+    # the classic 1000 point nodes, shrinking as networks grow so they don't cover each other
+    size = 1000 * min(1.0, 15 / max(len(nodes), 1))
+    ax.scatter(xy[:, 0], xy[:, 1], s=max(size, 10), c=color_map, zorder=2, linewidths=0)
+
+    if len(nodes) <= LABEL_LIMIT:
+        fontsize = 8 if len(nodes) <= 30 else 5
+        labels = [label for _, label in graph_object.nodes(data='label')]
+        label_collection(ax, xy, labels, fontsize, 'k')
+        label_collection(ax, segments.mean(axis=1), [p for _, _, p in edges], fontsize, 'dimgray')
+
+    ax.update_datalim(xy)
+    ax.autoscale_view()
+    ax.margins(0.1)
+    ax.set_axis_off()
+    # a fixed title position skips matplotlib's tick measuring pass, the slowest part of drawing a page
+    ax.set_title(f'The {title} network', y=1.0)
+    return ax
+
+
+def label_collection(ax, xy, labels, fontsize, color):
+    """Draws labels centered on points as one PathCollection of their glyph outlines, instead of
+    a Text artist per label that is laid out and drawn on its own. The outline of each distinct
+    label is made once (participation types repeat on every edge), and it is sized in points,
+    so labels keep their size whatever the axes limits. Missing labels are skipped.
+    :param xy: point of every label, in data coordinates
+    :param labels: label of every point, None for no label
+    """
+    keep = [i for i, label in enumerate(labels) if label is not None]
+    if not keep:
+        return None
+    outlines = {}
+    for i in keep:
+        text = str(labels[i])
+        if text not in outlines:
+            path = TextPath((0, 0), text, size=fontsize)
+            # centered on the box of the outline's points, get_extents solves every curve and is far slower
+            middle = (path.vertices.min(axis=0) + path.vertices.max(axis=0)) / 2 if len(path.vertices) else (0, 0)
+            outlines[text] = path.transformed(Affine2D().translate(-middle[0], -middle[1]))
+    collection = PathCollection([outlines[str(labels[i])] for i in keep], offsets=np.asarray(xy)[keep],
+                                transOffset=ax.transData, facecolors=color, edgecolors='none', zorder=3)
+    # points to inches to display, so the size follows the figure's dpi when it is saved
+    collection.set_transform(Affine2D().scale(1 / 72) + ax.figure.dpi_scale_trans)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+
+def draw_page(fig, job, pos):
+    """Draws one network and its summary on a single page. The summary is two blocks of text,
+    the names and the values, rather than a table with an artist per cell.
+    """
+    draw_network_lean(fig.add_axes((0.05, 0.25, 0.9, 0.7)), job.graph, job.colors, job.title, pos)
+    summary = job.summary.iloc[:, 0]
+    fig.text(0.5, 0.2, 'Summary', ha='center', va='bottom', fontsize=12)
+    fig.text(0.48, 0.19, '\n'.join(map(str, summary.index)), ha='right', va='top', fontsize=10, linespacing=1.6)
+    fig.text(0.52, 0.19, '\n'.join(map(str, summary.values)), ha='left', va='top', fontsize=10, linespacing=1.6)
+    return fig
+
+
+def draw_table(fig, dataframe):
+    """Draws the summary table onto an explicit Figure"""
+    return _draw_table(fig.add_subplot(111), dataframe)
+
+
+def _draw_table(ax, dataframe):
+    ax.table(cellText=dataframe.values,
+             rowLabels=dataframe.index,
+             colLabels=dataframe.columns,
+             loc="center"
+             )
+    ax.set_title("Summary")
+    ax.axis("off")
+    return ax.figure
+
+
+def render_network(job, pages=None):
+    """Renders one RenderJob to its pdf, or svg if the path ends in .svg. Safe to run in a worker process.
+    :param pages: open PdfPages to add the page to instead of writing job.path (lean renderer only)
+    :return: dict of the title, pdf path, node count, wall/cpu seconds spent, memory used (see
+    memory_used), and the network key and node positions for the layout cache
+    """
+    memory = memory_sample()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    pos = compute_layout(job.graph, job.pos, job.layout, job.large_network_nodes)
+
+    if job.renderer == 'lean' or pages is not None:
+        fig = Figure(figsize=PAGE_SIZE)
+        FigureCanvasAgg(fig)
+        draw_page(fig, job, pos)
+        if pages is not None:
+            pages.savefig(fig)
+        else:
+            fig.savefig(job.path)
+        return {'title': job.title, 'path': job.path, 'nodes': len(job.graph),
+                'wall': time.perf_counter() - wall, 'cpu': time.process_time() - cpu,
+                'memory': memory_used(memory, memory_sample()), 'key': job.key, 'pos': pos}
+
+    fig1 = Figure()
+    FigureCanvasAgg(fig1)
+    draw_network(fig1, job.graph, job.colors, job.title, pos)
+
+    fig2 = Figure(figsize=(4, 2))
+    FigureCanvasAgg(fig2)
+    draw_table(fig2, job.summary)
+
+    with PdfPages(job.path) as pp:
+        pp.savefig(fig1, bbox_inches='tight')
+        pp.savefig(fig2, bbox_inches='tight')
+    return {'title': job.title, 'path': job.path, 'nodes': len(job.graph),
+            'wall': time.perf_counter() - wall, 'cpu': time.process_time() - cpu,
+            'memory': memory_used(memory, memory_sample()), 'key': job.key, 'pos': pos}
+
+
+def render_book(jobs, path):
+    """Renders every RenderJob as one page of a single pdf, in job order, with the lean renderer
+    :param path: the multi-page pdf to write
+    :return: generator of render_network results, in job order
+    """
+    with PdfPages(path) as pages:
+        for job in jobs:
+            yield render_network(job, pages)
+
+
+def _init_worker():
+    """Keeps worker processes off any interactive backend"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_pdfs(jobs, workers=1):
+    """Renders RenderJobs, in process or across a pool of worker processes.
+    Results come back in the order of jobs whatever the worker count, and only a
+    few jobs per worker are held in memory at once.
+    :param jobs: iterable of RenderJob
+    :param workers: number of worker processes, 1 renders in the calling process
+    :return: generator of render_network results, in job order
+    """
+    if workers <= 1:
+        for job in jobs:
+            yield render_network(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(render_network, job))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,191 @@
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from member_net.compact_graph import CompactGraph
+from member_net.components import SubgraphList, edge_table
+from member_net.table_writers import CHUNKSIZE
+
+# membership attributes summed per network
+ROLLUP_COLUMNS = ['OPN_LN_BAL', 'OPN_SV_BAL', 'OPN_LN_ALL_CNT', 'OPN_SV_ALL_CNT', 'DIV_YTD_AMT', 'INT_YTD_AMT']
+
+
+def network_nodes(multi):
+    """Flattens every network in multi into one membership table and one individual table.
+    Both tables carry NETWORK (position of the network in multi) and NODE_ID columns
+    alongside the node attributes.
+    :param multi: the list of subgraphs from get_subgraphs
+    :return members: DataFrame of membership nodes
+    :return individuals: DataFrame of individual nodes
+    """
+    if isinstance(multi, SubgraphList) and isinstance(multi.graph_object, CompactGraph):
+        return _compact_network_nodes(multi)
+
+    tables = {'membership': ([], [], []), 'individual': ([], [], [])}
+    for k, nodes in enumerate(_network_node_data(multi)):
+        for node, data in nodes:
+            table = tables.get(data.get('type'))
+            if table is not None:
+                table[0].append(node)
+                table[1].append(k)
+                table[2].append(data)
+
+    members, individuals = (_node_frame(*tables[t]) for t in ('membership', 'individual'))
+    return members, individuals
+
+
+def _node_frame(node_ids, networks, records):
+    """DataFrame of node attribute dicts plus their NODE_ID and NETWORK"""
+    frame = pd.DataFrame.from_records(records) if records else pd.DataFrame(columns=ROLLUP_COLUMNS)
+    frame['NODE_ID'] = node_ids
+    frame['NETWORK'] = np.asarray(networks, dtype=np.int64)
+    return frame
+
+
+def _network_node_data(multi):
+    """Yields (node, attribute dict) pairs per network without copying subgraphs where possible"""
+    if isinstance(multi, SubgraphList):
+        graph = multi.graph_object
+        for component in multi.selected:
+            yield ((n, graph.nodes[n]) for n in multi.components.node_keys(component))
+    else:
+        for graph in multi:
+            yield graph.nodes(data=True)
+
+
+def _compact_network_nodes(multi):
+    """network_nodes for the compact backend, sliced straight from the columnar attributes"""
+    graph = multi.graph_object
+    position = np.full(len(multi.components), -1)
+    position[multi.selected] = np.arange(len(multi.selected))
+    network = position[multi.components.labels]
+
+    member_codes = np.flatnonzero(network[:graph.n_members] >= 0)
+    individual_codes = np.flatnonzero(network[graph.n_members:] >= 0)
+
+    members = graph.member_attrs.iloc[member_codes].reset_index(drop=True)
+    members['NODE_ID'] = graph.member_ids[member_codes]
+    members['NETWORK'] = network[member_codes]
+
+    individuals = graph.individual_attrs.iloc[individual_codes].reset_index(drop=True)
+    individuals['NODE_ID'] = graph.individual_ids[individual_codes]
+    individuals['NETWORK'] = network[individual_codes + graph.n_members]
+    return members, individuals
+
+
+def network_edges(multi, members, individuals):
+    """The participations of every network in multi as one table
+    :param multi: the list of subgraphs from get_subgraphs
+    :param members: membership table from network_nodes, to find the network of each edge
+    :param individuals: individual table from network_nodes, for edges whose membership was merged
+    into an individual with the same id (networkx backend)
+    :return: DataFrame of MEMBER_NBR, INDIVIDUAL_ID, PARTICIPATION_TYPE and NETWORK
+    """
+    if not isinstance(multi, SubgraphList):
+        tables = [edge_table(graph).assign(NETWORK=k) for k, graph in enumerate(multi)]
+        return pd.concat(tables, ignore_index=True) if tables else edge_table(nx.Graph()).assign(NETWORK=0)[:0]
+
+    edges = edge_table(multi.graph_object)
+    network = edges['MEMBER_NBR'].map(_network_of(members))
+    network = network.fillna(edges['INDIVIDUAL_ID'].map(_network_of(individuals)))
+    edges['NETWORK'] = network
+    return edges[network.notna()].astype({'NETWORK': np.int64}).reset_index(drop=True)
+
+
+def _network_of(nodes):
+    """Series of NETWORK indexed by NODE_ID"""
+    return pd.Series(nodes['NETWORK'].to_numpy(), index=nodes['NODE_ID'].to_numpy())
+
+
+def network_rollups(members, individuals, n_networks, totals=None):
+    """Totals, counts and products per member of every network in one groupby
+    :param members: membership table from network_nodes
+    :param individuals: individual table from network_nodes
+    :param n_networks: number of networks
+    :param totals: ROLLUP_COLUMNS already summed per network (by network_metrics), instead of
+    summing the membership table
+    :return: DataFrame indexed by network position
+    """
+    index = pd.RangeIndex(n_networks)
+    if totals is None:
+        totals = members.groupby('NETWORK')[ROLLUP_COLUMNS].sum()
+    rollups = totals[ROLLUP_COLUMNS].fillna(0).reindex(index, fill_value=0)
+    rollups['Memberships'] = members.groupby('NETWORK').size().reindex(index, fill_value=0)
+    rollups['Individuals'] = individuals.groupby('NETWORK').size().reindex(index, fill_value=0)
+    rollups['Nodes'] = rollups['Memberships'] + rollups['Individuals']
+    # a network can hold no membership nodes when member and individual ids collide
+    products = (rollups['OPN_LN_ALL_CNT'] + rollups['OPN_SV_ALL_CNT']).astype(float)
+    rollups['PPM'] = products / rollups['Memberships'].where(rollups['Memberships'] > 0)
+    return rollups
+
+
+def group_tables(members, individuals, centers):
+    """Tables of member/individual and the group (network) they belong to
+    :param members: membership table from network_nodes
+    :param individuals: individual table from network_nodes
+    :param centers: center node id of every network
+    :return individual_group: GroupTable of INDIVIDUAL_ID and GROUP_ID
+    :return member_group: GroupTable of MEMBER_NBR and GROUP_ID
+    """
+    group_names = np.array([f'group-{center}' for center in centers], dtype=object)
+    return (GroupTable(individuals, group_names, 'INDIVIDUAL_ID'),
+            GroupTable(members, group_names, 'MEMBER_NBR'))
+
+
+class GroupTable:
+    """A group table handed to the writers a chunk of rows at a time. Only the node ids and
+    networks are held, each chunk's DataFrame and GROUP_ID strings are made as it is iterated,
+    so the whole table never exists at once. It can be iterated again, e.g. for another format.
+    :param nodes: membership or individual table from network_nodes
+    :param group_names: group name of every network
+    :param id_column: name of the node id column
+    """
+
+    def __init__(self, nodes, group_names, id_column, chunksize=CHUNKSIZE):
+        order = np.argsort(nodes['NETWORK'].to_numpy(), kind='stable')
+        self.node_ids = nodes['NODE_ID'].to_numpy()[order]
+        self.networks = nodes['NETWORK'].to_numpy()[order]
+        self.group_names = group_names
+        self.columns = [id_column, 'GROUP_ID']
+        self.chunksize = chunksize
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __iter__(self):
+        # an empty table is still yielded, so its columns are written
+        for start in range(0, max(len(self), 1), self.chunksize):
+            stop = start + self.chunksize
+            yield pd.DataFrame({self.columns[0]: self.node_ids[start:stop],
+                                'GROUP_ID': self.group_names[self.networks[start:stop]]}, columns=self.columns)
+
+
+class SummaryRows:
+    """The rows of the summary spreadsheet, each formatted as it is iterated (by write_xlsx), so
+    the rows of every network are never held at once. It can be iterated again.
+    :param links: drawing of every network relative to the output folder, None links each row to
+    the pdf named after its title
+    :param metrics: DataFrame of metric columns indexed by network position (see network_metrics.py),
+    added to the end of each row"""
+
+    def __init__(self, rollups, titles, links=None, metrics=None):
+        self.rollups = rollups
+        self.titles = titles
+        self.links = [f'pdfs/{title}.pdf' for title in titles] if links is None else links
+        self.metrics = metrics
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __iter__(self):
+        metrics = repeat(()) if self.metrics is None else self.metrics.itertuples(index=False)
+        for title, link, r, values in zip(self.titles, self.links, self.rollups.itertuples(), metrics):
+            yield [title, f'=HYPERLINK("{link}")', int(r.Nodes), int(r.Individuals), int(r.Memberships),
+                   r.OPN_SV_BAL, r.OPN_LN_BAL, r.PPM, r.DIV_YTD_AMT, r.INT_YTD_AMT, *values]
+
+
+def summary_rows(rollups, titles, links=None, metrics=None):
+    """The rows of the summary spreadsheet, see SummaryRows"""
+    return SummaryRows(rollups, titles, links, metrics)
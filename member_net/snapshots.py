@@ -0,0 +1,225 @@
+import hashlib
+import os
+import shutil
+import time
+
+import config.cache_settings as cache_settings  # cache_settings.py file
+import config.server_details as server_details  # server_details.py file
+import config.sql_queries as sql_queries  # sql_queries.py file
+from member_net.cache import cache_path
+from member_net.connections import ConnectionPool, configure_cursor
+
+# one Arrow IPC file per extracted table
+TABLES = ('individual', 'membership', 'edge')
+
+# rows a SnapshotWriter holds back at most while a column has only been null, to learn its type
+SCHEMA_ROWS = 100000
+
+
+def snapshot_key(queries, data_date):
+    """Hash of the query texts and the data date that identifies a snapshot"""
+    text = '\n'.join(queries) + '\n' + str(data_date)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def data_date(db_type):
+    """Identifies the data in the _today tables: the load date from the configured data date query,
+    or else a fingerprint of the data itself, so runs on different days share a snapshot for as
+    long as the data doesn't change. For sqlite that is the file's modification time and size,
+    for the datamart the checksums of ms_sql_data_fingerprint_query in sql_queries.py, which scan
+    the three tables on every run.
+    """
+    query = cache_settings.sqlite_data_date_query if db_type == 'sqlite' else cache_settings.ms_sql_data_date_query
+    if db_type == 'sqlite' and not query:
+        if not os.path.isfile(server_details.sqlite_location):
+            return None
+        stat = os.stat(server_details.sqlite_location)
+        return f'{stat.st_mtime} {stat.st_size}'
+
+    with ConnectionPool(db_type, size=1) as pool, pool.connection() as conn:
+        cursor = configure_cursor(conn.cursor())
+        try:
+            cursor.execute(query or sql_queries.ms_sql_data_fingerprint_query)
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+    return row[0] if query else ' '.join(str(value) for value in row)
+
+
+def open_snapshot_cache():
+    """Returns the configured SnapshotCache, or None if disabled or pyarrow isn't installed"""
+    if not cache_settings.use_snapshots:
+        return None
+    try:
+        return SnapshotCache(cache_settings.snapshot_location or cache_path('snapshots'),
+                             cache_settings.snapshot_retention_days,
+                             cache_settings.snapshot_max_count,
+                             cache_settings.partial_snapshot_timeout_hours)
+    except ImportError:
+        print('pyarrow is not installed, skipping the snapshot cache')
+        return None
+
+
+class SnapshotCache:
+    """Directory of Arrow IPC snapshots, one sub folder per snapshot key.
+    :param directory: folder holding the snapshots
+    :param retention_days: snapshots older than this are evicted
+    :param max_snapshots: at most this many snapshots are kept
+    :param partial_timeout_hours: partial snapshots untouched for this long were left by a run
+    that stopped, and are evicted. Younger ones may still be being written
+    """
+
+    def __init__(self, directory, retention_days=2, max_snapshots=4, partial_timeout_hours=6):
+        import pyarrow  # noqa: F401, fail early if the optional dependency is missing
+        self.directory = directory
+        self.retention_days = retention_days
+        self.max_snapshots = max_snapshots
+        self.partial_timeout_hours = partial_timeout_hours
+
+    def path(self, key, table):
+        return os.path.join(self.directory, key, f'{table}.arrow')
+
+    def exists(self, key):
+        return all(os.path.isfile(self.path(key, t)) for t in TABLES)
+
+    def read_table(self, key, table):
+        """Memory-maps a snapshot table and returns it as a DataFrame"""
+        import pyarrow as pa
+        with pa.memory_map(self.path(key, table)) as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+
+    def read_batches(self, key, table, chunksize=None):
+        """Yields a snapshot table as DataFrames of about chunksize rows, reading the memory-mapped
+        file one record batch at a time
+        :param chunksize: rows per DataFrame, None for the batches as they were written
+        """
+        import pyarrow as pa
+        with pa.memory_map(self.path(key, table)) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                step = chunksize or batch.num_rows
+                for start in range(0, batch.num_rows, step):
+                    yield batch.slice(start, step).to_pandas()
+
+    def load(self, key):
+        """:return ind, mem, edges: the three snapshot tables, or None if there is no complete snapshot"""
+        if not self.exists(key):
+            return None
+        os.utime(os.path.join(self.directory, key))
+        return tuple(self.read_table(key, t) for t in TABLES)
+
+    def writer(self, key):
+        """Returns a SnapshotWriter that fills in the snapshot for key"""
+        return SnapshotWriter(self, key)
+
+    def save(self, key, ind, mem, edges):
+        """Saves the three extracted tables as a snapshot"""
+        writer = self.writer(key)
+        for table, frame in zip(TABLES, (ind, mem, edges)):
+            writer.write(table, frame)
+        writer.close()
+
+    def evict(self):
+        """Deletes expired snapshots, then the oldest ones beyond max_snapshots, and partial
+        snapshots nothing has written to for partial_timeout_hours"""
+        if not os.path.isdir(self.directory):
+            return
+        entries = [os.path.join(self.directory, d) for d in os.listdir(self.directory)]
+        entries = [e for e in entries if os.path.isdir(e)]
+
+        # a partial snapshot another run is still filling keeps being written to
+        partial_cutoff = time.time() - self.partial_timeout_hours * 3600
+        for entry in entries:
+            if entry.endswith('.partial') and _last_write(entry) < partial_cutoff:
+                shutil.rmtree(entry, ignore_errors=True)
+
+        snapshots = sorted((e for e in entries if not e.endswith('.partial')), key=os.path.getmtime, reverse=True)
+        cutoff = time.time() - self.retention_days * 86400
+        for i, entry in enumerate(snapshots):
+            if i >= self.max_snapshots or os.path.getmtime(entry) < cutoff:
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+def _last_write(folder):
+    """Latest modification time of a folder and the files in it"""
+    times = [os.path.getmtime(folder)]
+    for name in os.listdir(folder):
+        try:
+            times.append(os.path.getmtime(os.path.join(folder, name)))
+        except OSError:
+            pass
+    return max(times)
+
+
+class SnapshotWriter:
+    """Writes snapshot tables chunk by chunk into a partial folder, which is only
+    renamed into place by close() once every table is complete.
+
+    A table's schema comes from the column types of the query: integers are widened to
+    int64, since chunks are downcast independently, and the first chunks are held back
+    until every column has shown a type, so a column that starts out null isn't typed
+    from its nulls. Columns still null after SCHEMA_ROWS rows are stored as strings.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.partial = os.path.join(cache.directory, f'{key}.partial')
+        os.makedirs(self.partial, exist_ok=True)
+        self._writers = {}
+        self._held = {}
+
+    def write(self, table, frame):
+        """Appends a DataFrame chunk to a snapshot table"""
+        import pyarrow as pa
+        # every chunk has its own categories, so category columns are stored as their values
+        categories = frame.select_dtypes('category').columns
+        if len(categories):
+            frame = frame.astype({c: object for c in categories})
+        batch = pa.Table.from_pandas(frame, preserve_index=False)
+        if table in self._writers:
+            sink, writer, schema = self._writers[table]
+            writer.write_table(batch.cast(schema))
+            return
+
+        held = self._held.setdefault(table, [])
+        held.append(batch)
+        if all(not pa.types.is_null(f.type) for f in _query_schema(held)) or \
+                sum(b.num_rows for b in held) >= SCHEMA_ROWS:
+            self._open(table)
+
+    def _open(self, table):
+        """Starts a table's file with the schema of its held chunks, and writes them"""
+        import pyarrow as pa
+        held = self._held.pop(table)
+        schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                            for f in _query_schema(held)])
+        sink = pa.OSFile(os.path.join(self.partial, f'{table}.arrow'), 'wb')
+        self._writers[table] = (sink, pa.ipc.new_file(sink, schema), schema)
+        for batch in held:
+            self._writers[table][1].write_table(batch.cast(schema))
+
+    def close(self):
+        """Finishes every table and moves the snapshot into place"""
+        for table in list(self._held):
+            self._open(table)
+        for sink, writer, schema in self._writers.values():
+            writer.close()
+            sink.close()
+        final = os.path.join(self.cache.directory, self.key)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(self.partial, final)
+        self.cache.evict()
+
+
+def _query_schema(batches):
+    """Schema of some chunks of a table: each column takes the first type other than null it
+    has, integers widened to int64"""
+    import pyarrow as pa
+    fields = []
+    for i, field in enumerate(batches[0].schema):
+        types = [b.schema.field(i).type for b in batches if not pa.types.is_null(b.schema.field(i).type)]
+        field_type = types[0] if types else pa.null()
+        fields.append(field.with_type(pa.int64() if pa.types.is_integer(field_type) else field_type))
+    return pa.schema(fields)
@@ -0,0 +1,114 @@
+import pandas as pd
+
+# rows formatted per write
+CHUNKSIZE = 100000
+
+
+def frame_chunks(frame, chunksize=CHUNKSIZE):
+    """Yields consecutive row slices of a DataFrame. An empty one is yielded as it is, so its
+    columns are still written"""
+    if not len(frame):
+        yield frame
+    for start in range(0, len(frame), chunksize):
+        yield frame[start:start + chunksize]
+
+
+def write_xlsx(path, columns, rows, index=True):
+    """Writes rows to a single sheet workbook as they arrive, with openpyxl's write only mode.
+    Only the current row is held, so memory stays flat however many rows there are. Strings
+    starting with = (the =HYPERLINK column) are saved as formulas, as to_excel does.
+    :param columns: header row
+    :param rows: iterable of row lists
+    :param index: number the rows in a first column, like DataFrame.to_excel
+    :return: number of rows written
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    bold = Font(bold=True)
+    header = ([None] if index else []) + list(columns)
+    sheet.append([_bold_cell(sheet, value, bold, WriteOnlyCell) for value in header])
+
+    n = 0
+    for n, row in enumerate(rows, 1):
+        sheet.append([_bold_cell(sheet, n - 1, bold, WriteOnlyCell)] + list(row) if index else row)
+    workbook.save(path)
+    return n
+
+
+def _bold_cell(sheet, value, font, cell_type):
+    cell = cell_type(sheet, value=value)
+    cell.font = font
+    return cell
+
+
+def write_csv(path, chunks):
+    """Writes DataFrame chunks to one csv, the header taken from the first chunk
+    :param chunks: iterable of DataFrames with the same columns
+    :return: number of rows written
+    """
+    n = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=i == 0, index=False)
+            n += len(chunk)
+    return n
+
+
+def write_parquet(path, chunks):
+    """Writes DataFrame chunks to one parquet file, a row group per chunk. Needs pyarrow.
+    :param chunks: iterable of DataFrames with the same columns
+    :return: number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    n = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            n += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def write_table(prefix, chunks, file_format='csv'):
+    """Writes DataFrame chunks as csv or parquet
+    :param prefix: path without the extension
+    :param file_format: 'csv', or 'parquet' (falls back to csv without pyarrow)
+    :return: the path written
+    """
+    if file_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print('pyarrow is not installed, saving the group tables as csv')
+            file_format = 'csv'
+    elif file_format != 'csv':
+        raise ValueError("Please specify 'csv' or 'parquet' as the table format")
+
+    path = f'{prefix}.{file_format}'
+    if file_format == 'parquet':
+        write_parquet(path, chunks)
+    else:
+        write_csv(path, chunks)
+    return path
+
+
+def group_chunks(rows, columns):
+    """The group table as chunks for write_table, whether subgraph_output gave a GroupTable (or
+    any iterable of DataFrame chunks), a DataFrame or a list of [id, group] pairs"""
+    if isinstance(rows, pd.DataFrame):
+        return frame_chunks(rows)
+    if isinstance(rows, (list, tuple)):
+        return frame_chunks(pd.DataFrame(rows, columns=columns))
+    return rows
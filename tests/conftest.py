@@ -0,0 +1,96 @@
+"""Shared fixtures: the demo database, a small synthetic one, and the graphs both backends build
+from them. Every test writes its output and cache files to a folder of its own."""
+import os
+import shutil
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib  # noqa: E402
+matplotlib.use('Agg')
+
+import config.output_location as output_settings  # noqa: E402
+import config.server_details as server_details  # noqa: E402
+import member_net.member_net_functions as mnf  # noqa: E402
+from benchmarks.synthetic_data import write_database  # noqa: E402
+from member_net.compact_graph import CompactGraph  # noqa: E402
+from member_net.loader import load_member_frames  # noqa: E402
+
+DEMO_DB = os.path.join(ROOT, 'member_net', 'demo_data.db')
+
+# participations in the synthetic database, enough for a few large networks and many ties
+SYNTHETIC_EDGES = 5000
+
+
+@pytest.fixture(scope='session')
+def synthetic_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('data') / 'synthetic.db')
+    write_database(path, SYNTHETIC_EDGES, seed=1)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def output_folder(tmp_path, monkeypatch):
+    folder = str(tmp_path / 'output')
+    os.makedirs(f'{folder}//pdfs')
+    monkeypatch.setattr(output_settings, 'output_location', folder)
+    monkeypatch.setattr(mnf, 'output_location', folder)
+    return folder
+
+
+@pytest.fixture(params=['demo', 'synthetic'])
+def database(request, monkeypatch, synthetic_db):
+    """The sqlite database the queries run against"""
+    path = DEMO_DB if request.param == 'demo' else synthetic_db
+    monkeypatch.setattr(server_details, 'sqlite_location', path)
+    return path
+
+
+@pytest.fixture
+def copied_db(tmp_path, monkeypatch):
+    """A copy of the demo database the test can change"""
+    path = str(tmp_path / 'copy.db')
+    shutil.copyfile(DEMO_DB, path)
+    monkeypatch.setattr(server_details, 'sqlite_location', path)
+    return path
+
+
+@pytest.fixture
+def frames(database):
+    """ind, mem, edges of the database's queries"""
+    return load_member_frames('sqlite', use_snapshots=False)
+
+
+@pytest.fixture
+def graphs(frames):
+    """The networkx baseline and the compact graph of the same frames"""
+    ind, mem, edges = frames
+    return mnf._networkx_graph(ind, mem, edges), CompactGraph.from_frames(ind, mem, edges)
+
+
+def execute(path, *statements):
+    """Runs sql statements against a sqlite file"""
+    conn = sqlite3.connect(path)
+    try:
+        for statement in statements:
+            conn.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def node_partition(multi):
+    """The networks of a SubgraphList as a set of frozensets of node ids"""
+    return {frozenset(multi.node_ids(k)) for k in range(len(multi))}
+
+
+def edge_set(graph_object):
+    """Every edge of either backend as a frozenset of its two node ids"""
+    if isinstance(graph_object, CompactGraph):
+        ids = graph_object.node_ids
+        return {frozenset((ids[s], ids[t])) for s, t in zip(graph_object.sources, graph_object.targets)}
+    return {frozenset(edge) for edge in graph_object.edges()}
@@ -0,0 +1,82 @@
+"""The compact backend against the networkx baseline: the same networks, centers, titles, totals
+and tables from the same database"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import member_net.member_net_functions as mnf
+from member_net.centers import find_center, network_centers
+from member_net.compact_graph import as_networkx
+from member_net.rollups import group_tables, network_nodes, network_rollups, summary_rows
+
+
+@pytest.fixture
+def networks(graphs):
+    """The networks of 3 or more nodes of the networkx baseline and of the compact backend"""
+    return [mnf.get_subgraphs(graph_object, 3) for graph_object in graphs]
+
+
+def test_same_networks_in_the_same_order(networks):
+    baseline, compact = networks
+    assert len(baseline) == len(compact)
+    assert all(set(baseline.node_ids(k)) == set(compact.node_ids(k)) for k in range(len(baseline)))
+
+
+@pytest.mark.parametrize('strategy', ['degree', 'double_sweep', 'exact'])
+def test_same_centers_and_titles(networks, strategy):
+    baseline, compact = (network_centers(multi, strategy, cache=False) for multi in networks)
+    assert baseline == compact
+    # a single network gives the same center as the list
+    k = len(networks[0]) // 2
+    assert find_center(networks[1][k], strategy) == find_center(as_networkx(networks[1][k]), strategy) \
+        == (baseline[0][k], baseline[1][k])
+
+
+def test_same_rollups_and_tables(networks):
+    results = []
+    for multi in networks:
+        members, individuals = network_nodes(multi)
+        rollups = network_rollups(members, individuals, len(multi))
+        centers, titles = network_centers(multi, cache=False)
+        tables = [pd.concat(table, ignore_index=True) for table in group_tables(members, individuals, centers)]
+        results.append((rollups, tables, list(summary_rows(rollups, titles))))
+
+    (rollups, tables, rows), (compact_rollups, compact_tables, compact_rows) = results
+    pd.testing.assert_frame_equal(rollups, compact_rollups, check_dtype=False)
+    for table, compact_table in zip(tables, compact_tables):
+        key = list(table.columns)
+        pd.testing.assert_frame_equal(table.sort_values(key).reset_index(drop=True),
+                                      compact_table.sort_values(key).reset_index(drop=True), check_dtype=False)
+    assert len(rows) == len(compact_rows)
+    for row, compact_row in zip(rows, compact_rows):
+        assert row[:5] == compact_row[:5]
+        assert np.allclose(np.array(row[5:], dtype=float), np.array(compact_row[5:], dtype=float), equal_nan=True)
+
+
+def run_batch(folder, *options):
+    """Runs batch mode for the csv and excel artifacts into folder
+    :return: the member and individual group tables, and the summary spreadsheet if written
+    """
+    from member_net.options import batch_parser
+    args = batch_parser().parse_args(['--db', 'sqlite', '--artifacts', 'csv', 'excel', '--no-snapshots',
+                                      '--output', folder, *options])
+    mnf.batch(args)
+    tables = [pd.read_csv(glob.glob(os.path.join(folder, f'{name} group*.csv'))[0]) for name in ('member', 'individual')]
+    tables = [t.sort_values(list(t.columns)).reset_index(drop=True) for t in tables]
+    summary = glob.glob(os.path.join(folder, 'Member networks*.xlsx'))
+    return tables, pd.read_excel(summary[0], index_col=0) if summary else None
+
+
+@pytest.mark.parametrize('options', [['--backend', 'compact'], ['--backend', 'compact', '--chunksize', '250'],
+                                     ['--out-of-core', '--chunksize', '250'], ['--backend', 'compact', '--pushdown']],
+                         ids=['compact', 'streamed', 'out-of-core', 'pushdown'])
+def test_batch_matches_networkx(database, tmp_path, options):
+    tables, summary = run_batch(str(tmp_path / 'networkx'), '--backend', 'networkx')
+    other_tables, other_summary = run_batch(str(tmp_path / 'other'), *options)
+    for table, other in zip(tables, other_tables):
+        pd.testing.assert_frame_equal(table, other, check_dtype=False)
+    if other_summary is not None:
+        pd.testing.assert_frame_equal(summary, other_summary, check_dtype=False)
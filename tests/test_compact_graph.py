@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+import member_net.member_net_functions as mnf
+from conftest import edge_set
+from member_net.compact_graph import CompactGraph, CompactGraphBuilder, as_networkx, label_components
+
+
+def small_frames():
+    """Two memberships sharing individual 7, a repeated participation, and member 5 colliding
+    with individual 5"""
+    ind = pd.DataFrame({'INDIVIDUAL_ID': [5, 7, 8], 'label': ['Ann 5', 'Bob 7', 'Cy 8'], 'type': 'individual'})
+    mem = pd.DataFrame({'MEMBER_NBR': [1, 2, 5], 'label': ['1', '2', '5'], 'type': 'membership',
+                        'OPN_SV_BAL': [10.0, 20.0, 30.0]})
+    edges = pd.DataFrame({'source': [1, 1, 2, 1, 5, 1], 'target': [7, 8, 7, 7, 8, 5],
+                          'PARTICIPATION_TYPE': [101, 102, 101, 103, 101, 102]})
+    return ind, mem, edges
+
+
+def test_matches_networkx_build(graphs):
+    g, compact = graphs
+    assert compact.number_of_nodes() == g.number_of_nodes()
+    assert compact.number_of_edges() == g.number_of_edges()
+    assert edge_set(compact) == edge_set(g)
+    types = dict(g.nodes(data='type'))
+    assert all(types[n] == ('individual' if i else 'membership')
+               for n, i in zip(compact.node_ids.tolist(), compact.is_individual))
+
+
+def test_colliding_ids_merge_by_default():
+    ind, mem, edges = small_frames()
+    merged = CompactGraph.from_frames(ind, mem, edges)
+    baseline = mnf._networkx_graph(ind, mem, edges)
+    assert merged.n_members == 2
+    assert merged.number_of_nodes() == baseline.number_of_nodes() == 5
+    assert merged.number_of_edges() == baseline.number_of_edges() == 5
+    assert edge_set(merged) == edge_set(baseline)
+
+    builder = CompactGraphBuilder()
+    builder.add_edges(edges)
+    separate = builder.build(ind, mem, separate_ids=True)
+    assert separate.n_members == 3
+    assert separate.number_of_nodes() == 6
+
+
+def test_repeated_participation_keeps_last():
+    ind, mem, edges = small_frames()
+    compact = CompactGraph.from_frames(ind, mem, edges)
+    baseline = mnf._networkx_graph(ind, mem, edges)
+    assert compact.number_of_edges() == baseline.number_of_edges() == 5
+    exported = as_networkx(compact)
+    assert exported.edges[1, 7]['PARTICIPATION_TYPE'] == baseline.edges[1, 7]['PARTICIPATION_TYPE'] == 103
+
+
+def test_subgraph_is_induced(graphs):
+    g, compact = graphs
+    for codes in list(compact.connected_components())[:20]:
+        # a component plus a node from elsewhere, whose edges must not come along
+        extra = np.setdiff1d(np.arange(compact.n_nodes), codes)[:1]
+        sub = compact.subgraph(np.concatenate([codes, extra]))
+        ids = compact.node_ids[np.concatenate([codes, extra])].tolist()
+        assert sorted(sub.node_ids.tolist()) == sorted(ids)
+        assert edge_set(sub) == edge_set(g.subgraph(ids))
+        assert len(sub.edge_attrs) == sub.number_of_edges()
+
+
+def test_label_components_numbers_by_lowest_code():
+    labels, sizes = label_components(6, [4, 0, 2], [5, 3, 3])
+    assert labels.tolist() == [0, 1, 0, 0, 2, 2]
+    assert sizes.tolist() == [3, 1, 2]
@@ -0,0 +1,57 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+import member_net.member_net_functions as mnf
+from conftest import edge_set, node_partition
+from member_net.components import get_components, get_degrees, get_node_types
+
+
+@pytest.mark.parametrize('backend', [0, 1], ids=['networkx', 'compact'])
+def test_partition_matches_networkx(graphs, backend):
+    g = graphs[0]
+    multi = mnf.get_subgraphs(graphs[backend], 1)
+    assert node_partition(multi) == {frozenset(c) for c in nx.connected_components(g)}
+
+
+@pytest.mark.parametrize('min_nodes', [1, 3, 10])
+def test_selected_networks_agree(graphs, min_nodes):
+    g, compact = graphs
+    expected = {frozenset(c) for c in nx.connected_components(g) if len(c) >= min_nodes}
+    for graph_object in graphs:
+        multi = mnf.get_subgraphs(graph_object, min_nodes)
+        assert node_partition(multi) == expected
+    # both backends number the networks the same way, and build them with the same edges
+    multi_g, multi_c = mnf.get_subgraphs(g, min_nodes), mnf.get_subgraphs(compact, min_nodes)
+    for k in range(0, len(multi_g), max(1, len(multi_g) // 10)):
+        assert set(multi_g.node_ids(k)) == set(multi_c.node_ids(k))
+        assert edge_set(multi_g[k]) == edge_set(multi_c[k])
+
+
+def test_attributes_match_networkx(graphs):
+    g, compact = graphs
+    sizes = [len(c) for c in nx.connected_components(g)]
+    for graph_object in graphs:
+        attributes = get_components(graph_object).attributes()
+        assert attributes['Total Subgraphs'] == len(sizes)
+        assert attributes['Min Nodes'] == min(sizes)
+        assert attributes['Max Nodes'] == max(sizes)
+        assert np.isclose(attributes['Average Nodes'], np.mean(sizes))
+
+
+def test_node_types_and_degrees(graphs):
+    g, compact = graphs
+    types = dict(g.nodes(data='type'))
+    degrees = dict(g.degree())
+    for graph_object in graphs:
+        components = get_components(graph_object)
+        keys = components.nodes if components.nodes is not None else graph_object.node_ids.tolist()
+        assert get_node_types(graph_object).tolist() == [types[n] == 'individual' for n in keys]
+        assert get_degrees(graph_object).tolist() == [degrees[n] for n in keys]
+
+
+def test_cache_follows_graph_changes(graphs):
+    g = graphs[0].copy()
+    before = len(get_components(g))
+    g.add_edge('a', 'b')
+    assert len(get_components(g)) == before + 1
@@ -0,0 +1,47 @@
+import networkx as nx
+import pandas as pd
+import pytest
+
+from conftest import edge_set
+from member_net.graph_export import write_gexf, write_graphml, write_tables
+
+
+@pytest.mark.parametrize('backend', [0, 1], ids=['networkx', 'compact'])
+@pytest.mark.parametrize('write, read, name', [(write_gexf, nx.read_gexf, 'graph.gexf'),
+                                               (write_graphml, nx.read_graphml, 'graph.graphml.gz')])
+def test_xml_reads_back(graphs, backend, write, read, name, tmp_path):
+    g = graphs[0]
+    path = str(tmp_path / name)
+    write(graphs[backend], path, chunksize=333)
+    written = read(path)
+    assert written.number_of_nodes() == g.number_of_nodes()
+    assert written.number_of_edges() == g.number_of_edges()
+    assert edge_set(written) == {frozenset(str(n) for n in edge) for edge in edge_set(g)}
+
+    types = dict(g.nodes(data='type'))
+    labels = dict(g.nodes(data='label'))
+    for node, data in list(written.nodes(data=True))[:200]:
+        key = int(node)
+        assert data['type'] == types[key]
+        assert str(data.get('label')) == str(labels[key])
+
+
+@pytest.mark.parametrize('backend', [0, 1], ids=['networkx', 'compact'])
+def test_tables(graphs, backend, tmp_path):
+    g = graphs[0]
+    paths = write_tables(graphs[backend], str(tmp_path / 'graph'), 'csv')
+    members, individuals, participations = (pd.read_csv(p) for p in paths)
+    types = [t for n, t in g.nodes(data='type')]
+    assert len(members) == types.count('membership')
+    assert len(individuals) == types.count('individual')
+    assert len(participations) == g.number_of_edges()
+    assert set(members['MEMBER_NBR']).isdisjoint(individuals['INDIVIDUAL_ID'])
+    assert {frozenset(pair) for pair in participations[['MEMBER_NBR', 'INDIVIDUAL_ID']].itertuples(index=False)} \
+        == edge_set(g)
+
+
+def test_parquet_tables(graphs, tmp_path):
+    pytest.importorskip('pyarrow')
+    paths = write_tables(graphs[1], str(tmp_path / 'graph'))
+    assert [p.rsplit('.', 1)[1] for p in paths] == ['parquet'] * 3
+    assert len(pd.read_parquet(paths[2])) == graphs[0].number_of_edges()
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import member_net.member_net_functions as mnf
+from conftest import execute
+from member_net.compact_graph import CompactGraph, label_components
+from member_net.components import edge_codes, edge_table
+from member_net.incremental import IncrementalPlan
+
+BACKENDS = ['networkx', 'compact']
+
+
+def run(backend):
+    """One incremental run over the database: plan, networks of 3 or more nodes, saved state
+    :return plan, multi:
+    """
+    g, ind = mnf.generate_member_graph('sqlite', backend, use_snapshots=False)
+    plan = IncrementalPlan(g)
+    multi = mnf.get_subgraphs(g, 3)
+    plan.select(multi)
+    plan.save([f'network {k}' for k in range(len(multi))])
+    return plan, multi
+
+
+def full_labels(graph_object):
+    """Components labelled from scratch"""
+    if isinstance(graph_object, CompactGraph):
+        return label_components(graph_object.n_nodes, graph_object.sources, graph_object.targets)
+    nodes = list(graph_object)
+    return label_components(len(nodes), *edge_codes(graph_object, nodes))
+
+
+def network_of(multi, node_id):
+    return next(k for k in range(len(multi)) if node_id in multi.node_ids(k))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_rerun_changes_nothing(copied_db, backend):
+    plan, multi = run(backend)
+    assert plan.changed.tolist() == list(range(len(multi)))
+    assert plan.is_new.all()
+
+    plan, multi = run(backend)
+    assert len(plan.changed) == 0
+    assert len(plan.report([]).index) == 0
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_removed_and_added_edges(copied_db, backend):
+    _, before = run(backend)
+    largest = max(range(len(before)), key=lambda k: len(before.node_ids(k)))
+    # an edge of the largest network, and one joining two other networks
+    member, individual = edge_table(before[largest]).iloc[0, :2].tolist()
+    a, b = [k for k in range(len(before)) if k != largest][:2]
+    joined_member = edge_table(before[a])['MEMBER_NBR'].iloc[0]
+    joined_individual = edge_table(before[b])['INDIVIDUAL_ID'].iloc[0]
+    execute(copied_db,
+            f'DELETE FROM membershipparticipant_today WHERE member_nbr = {member} AND individual_id = {individual}',
+            f'INSERT INTO membershipparticipant_today VALUES ({joined_member}, 101, {joined_individual})')
+
+    plan, after = run(backend)
+    assert len(plan.added) == 1 and len(plan.removed) == 1
+    changed = set(plan.changed.tolist())
+    assert network_of(after, joined_member) == network_of(after, joined_individual)
+    assert network_of(after, joined_member) in changed
+    for node in (member, individual):
+        if any(node in after.node_ids(k) for k in range(len(after))):
+            assert network_of(after, node) in changed
+    assert len(changed) < len(after)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_update_components_matches_full_labelling(copied_db, backend):
+    run(backend)
+    execute(copied_db,
+            'DELETE FROM membershipparticipant_today WHERE rowid % 40 = 0',
+            'INSERT INTO membershipparticipant_today SELECT member_nbr, participation_type, individual_id + 7 '
+            'FROM membershipparticipant_today WHERE rowid % 55 = 0')
+    g, ind = mnf.generate_member_graph('sqlite', backend, use_snapshots=False)
+    plan = IncrementalPlan(g)
+    labels, sizes = full_labels(g)
+    assert np.array_equal(plan.components.labels, labels)
+    assert np.array_equal(plan.components.sizes, sizes)
+
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+import member_net.member_net_functions as mnf
+from conftest import execute, edge_set, node_partition
+from member_net.compact_graph import CompactGraph
+from member_net.loader import downcast, load_member_frames, stream_member_graph
+
+
+def test_downcast():
+    frame = downcast(pd.DataFrame({'MEMBER_NBR': [1, 2, 300], 'OPN_SV_BAL': [1, 2, 3],
+                                   'PARTICIPATION_TYPE': ['101', '102', '101'], 'label': ['a', 'b', 'c']}))
+    assert frame['MEMBER_NBR'].dtype == np.int16
+    assert frame['OPN_SV_BAL'].dtype == np.float64
+    assert isinstance(frame['PARTICIPATION_TYPE'].dtype, pd.CategoricalDtype)
+    assert frame['label'].dtype == object or pd.api.types.is_string_dtype(frame['label'])
+
+
+def test_stream_matches_frames(frames):
+    ind, mem, edges = frames
+    streamed, streamed_ind = stream_member_graph('sqlite', chunksize=1000, use_snapshots=False)
+    full = CompactGraph.from_frames(ind, mem, edges)
+    assert edge_set(streamed) == edge_set(full)
+    assert set(streamed_ind['INDIVIDUAL_ID']) == set(full.individual_ids.tolist())
+    assert isinstance(streamed.edge_attrs['PARTICIPATION_TYPE'].dtype, pd.CategoricalDtype)
+
+
+def test_pushdown_keeps_networks_of_three(database):
+    full, _ = stream_member_graph('sqlite', use_snapshots=False)
+    pushed, _ = stream_member_graph('sqlite', use_snapshots=False, pushdown=True)
+    assert pushed.number_of_edges() < full.number_of_edges()
+    assert node_partition(mnf.get_subgraphs(pushed, 3)) == node_partition(mnf.get_subgraphs(full, 3))
+
+
+def test_alphanumeric_participation_types(copied_db):
+    execute(copied_db, "UPDATE membershipparticipant_today SET participation_type = 'J' || participation_type "
+                       "WHERE member_nbr % 2 = 0")
+    ind, mem, edges = load_member_frames('sqlite', use_snapshots=False)
+    streamed, _ = stream_member_graph('sqlite', chunksize=500, use_snapshots=False)
+    baseline = mnf._networkx_graph(ind, mem, edges)
+    types = streamed.edge_attrs['PARTICIPATION_TYPE']
+    assert isinstance(types.dtype, pd.CategoricalDtype)
+    assert any(str(t).startswith('J') for t in types.cat.categories)
+    ids = streamed.node_ids
+    for s, t, code in list(zip(streamed.sources, streamed.targets, types))[:500]:
+        assert str(baseline.edges[ids[s], ids[t]]['PARTICIPATION_TYPE']) == str(code)
@@ -0,0 +1,57 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+import member_net.member_net_functions as mnf
+from member_net.compact_graph import as_networkx
+from member_net.network_metrics import METRIC_COLUMNS, network_metrics, size_partitions
+from member_net.rollups import ROLLUP_COLUMNS, network_nodes, network_rollups
+
+
+@pytest.fixture(params=[0, 1], ids=['networkx', 'compact'])
+def multi(request, graphs):
+    return mnf.get_subgraphs(graphs[request.param], 3)
+
+
+def test_metrics_match_networkx(multi):
+    metrics = network_metrics(multi, 1)
+    assert list(metrics.columns) == METRIC_COLUMNS + ROLLUP_COLUMNS
+    assert list(metrics.index) == list(range(len(multi)))
+    for k in range(len(multi)):
+        g = as_networkx(multi[k])
+        row = metrics.loc[k]
+        degrees = [d for n, d in g.degree()]
+        assert row['Edges'] == g.number_of_edges()
+        assert np.isclose(row['Density'], nx.density(g))
+        assert row['Diameter'] == nx.diameter(g)
+        assert (row['Min Degree'], row['Max Degree']) == (min(degrees), max(degrees))
+        assert np.isclose(row['Mean Degree'], np.mean(degrees))
+
+
+def test_totals_match_rollups(multi):
+    members, individuals = network_nodes(multi)
+    rollups = network_rollups(members, individuals, len(multi))
+    metrics = network_metrics(multi, 1, members=members)
+    assert np.allclose(metrics[ROLLUP_COLUMNS].to_numpy(dtype=float), rollups[ROLLUP_COLUMNS].to_numpy(dtype=float))
+
+
+def test_workers_agree(multi):
+    pd.testing.assert_frame_equal(network_metrics(multi, 1), network_metrics(multi, 2), check_names=False)
+
+
+def test_estimated_diameter_is_a_lower_bound(multi):
+    exact = network_metrics(multi, 1)['Diameter']
+    estimate = network_metrics(multi, 1, exact_diameter_nodes=0)['Diameter']
+    assert (estimate <= exact).all()
+    assert (estimate >= (exact + 1) // 2).all()
+
+
+def test_size_partitions():
+    costs = [9, 1, 4, 4, 16, 1, 2]
+    parts = size_partitions(costs, 3)
+    assert sorted(np.concatenate(parts).tolist()) == list(range(len(costs)))
+    loads = [sum(costs[k] for k in part) for part in parts]
+    assert loads == sorted(loads, reverse=True)
+    assert max(loads) == 16
+    assert len(size_partitions([5, 5], 4)) == 2
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import member_net.member_net_functions as mnf
+from conftest import execute, node_partition
+from member_net.centers import network_centers
+from member_net.loader import downcast
+from member_net.out_of_core import OutOfCoreComponents, SpillFile, contains, edge_chunks, merge_unique
+from member_net.rollups import group_tables, network_nodes
+
+# small enough that the id runs, union-find and center buckets all take several blocks
+BLOCK = 97
+
+
+@pytest.fixture
+def out_of_core(database, tmp_path):
+    components = OutOfCoreComponents(str(tmp_path / 'work'), BLOCK)
+    components.build(edge_chunks('sqlite', BLOCK, use_snapshots=False))
+    yield components
+    components.close()
+
+
+@pytest.fixture
+def in_memory(database):
+    g, ind = mnf.generate_member_graph('sqlite', 'compact', use_snapshots=False)
+    return mnf.get_subgraphs(g, 3)
+
+
+def test_partition_matches_in_memory(out_of_core, in_memory):
+    nodes = pd.concat(out_of_core.component_chunks(3))
+    networks = {frozenset(group['NODE_ID'].tolist()) for _, group in nodes.groupby('COMPONENT')}
+    assert networks == node_partition(in_memory)
+    assert out_of_core.count(3) == len(in_memory)
+    assert out_of_core.attributes() == mnf.get_subgraph_attributes(in_memory.graph_object)
+
+
+@pytest.mark.parametrize('strategy', ['degree', 'double_sweep', 'exact'])
+def test_group_tables_match_in_memory(out_of_core, in_memory, strategy, tmp_path):
+    out_of_core.find_centers(3, strategy, cache=False)
+    individual_path, member_path = out_of_core.write_group_tables(str(tmp_path / 'individual'),
+                                                                  str(tmp_path / 'member'), 3)
+
+    centers, titles = network_centers(in_memory, strategy, cache=False)
+    members, individuals = network_nodes(in_memory)
+    expected = [pd.concat(table) for table in group_tables(members, individuals, centers)]
+    for path, table in zip((individual_path, member_path), expected):
+        written = pd.read_csv(path)
+        id_column = table.columns[0]
+        pd.testing.assert_frame_equal(written.sort_values(id_column).reset_index(drop=True),
+                                      table.sort_values(id_column).reset_index(drop=True), check_dtype=False)
+
+
+def test_contains():
+    values = np.array([2, 5, 9])
+    assert contains(values, np.array([1, 2, 5, 7, 9, 10])).tolist() == [False, True, True, False, True, False]
+    assert contains(values[:0], np.array([1])).tolist() == [False]
+
+
+def test_merge_unique(tmp_path):
+    rng = np.random.default_rng(0)
+    a = np.unique(rng.integers(0, 500, 200))
+    b = np.unique(rng.integers(0, 500, 300))
+    out = SpillFile(str(tmp_path / 'merged.bin'))
+    merge_unique(a, b, out, 7)
+    assert np.array_equal(out.array(), np.union1d(a, b))
+
+
+
+def test_text_ids_fail_early(copied_db, tmp_path):
+    execute(copied_db, "UPDATE membershipparticipant_today SET member_nbr = 'M' || member_nbr WHERE rowid % 3 = 0")
+    components = OutOfCoreComponents(str(tmp_path / 'work'), BLOCK)
+    with pytest.raises(ValueError, match='integer MEMBER_NBR'):
+        components.build(edge_chunks('sqlite', BLOCK, use_snapshots=False))
+    components.close()
+    # the in-memory backends keep text ids as they are
+    g, ind = mnf.generate_member_graph('sqlite', 'compact', BLOCK, use_snapshots=False)
+    assert any(str(n).startswith('M') for n in g.member_ids.tolist())
+
+
+def test_ids_with_leading_zeros_fail(tmp_path):
+    chunk = downcast(pd.DataFrame({'source': [1, 2], 'target': ['007', '008'], 'PARTICIPATION_TYPE': [101, 101]}))
+    assert chunk['target'].tolist() == ['007', '008']
+    components = OutOfCoreComponents(str(tmp_path / 'work'), BLOCK)
+    with pytest.raises(ValueError, match='integer INDIVIDUAL_ID'):
+        components.build([chunk])
+    components.close()
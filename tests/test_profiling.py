@@ -0,0 +1,32 @@
+from member_net.profiling import RunProfile, memory_used
+
+
+def test_stage_memory_is_per_stage():
+    profile = RunProfile(print_stages=False)
+    with profile.stage('large'):
+        block = bytearray(64 * 2 ** 20)
+        block[::4096] = b'\1' * len(block[::4096])
+        del block
+    with profile.stage('small'):
+        pass
+    large, small = profile.stages
+    if large['peak_rss_growth_mb'] is not None:
+        assert large['peak_rss_growth_mb'] >= 32
+        assert small['peak_rss_growth_mb'] < 32
+        assert small['process_peak_rss_mb'] >= large['process_peak_rss_mb']
+
+
+def test_memory_used():
+    assert memory_used((100.0, 300.0), (90.0, 350.5)) == (-10.0, 50.5)
+    assert memory_used((100.0, 300.0), (120.0, 300.0)) == (20.0, 0.0)
+    assert memory_used((None, None), (120.0, None)) == (None, None)
+
+
+def test_network_records():
+    profile = RunProfile(keep_networks=False, top_n=2)
+    for k, wall in enumerate([0.3, 0.1, 0.5, 0.2]):
+        profile.network('render', f'group {k}', 10, wall, wall, (1.0, 2.0))
+    assert [r['title'] for r in profile.slowest()] == ['group 2', 'group 0']
+    assert profile.slowest()[0]['peak_rss_growth_mb'] == 2.0
+    assert profile.network_totals()['render']['networks'] == 4
+    assert profile.networks == []
@@ -0,0 +1,80 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import config.cache_settings as cache_settings
+from conftest import edge_set
+from member_net.loader import load_member_frames, stream_member_graph
+from member_net.snapshots import SnapshotCache, data_date, snapshot_key
+
+pytest.importorskip('pyarrow')
+
+
+def test_round_trip(tmp_path, frames):
+    cache = SnapshotCache(str(tmp_path / 'snapshots'))
+    key = snapshot_key(['query'], 'today')
+    assert cache.load(key) is None
+    cache.save(key, *frames)
+    for saved, loaded in zip(frames, cache.load(key)):
+        assert list(loaded.columns) == list(saved.columns)
+        assert len(loaded) == len(saved)
+        pd.testing.assert_frame_equal(loaded.astype(str), saved.astype(str), check_dtype=False)
+
+
+def test_loaders_reuse_the_snapshot(database, capsys):
+    frames = load_member_frames('sqlite')
+    again = load_member_frames('sqlite')
+    assert [len(f) for f in again] == [len(f) for f in frames]
+
+    streamed, _ = stream_member_graph('sqlite', chunksize=1000)
+    cached, _ = stream_member_graph('sqlite', chunksize=1000)
+    assert edge_set(cached) == edge_set(streamed)
+    assert capsys.readouterr().out.count('Loaded tables from snapshot cache') == 2
+    assert len(_snapshot_folders()) == 2
+
+
+def test_column_null_in_first_chunk(tmp_path):
+    cache = SnapshotCache(str(tmp_path / 'snapshots'))
+    writer = cache.writer('key')
+    writer.write('edge', pd.DataFrame({'source': [1, 2], 'note': [None, None]}))
+    writer.write('edge', pd.DataFrame({'source': [3], 'note': [1.5]}))
+    for table in ('individual', 'membership'):
+        writer.write(table, pd.DataFrame({'label': ['a']}))
+    writer.close()
+
+    edges = cache.read_table('key', 'edge')
+    assert edges['source'].tolist() == [1, 2, 3]
+    assert edges['note'].dtype == float
+    assert edges['note'].tolist()[2] == 1.5
+
+
+def test_evict(tmp_path):
+    directory = tmp_path / 'snapshots'
+    cache = SnapshotCache(str(directory), retention_days=2, max_snapshots=2, partial_timeout_hours=6)
+    old = time.time() - 3 * 86400
+    for name, age in [('a', 0), ('b', 60), ('c', 120), ('expired', None), ('fresh.partial', 0), ('stale.partial', None)]:
+        folder = directory / name
+        folder.mkdir(parents=True)
+        (folder / 'edge.arrow').write_bytes(b'')
+        stamp = old if age is None else time.time() - age
+        os.utime(folder / 'edge.arrow', (stamp, stamp))
+        os.utime(folder, (stamp, stamp))
+
+    cache.evict()
+    assert sorted(os.listdir(directory)) == ['a', 'b', 'fresh.partial']
+
+
+def _snapshot_folders():
+    import config.output_location as output_settings
+    folder = os.path.join(output_settings.output_location, 'cache', 'snapshots')
+    return [os.path.join(folder, name) for name in os.listdir(folder)]
+
+
+def test_data_date_query(copied_db, monkeypatch):
+    monkeypatch.setattr(cache_settings, 'sqlite_data_date_query', 'SELECT count(*) FROM membershipparticipant_today')
+    assert data_date('sqlite') > 0
+    monkeypatch.setattr(cache_settings, 'sqlite_data_date_query', 'SELECT load_date FROM no_such_table')
+    with pytest.raises(Exception, match='no_such_table'):
+        data_date('sqlite')
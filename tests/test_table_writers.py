@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from member_net.table_writers import frame_chunks, group_chunks, write_csv, write_table, write_xlsx
+
+GROUPS = pd.DataFrame({'MEMBER_NBR': range(250), 'GROUP_ID': [f'group-{i // 10}' for i in range(250)]})
+
+
+def test_csv_from_chunks(tmp_path):
+    path = str(tmp_path / 'groups.csv')
+    assert write_csv(path, frame_chunks(GROUPS, 100)) == 250
+    pd.testing.assert_frame_equal(pd.read_csv(path), GROUPS)
+
+
+def test_empty_table_keeps_its_header(tmp_path):
+    path = write_table(str(tmp_path / 'groups'), frame_chunks(GROUPS[:0]))
+    assert list(pd.read_csv(path).columns) == ['MEMBER_NBR', 'GROUP_ID']
+
+
+def test_parquet_from_chunks(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = write_table(str(tmp_path / 'groups'), frame_chunks(GROUPS, 100), 'parquet')
+    assert path.endswith('.parquet')
+    pd.testing.assert_frame_equal(pd.read_parquet(path), GROUPS, check_dtype=False)
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        write_table(str(tmp_path / 'groups'), frame_chunks(GROUPS), 'xls')
+
+
+@pytest.mark.parametrize('rows', [GROUPS, GROUPS.values.tolist(), frame_chunks(GROUPS, 60)],
+                         ids=['frame', 'pairs', 'chunks'])
+def test_group_chunks(rows):
+    chunks = list(group_chunks(rows, list(GROUPS.columns)))
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), GROUPS, check_dtype=False)
+
+
+def test_xlsx_rows(tmp_path):
+    path = str(tmp_path / 'summary.xlsx')
+    rows = ([f'group-{i}', f'=HYPERLINK("pdfs/group-{i}.pdf")', i, i * 1.5] for i in range(5))
+    assert write_xlsx(path, ['Title', 'Link', 'Nodes', 'Balance'], rows) == 5
+
+    sheet = load_workbook(path).active
+    values = [[cell.value for cell in row] for row in sheet.iter_rows()]
+    assert values[0] == [None, 'Title', 'Link', 'Nodes', 'Balance']
+    assert values[3] == [2, 'group-2', '=HYPERLINK("pdfs/group-2.pdf")', 2, 3.0]
+    assert sheet['A1'].font.bold and sheet['A2'].font.bold
+    assert pd.read_excel(path, index_col=0).shape == (5, 4)